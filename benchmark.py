@@ -0,0 +1,437 @@
+import argparse
+import gc
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import main
+from main import App
+from maplayer import MarkerLayer
+from models import Employee, Station
+from search import PrefixIndex, PrefixView, TrigramIndex
+from services import NetworkService
+from storage import NetworkStore
+from views import VirtualList
+
+DEFAULT_SIZES = (1000, 10000)
+REGRESSION_THRESHOLD = 1.25  # Wynik gorszy od bazowego o ponad 25% jest zgłaszany jako regresja
+POLAND = (49.0, 54.8, 14.1, 24.1)  # lat_min, lat_max, lon_min, lon_max
+
+SYLLABLES = ("ka", "ro", "wa", "sza", "mi", "le", "no", "da", "ski", "wicz", "ta", "bo", "rek", "go", "zy", "la")
+POSITIONS = ("kasjer", "dyżurny ruchu", "konduktor", "zawiadowca", "informacja", "ochrona")
+FLEETS = ("EZT", "spalinowy", "autobus", "elektryczny", "towarowy")
+
+
+# --- ATRAPY WIDŻETÓW ---
+class FakeMarker:
+    def __init__(self, widget):
+        self.widget = widget
+
+    def delete(self):
+        self.widget.markers -= 1
+
+    def set_position(self, lat, lon):
+        pass
+
+    def set_text(self, text):
+        pass
+
+
+class FakeMapWidget:
+    """Udaje TkinterMapView: widok o rozmiarze okna aplikacji wokół punktu, markery tylko liczone."""
+
+    def __init__(self, lat, lon, zoom, width=900, height=800):
+        self.markers = 0
+        self.width, self.height = width, height
+        self.set_zoom(zoom)
+        self.set_position(lat, lon)
+
+    def set_position(self, lat, lon, marker=False):
+        n = 1 << self.zoom
+        x = (lon + 180.0) / 360.0 * n
+        y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+        dx, dy = self.width / 512, self.height / 512
+        self.upper_left_tile_pos = (x - dx, y - dy)
+        self.lower_right_tile_pos = (x + dx, y + dy)
+
+    def set_zoom(self, zoom):
+        self.zoom = zoom
+
+    def set_marker(self, lat, lon, text=None, **options):
+        self.markers += 1
+        return FakeMarker(self)
+
+
+class _FakeTree:
+    def __init__(self):
+        self._count = 0
+        self._selection = ()
+
+    def insert(self, parent, index, text=""):
+        self._count += 1
+        return f"I{self._count}"
+
+    def item(self, iid, **options):
+        pass
+
+    def delete(self, *iids):
+        pass
+
+    def selection(self):
+        return self._selection
+
+    def selection_set(self, *iids):
+        self._selection = iids
+
+    def selection_remove(self, *iids):
+        self._selection = ()
+
+
+class _FakeScrollbar:
+    def set(self, first, last):
+        pass
+
+
+def headless_list(items, render, visible=40):
+    """VirtualList bez Tk - ta sama logika flush/_draw, Treeview i przewijak zastąpione atrapami."""
+    view = VirtualList.__new__(VirtualList)
+    view.items, view.render, view.row_height = items, render, 20
+    view.top, view.visible, view.selected = 0, visible, None
+    view._iids, view._window, view._window_ids, view._ops = [], [], set(), []
+    view._changed = view._redraw = False
+    view.tree, view.scrollbar = _FakeTree(), _FakeScrollbar()
+    return view
+
+
+class HeadlessApp:
+    """Metody App uruchamiane bez okna: listy, warstwa znaczników i usługi jak w aplikacji, widżety to atrapy."""
+
+    _on_model_change = App._on_model_change
+    _list_items = App._list_items
+    refresh_all = App.refresh_all
+    _place_entity_offset = App._place_entity_offset
+    _place_children = App._place_children
+    _marker_text = vars(App)["_marker_text"]  # staticmethod - bez wiązania z instancją
+    _station_row = vars(App)["_station_row"]
+    _child_row = vars(App)["_child_row"]
+    show_station_children = App.show_station_children
+    hide_station_children = App.hide_station_children
+    remove_station = App.remove_station
+    _require_loaded = App._require_loaded
+    batch = App.batch
+    _startup_done = True  # Sieć budowana w całości przed pomiarami
+
+    def __init__(self, center):
+        self.service = NetworkService(store=NetworkStore(":memory:"))
+        self.repo, self.store = self.service.repo, self.service.store
+        self.repo.listeners.append(self._on_model_change)
+        self.prefix_indexes = {kind: PrefixIndex(self.repo, kind) for kind in self.repo.tables}
+        self._filters = dict.fromkeys(self.repo.tables)
+        self.trigram_index = TrigramIndex(self.repo)
+        self._station_names_dirty = True
+        self._refresh_job, self._batch_depth = None, 0
+        self.stations_listbox = headless_list(lambda: self._list_items("station"), self._station_row)
+        self.employees_listbox = headless_list(lambda: self._list_items("employee"), self._child_row)
+        self.carriers_listbox = headless_list(lambda: self._list_items("carrier"), self._child_row)
+        self._views = {"station": self.stations_listbox, "employee": self.employees_listbox,
+                       "carrier": self.carriers_listbox}
+        self._station_combos = [{}, {}]  # zamiast comboboxów wyboru dworca
+        self.map_widget = FakeMapWidget(center[0], center[1], zoom=16)
+        self.marker_layer = MarkerLayer(self.map_widget)
+        self.marker_layer.update_view()
+
+    def schedule_refresh(self):
+        pass  # Bez pętli Tk - operacje wywołują refresh_all same, jak zrobiłby to obrót pętli
+
+    def set_status(self, text):
+        pass
+
+
+# --- SYNTETYCZNA SIEĆ ---
+def _word(rng, parts):
+    return "".join(rng.choice(SYLLABLES) for _ in range(parts)).capitalize()
+
+
+def synthetic_network(service, entities, seed=0):
+    """Deterministyczna sieć o około `entities` obiektach: 1/20 dworce, reszta pracownicy (60%) i klienci."""
+    rng = random.Random(seed)
+    lat0, lat1, lon0, lon1 = POLAND
+    stations = []
+    with service.batch():
+        for i in range(max(1, entities // 20)):
+            coords = [rng.uniform(lat0, lat1), rng.uniform(lon0, lon1)]
+            stations.append(service.add_station(f"{_word(rng, 3)} {i}", f"ul. {_word(rng, 2)} {i % 200 + 1}", coords))
+        for i in range(entities - len(stations)):
+            # Rozkład zbliżony do rzeczywistego: kilka dużych węzłów, wiele małych stacji
+            station = stations[int(len(stations) * rng.random() ** 2)]
+            name = f"{_word(rng, 2)} {_word(rng, 3)}"
+            if rng.random() < 0.6:
+                service.add_employee(name, rng.choice(POSITIONS), station)
+            else:
+                service.add_carrier(f"Przewozy {name}", rng.choice(FLEETS), station)
+    return stations
+
+
+# --- OPERACJE ---
+# Każda operacja dostaje (app, kontekst, i) i może zwrócić funkcję sprzątającą, wywoływaną poza pomiarem.
+def op_refresh_all(app, ctx, i):
+    employee = app.repo.employees[i % len(app.repo.employees)]
+    app.service.update(employee, position=POSITIONS[i % len(POSITIONS)] + " ")
+    app.stations_listbox.invalidate()
+    app.refresh_all()
+
+
+def op_place_entity_offset(app, ctx, i):
+    child = ctx["hub_children"][i % len(ctx["hub_children"])]
+    app._place_entity_offset(child)
+    return child.remove_marker
+
+
+def op_show_station_children(app, ctx, i):
+    app.show_station_children(ctx["hub"])
+    return lambda: app.hide_station_children(ctx["hub"])
+
+
+def op_move_employee(app, ctx, i):
+    # Odpowiednik zapisu w edit_employee ze zmianą dworca i widocznym znacznikiem
+    employee = ctx["movers"][i % len(ctx["movers"])]
+    target = ctx["stations"][(i * 7919) % len(ctx["stations"])]
+    app.service.update(employee, name=employee.name, position=employee.position)
+    if app.service.reassign(employee, target) and employee.marker:
+        employee.remove_marker()
+        app._place_entity_offset(employee)
+    app.refresh_all()
+
+
+def op_remove_station(app, ctx, i):
+    station = ctx["victims"].pop()
+    app.stations_listbox.selected = station
+    app.remove_station()
+    app.refresh_all()
+
+
+def op_prefix_filter(app, ctx, i):
+    view = PrefixView(app.prefix_indexes["employee"], ctx["prefixes"][i % len(ctx["prefixes"])])
+    return len(view), view[0:40]
+
+
+def op_fuzzy_search(app, ctx, i):
+    return app.trigram_index.search(ctx["queries"][i % len(ctx["queries"])])
+
+
+def op_nearest(app, ctx, i):
+    lat0, lat1, lon0, lon1 = POLAND
+    return app.service.nearest(lat0 + (lat1 - lat0) * (i % 10) / 10, lon0 + (lon1 - lon0) * (i % 7) / 7, 10)
+
+
+OPERATIONS = {
+    "refresh_all": op_refresh_all,
+    "place_entity_offset": op_place_entity_offset,
+    "show_station_children": op_show_station_children,
+    "move_employee": op_move_employee,
+    "remove_station": op_remove_station,
+    "prefix_filter": op_prefix_filter,
+    "fuzzy_search": op_fuzzy_search,
+    "nearest": op_nearest,
+}
+
+
+def _context(app, stations, repeat):
+    hub = max(stations, key=lambda s: len(s.employees) + len(s.carriers))
+    rng = random.Random(1)
+    employees = list(app.repo.employees)
+    movers = rng.sample(employees, min(len(employees), 50))
+    for employee in movers:
+        app._place_entity_offset(employee)
+    hub_stations = {hub} | {employee.station for employee in movers}
+    victims = [s for s in stations if s not in hub_stations][-(repeat + 3):]
+    names = [employee.name for employee in rng.sample(employees, min(len(employees), 20))]
+    return {
+        "stations": stations,
+        "hub": hub,
+        "hub_children": sorted((*hub.employees, *hub.carriers), key=lambda c: c.id),
+        "movers": movers,
+        "victims": victims,
+        "prefixes": [name[:3].lower() for name in names],
+        "queries": [name[1:-1] for name in names],
+    }
+
+
+def run_size(entities, repeat=20, seed=0, operations=None):
+    """Wyniki {operacja: {median_ms, p95_ms, max_ms, peak_kb}} dla sieci o danej wielkości."""
+    main.messagebox.askyesno = lambda *args, **kwargs: True  # remove_station pyta o potwierdzenie
+    app = HeadlessApp(center=(52.0, 19.0))
+    start = time.perf_counter()
+    stations = synthetic_network(app.service, entities, seed)
+    app.refresh_all()
+    app.map_widget.set_position(*stations[0].coordinates)
+    app.marker_layer.update_view()
+    results = {"_build_s": round(time.perf_counter() - start, 3)}
+    ctx = _context(app, stations, repeat)
+    app.map_widget.set_position(*ctx["hub"].coordinates)
+    app.marker_layer.update_view()
+
+    for name, op in OPERATIONS.items():
+        if operations and name not in operations:
+            continue
+        cleanup = op(app, ctx, -1)  # Rozgrzewka: leniwe indeksy i cache budują się poza pomiarem
+        if callable(cleanup):
+            cleanup()
+        gc.collect()
+        times = []
+        for i in range(repeat):
+            t0 = time.perf_counter()
+            cleanup = op(app, ctx, i)
+            times.append((time.perf_counter() - t0) * 1000)
+            if callable(cleanup):
+                cleanup()
+        # Pamięć mierzona osobnym wywołaniem - tracemalloc spowalnia pomiar czasu
+        tracemalloc.start()
+        cleanup = op(app, ctx, repeat)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        if callable(cleanup):
+            cleanup()
+        times.sort()
+        results[name] = {
+            "median_ms": round(statistics.median(times), 4),
+            "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 4),
+            "max_ms": round(times[-1], 4),
+            "peak_kb": round(peak / 1024, 1),
+        }
+    app.service.close()
+    return results
+
+
+# --- PAMIĘĆ ENCJI ---
+class _DictEmployee:
+    """Dawny układ pracownika: słownik atrybutów, referencja do aplikacji i lista współrzędnych w każdym obiekcie."""
+
+    def __init__(self, name, position, station, app_instance):
+        self.id = None
+        self.name = name
+        self.app = app_instance
+        self.marker = None
+        self.coordinates = None
+        self.position = position
+        self.station = station
+        self.slot = None
+
+
+def _measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del objects
+    return used
+
+
+def memory_footprint(count=1_000_000):
+    """Pamięć `count` pracowników ze współrzędnymi: obecne klasy (__slots__) kontra dawny układ na słownikach.
+
+    Nazwy i stanowiska są wspólne dla obu wariantów i nie wliczają się do pomiaru.
+    """
+    station = Station("Dworzec", "adres")
+    names = [f"Pracownik {i}" for i in range(count)]
+    app = object()
+
+    def _slots():
+        objects = []
+        for i, name in enumerate(names):
+            employee = Employee(name, "kasjer", station)
+            employee.id = i
+            employee.coordinates = (52.0 + i * 1e-7, 21.0)
+            objects.append(employee)
+        return objects
+
+    def _dicts():
+        objects = []
+        for i, name in enumerate(names):
+            employee = _DictEmployee(name, "kasjer", station, app)
+            employee.id = i
+            employee.coordinates = [52.0 + i * 1e-7, 21.0]
+            objects.append(employee)
+        return objects
+
+    slots, dicts = _measure(_slots), _measure(_dicts)
+    return {
+        "entities": count,
+        "slots_mb": round(slots / 2**20, 1),
+        "dict_mb": round(dicts / 2**20, 1),
+        "slots_bytes_per_entity": round(slots / count, 1),
+        "dict_bytes_per_entity": round(dicts / count, 1),
+        "reduction": round(1 - slots / dicts, 3),
+    }
+
+
+# --- PORÓWNANIE Z WYNIKIEM BAZOWYM ---
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """Lista regresji [(wielkość, operacja, miara, bazowa, obecna)], gdzie obecna > bazowa * threshold."""
+    regressions = []
+    for size, ops in current["results"].items():
+        for name, metrics in ops.items():
+            base = baseline.get("results", {}).get(size, {}).get(name)
+            if not isinstance(metrics, dict) or not base:
+                continue
+            for metric in ("median_ms", "peak_kb"):
+                # Bardzo krótkie pomiary są zbyt zaszumione, żeby je porównywać procentowo
+                floor = 0.05 if metric == "median_ms" else 16
+                if metrics[metric] > max(base[metric], floor) * threshold:
+                    regressions.append((size, name, metric, base[metric], metrics[metric]))
+    return regressions
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark modelu danych i odświeżania list (bez Tk).")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="liczby obiektów w syntetycznej sieci, np. 1000 10000 100000")
+    parser.add_argument("--repeat", type=int, default=20, help="liczba powtórzeń każdej operacji")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=sorted(OPERATIONS), help="tylko wybrane operacje")
+    parser.add_argument("--memory", type=int, nargs="?", const=1_000_000, metavar="N",
+                        help="dodatkowo zmierz pamięć N encji (domyślnie milion)")
+    parser.add_argument("-o", "--output", help="zapisz wyniki JSON do pliku (np. jako nowy wynik bazowy)")
+    parser.add_argument("--baseline", help="plik JSON z wcześniejszym wynikiem do porównania")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "seed": args.seed,
+                 "repeat": args.repeat, "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": {},
+    }
+    for size in args.sizes:
+        print(f"Sieć {size} obiektów...", file=sys.stderr)
+        report["results"][str(size)] = run_size(size, args.repeat, args.seed, args.only)
+    if args.memory:
+        print(f"Pamięć {args.memory} encji...", file=sys.stderr)
+        report["memory"] = memory_footprint(args.memory)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for size, name, metric, before, after in regressions:
+            print(f"REGRESJA {size:>7} {name}: {metric} {before} -> {after}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("Brak regresji względem wyniku bazowego.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,84 @@
+import numpy as np
+
+KIND_CODES = {"station": 1, "employee": 2, "carrier": 3}  # 0 = brak współrzędnych
+
+
+# --- KOLUMNOWY MAGAZYN WSPÓŁRZĘDNYCH ---
+class CoordinateStore:
+    """Współrzędne encji jednego repozytorium w tablicach float64 indeksowanych id (kolumny lat, lon i rodzaj).
+
+    Magazyn należy do repozytorium, z którym go utworzono, i aktualizuje się wyłącznie ze zdarzeń jego
+    słuchacza - jak wiersze NetworkStore: współrzędne dworca zmienia się na obiekcie (place_marker), a zgłasza
+    przez repo.update. Śledzone są tylko rodzaje z kinds; pozycje znaczników obsady to przesunięcia widoku
+    wokół dworca, nie dane sieci. Operacje hurtowe (granice, odległości, filtry) liczą się wektorowo.
+    """
+
+    def __init__(self, repo, capacity=1024, kinds=("station",)):
+        self.lat = np.full(capacity, np.nan)
+        self.lon = np.full(capacity, np.nan)
+        self.kind = np.zeros(capacity, dtype=np.int8)
+        self.kinds = frozenset(kinds)
+        self.versions = dict.fromkeys(KIND_CODES.values(), 0)  # rodzaj -> licznik zmian (unieważnia cache)
+        self._columns = {}  # rodzaj -> (wersja, ids, lats, lons)
+        for kind in self.kinds:
+            for entity in repo.tables[kind]:
+                self.set(entity, entity.coordinates)
+        repo.listeners.append(self._on_change)
+
+    def _on_change(self, event, entity, rank):
+        if entity.kind not in self.kinds:
+            return
+        if event == "remove":
+            self.set(entity, None)
+        elif event != "move":
+            self.set(entity, entity.coordinates)  # "add" i "update" - także zmiana współrzędnych dworca
+
+    def _grow(self, size):
+        capacity = max(size, 2 * len(self.lat))
+        for name, fill in (("lat", np.nan), ("lon", np.nan), ("kind", 0)):
+            old = getattr(self, name)
+            new = np.full(capacity, fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def set(self, entity, coords):
+        """Zapisuje (lat, lon) encji albo usuwa jej współrzędne (coords=None)."""
+        i = entity.id
+        if i is None:
+            return  # Encja spoza repozytorium - trafi tu przy zdarzeniu "add"
+        if i >= len(self.lat):
+            self._grow(i + 1)
+        code = KIND_CODES[entity.kind]
+        if coords:
+            self.lat[i], self.lon[i] = coords
+            self.kind[i] = code
+        elif self.kind[i] == 0:
+            return
+        else:
+            self.lat[i] = self.lon[i] = np.nan
+            self.kind[i] = 0
+        self.versions[code] += 1
+
+    def get(self, entity_id):
+        if entity_id >= len(self.lat) or self.kind[entity_id] == 0:
+            return None
+        return float(self.lat[entity_id]), float(self.lon[entity_id])
+
+    def columns(self, kind):
+        """(ids, lats, lons) encji danego rodzaju, które mają współrzędne; wynik jest pamiętany do zmiany."""
+        code = KIND_CODES[kind]
+        cached = self._columns.get(code)
+        if cached is not None and cached[0] == self.versions[code]:
+            return cached[1:]
+        ids = np.flatnonzero(self.kind == code)
+        result = (ids, self.lat[ids], self.lon[ids])
+        self._columns[code] = (self.versions[code],) + result
+        return result
+
+    def bounds(self, kinds=("station",)):
+        """((lat_min, lon_min), (lat_max, lon_max)) encji danych rodzajów albo None, gdy żadna nie ma współrzędnych."""
+        mask = np.isin(self.kind, [KIND_CODES[kind] for kind in kinds])
+        if not mask.any():
+            return None
+        lats, lons = self.lat[mask], self.lon[mask]
+        return (float(lats.min()), float(lons.min())), (float(lats.max()), float(lons.max()))
@@ -0,0 +1,147 @@
+import csv
+import json
+import os
+
+EXPORT_FORMATS = ("jsonl", "geojson", "csv")
+ALL_KINDS = ("station", "employee", "carrier")
+CHILD_KINDS = ("employee", "carrier")
+CHUNK_ROWS = 4096  # tyle wierszy składa się w jeden zapis do pliku
+
+# Jeden koder na cały eksport - json.dumps z własnymi opcjami tworzy nowy koder przy każdym wywołaniu
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+_string = json.encoder.encode_basestring  # sam tekst jako literał JSON (bez escapowania znaków spoza ASCII)
+
+# Pole opisujące rolę encji przypisanej do dworca
+ROLE_FIELDS = {"employee": "position", "carrier": "fleet_type"}
+CSV_HEADER = ("kind", "id", "name", "role", "station_id", "station_name")
+
+
+def format_for(path):
+    """Format eksportu odgadnięty z rozszerzenia pliku (domyślnie JSONL)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".geojson", ".json"):
+        return "geojson"
+    if ext == ".csv":
+        return "csv"
+    return "jsonl"
+
+
+def _chunks(lines):
+    """Łączy kolejne wiersze tekstu w większe porcje - mniej wywołań write przy milionach wierszy."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= CHUNK_ROWS:
+            yield "".join(chunk)
+            chunk.clear()
+    if chunk:
+        yield "".join(chunk)
+
+
+class Snapshot:
+    """Listy encji repozytorium z chwili utworzenia - do eksportu w wątku roboczym.
+
+    Tabele repozytorium to słowniki zmieniane w wątku Tk; iterowanie po nich z innego wątku może skończyć
+    się RuntimeError. Kopia list kosztuje jeden wskaźnik na encję, a pola encji są czytane dopiero przy zapisie.
+    """
+
+    def __init__(self, repo):
+        self.tables = {kind: list(table) for kind, table in repo.tables.items()}
+        self.stations = self.tables["station"]
+
+
+# --- GENERATORY WIERSZY ---
+def station_features(stations):
+    """Dworce ze współrzędnymi jako obiekty Feature GeoJSON (Point: [lon, lat]); dworce bez lokalizacji są pomijane."""
+    for station in stations:
+        if not station.coordinates:
+            continue
+        lat, lon = station.coordinates
+        yield {"type": "Feature", "id": station.id,
+               "geometry": {"type": "Point", "coordinates": [lon, lat]},
+               "properties": {"name": station.name, "address": station.address,
+                              "employees": len(station.employees), "carriers": len(station.carriers)}}
+
+
+def child_rows(repo, kinds=CHILD_KINDS):
+    """Krotki CSV_HEADER dla pracowników i klientów, z odwołaniem do dworca (id i nazwa)."""
+    for kind in kinds:
+        role = ROLE_FIELDS[kind]
+        for child in repo.tables[kind]:
+            yield kind, child.id, child.name, getattr(child, role), child.station.id, child.station.name
+
+
+def jsonl_lines(repo, kinds=ALL_KINDS):
+    """Wiersze eksportu JSONL: najpierw dworce, potem pracownicy i klienci (z id dworca)."""
+    if "station" in kinds:
+        for station in repo.stations:
+            lat, lon = station.coordinates if station.coordinates else (None, None)
+            yield _encode({"kind": "station", "id": station.id, "name": station.name, "address": station.address,
+                           "lat": lat, "lon": lon}) + "\n"
+    for kind in kinds:
+        if kind == "station":
+            continue
+        # Wierszy obsady są miliony - składane z szablonu zamiast kodowania słownika (ten sam wynik co _encode)
+        role = ROLE_FIELDS[kind]
+        prefix = f'{{"kind": "{kind}", "id": '
+        for child in repo.tables[kind]:
+            yield (f'{prefix}{child.id}, "name": {_string(child.name)}, "{role}": {_string(getattr(child, role))}, '
+                   f'"station_id": {child.station.id}}}\n')
+
+
+# --- ZAPIS ---
+def write_geojson(repo, out):
+    """Zapisuje dworce jako FeatureCollection strumieniowo (bez budowania całego dokumentu w pamięci)."""
+    count = 0
+
+    def _lines():
+        nonlocal count
+        for feature in station_features(repo.stations):
+            yield ("\n" if not count else ",\n") + _encode(feature)
+            count += 1
+
+    out.write('{"type": "FeatureCollection", "features": [')
+    for chunk in _chunks(_lines()):
+        out.write(chunk)
+    out.write("\n]}\n")
+    return count
+
+
+def write_csv(repo, out, kinds=CHILD_KINDS):
+    """Zapisuje pracowników i klientów jako CSV z nagłówkiem CSV_HEADER; out otwarty z newline=""."""
+    writer = csv.writer(out)
+    writer.writerow(CSV_HEADER)
+    count = 0
+    for kind in kinds:
+        writer.writerows(child_rows(repo, (kind,)))
+        count += len(repo.tables[kind])
+    return count
+
+
+def write_jsonl(repo, out, kinds=ALL_KINDS):
+    """Zapisuje encje jako JSONL - jeden obiekt w wierszu."""
+    count = 0
+    for chunk in _chunks(jsonl_lines(repo, kinds)):
+        out.write(chunk)
+        count += chunk.count("\n")  # Znaki nowej linii w tekstach są w JSON zapisane jako \n
+    return count
+
+
+def export(repo, out, fmt="jsonl", kinds=None):
+    """Eksport w jednym z EXPORT_FORMATS; zwraca liczbę zapisanych obiektów.
+
+    geojson obejmuje dworce, csv pracowników i klientów, jsonl wszystkie rodzaje (kinds zawęża zakres).
+    """
+    if fmt == "geojson":
+        return write_geojson(repo, out)
+    if fmt == "csv":
+        return write_csv(repo, out, [kind for kind in kinds or CHILD_KINDS if kind != "station"])
+    if fmt == "jsonl":
+        return write_jsonl(repo, out, kinds or ALL_KINDS)
+    raise ValueError(f"Nieznany format eksportu: {fmt}")
+
+
+def export_file(repo, path, fmt=None, kinds=None):
+    """Eksport do pliku; format domyślnie z rozszerzenia (format_for)."""
+    with open(path, "w", encoding="utf-8", newline="") as out:
+        return export(repo, out, fmt or format_for(path), kinds)
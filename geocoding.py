@@ -0,0 +1,339 @@
+import abc
+import bisect
+import csv
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import METRICS
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer_pl.csv")
+GEOCODE_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "geocode_cache.sqlite3")
+
+
+def build_query(address):
+    """Dokleja kraj do adresu, jeśli użytkownik go nie podał."""
+    if "polska" not in address.lower() and "poland" not in address.lower():
+        return f"{address}, Polska"
+    return address
+
+
+# --- CACHE GEOKODOWANIA ---
+class GeocodeCache:
+    """Trwały (SQLite) cache wyników geokodowania z TTL, limitem LRU i zapamiętywaniem porażek."""
+
+    MISS = object()  # Znacznik braku wpisu (różny od None, które oznacza "nie znaleziono")
+
+    def __init__(self, path, ttl=30 * 24 * 3600, negative_ttl=24 * 3600, max_entries=50_000, memory_entries=4096):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # klucz -> (coords lub None, expires_at)
+        self._touched = {}  # klucz -> last_used, zapisywane do bazy paczkami
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS geocode (
+                query TEXT PRIMARY KEY,
+                lat REAL,
+                lon REAL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS geocode_last_used ON geocode(last_used)")
+        self._db.commit()
+
+    @staticmethod
+    def normalize(query):
+        """Sprowadza zapytanie do postaci kanonicznej (małe litery, pojedyncze spacje, bez interpunkcji)."""
+        query = re.sub(r"[^\w]+", " ", query.lower())
+        return " ".join(query.split())
+
+    def get(self, query, count=True):
+        """Zwraca [lat, lon], None (zapamiętana porażka) albo GeocodeCache.MISS."""
+        key = self.normalize(query)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                row = self._db.execute("SELECT lat, lon, expires_at FROM geocode WHERE query = ?", (key,)).fetchone()
+                if row is not None:
+                    coords = [row[0], row[1]] if row[0] is not None else None
+                    entry = (coords, row[2])
+                    self._remember(key, entry)
+            else:
+                self._memory.move_to_end(key)
+
+            if entry is None or entry[1] < now:
+                if count:
+                    self.misses += 1
+                return self.MISS
+
+            if count:
+                self.hits += 1
+            self._touched[key] = now
+            if len(self._touched) >= 256:
+                self._flush_touched()
+            return list(entry[0]) if entry[0] else None
+
+    def put(self, query, coords):
+        """Zapisuje wynik geokodowania; coords=None zapamiętuje porażkę na krótszy czas."""
+        key = self.normalize(query)
+        now = time.time()
+        expires_at = now + (self.ttl if coords else self.negative_ttl)
+        lat, lon = (coords[0], coords[1]) if coords else (None, None)
+        with self._lock:
+            self._remember(key, ([lat, lon] if coords else None, expires_at))
+            self._touched.pop(key, None)
+            self._db.execute("INSERT OR REPLACE INTO geocode (query, lat, lon, expires_at, last_used) "
+                             "VALUES (?, ?, ?, ?, ?)", (key, lat, lon, expires_at, now))
+            self._flush_touched()
+            self._evict()
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "entries": size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._db.commit()
+            self._db.close()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _flush_touched(self):
+        if self._touched:
+            self._db.executemany("UPDATE geocode SET last_used = ? WHERE query = ?",
+                                 [(t, k) for k, t in self._touched.items()])
+            self._touched.clear()
+            self._db.commit()  # Bez zatwierdzenia get() trzymałby otwartą transakcję zapisu (blokada pliku)
+
+    def _evict(self):
+        """Usuwa przeterminowane wpisy i najdawniej używane ponad limit max_entries."""
+        self._db.execute("DELETE FROM geocode WHERE expires_at < ?", (time.time(),))
+        excess = self._db.execute("SELECT COUNT(*) FROM geocode").fetchone()[0] - self.max_entries
+        if excess > 0:
+            evicted = self._db.execute("SELECT query FROM geocode ORDER BY last_used LIMIT ?", (excess,)).fetchall()
+            self._db.executemany("DELETE FROM geocode WHERE query = ?", evicted)
+            for (key,) in evicted:
+                self._memory.pop(key, None)
+
+
+# --- BACKENDY GEOKODOWANIA ---
+class Geocoder(abc.ABC):
+    """Interfejs backendu geokodowania."""
+
+    @abc.abstractmethod
+    def geocode(self, query):
+        """Zwraca [lat, lon] albo None; błąd sieci/usługi zgłasza wyjątkiem (wynik nie trafi do cache)."""
+
+
+class LazyGeocoder(Geocoder):
+    """Tworzy właściwy backend (gazetteer, klient Nominatim) dopiero przy pierwszym zapytaniu - nie przy starcie."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._geocoder = None
+        self._lock = threading.Lock()
+
+    def geocode(self, query):
+        if self._geocoder is None:
+            with self._lock:
+                if self._geocoder is None:
+                    self._geocoder = self.factory()
+        return self._geocoder.geocode(query)
+
+
+class RateLimiter:
+    """Ogranicza liczbę żądań do jednego na `interval` sekund, wspólnie dla wszystkich wątków."""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# Polityka Nominatim: maksymalnie 1 żądanie na sekundę z jednej aplikacji
+NOMINATIM_LIMITER = RateLimiter(1.0)
+
+
+class NominatimGeocoder(Geocoder):
+    """Geokodowanie sieciowe przez geopy/Nominatim, z globalnym limitem żądań."""
+
+    def __init__(self, user_agent, timeout=10, limiter=NOMINATIM_LIMITER):
+        from geopy.geocoders import Nominatim
+        self.client = Nominatim(user_agent=user_agent)
+        self.timeout = timeout
+        self.limiter = limiter
+
+    def geocode(self, query):
+        self.limiter.wait()
+        location = self.client.geocode(query, timeout=self.timeout)
+        if location:
+            return [location.latitude, location.longitude]
+        return None
+
+
+class GazetteerGeocoder(Geocoder):
+    """Geokodowanie offline z lokalnego pliku miejscowości i dworców (indeks tokenów w pamięci).
+
+    Dworzec jest zwracany, gdy wszystkie słowa jego nazwy występują w zapytaniu; miejscowość tylko wtedy,
+    gdy zapytanie nie zawiera nic poza nią (np. ulicy) - wtedy decyzję zostawiamy kolejnemu backendowi.
+    """
+
+    STOPWORDS = frozenset({"polska", "poland", "dworzec", "stacja", "pkp", "ul", "al", "pl", "os"})
+    MIN_PREFIX = 4  # Minimalna długość skrótu dopasowywanego jako prefiks ("centr" -> "centralna")
+
+    def __init__(self, path):
+        self.entries = []  # (nazwa, rodzaj, [lat, lon], tokeny)
+        self.index = {}  # token -> set(indeksów wpisów)
+        with open(path, encoding="utf-8") as f:
+            rows = csv.DictReader((line for line in f if not line.startswith("#")), delimiter=";")
+            for row in rows:
+                tokens = frozenset(self.tokenize(row["name"]))
+                entry_id = len(self.entries)
+                self.entries.append((row["name"], row["kind"], [float(row["lat"]), float(row["lon"])], tokens))
+                for token in tokens:
+                    self.index.setdefault(token, set()).add(entry_id)
+        self.sorted_tokens = sorted(self.index)
+
+    @classmethod
+    def tokenize(cls, text):
+        text = text.lower().replace("ł", "l")
+        text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+        return [t for t in re.split(r"[^a-z0-9]+", text) if t and t not in cls.STOPWORDS]
+
+    def _expand(self, token):
+        """Tokeny indeksu pasujące do tokenu zapytania: dokładnie lub (dla dłuższych) jako prefiks."""
+        if len(token) < self.MIN_PREFIX:
+            return [token] if token in self.index else []
+        # Tokeny z prefiksem tworzą ciągły zakres posortowanej listy - dwa wyszukiwania binarne, bez kopii ogona
+        start = bisect.bisect_left(self.sorted_tokens, token)
+        end = bisect.bisect_left(self.sorted_tokens, token + "\U0010ffff", start)
+        return self.sorted_tokens[start:end]
+
+    def geocode(self, query):
+        query_tokens = set(self.tokenize(query))
+        matched = {}  # indeks wpisu -> zbiór dopasowanych tokenów wpisu
+        used = Counter()  # indeks wpisu -> liczba tokenów zapytania pokrytych przez wpis
+        for q_token in query_tokens:
+            hit_entries = set()
+            for token in self._expand(q_token):
+                for entry_id in self.index[token]:
+                    matched.setdefault(entry_id, set()).add(token)
+                    hit_entries.add(entry_id)
+            for entry_id in hit_entries:
+                used[entry_id] += 1
+
+        best, best_key = None, None
+        for entry_id, tokens in matched.items():
+            name, kind, coords, entry_tokens = self.entries[entry_id]
+            if tokens != entry_tokens:
+                continue
+            if kind != "station" and used[entry_id] < len(query_tokens):
+                continue
+            key = (kind == "station", len(entry_tokens))
+            if best_key is None or key > best_key:
+                best, best_key = coords, key
+        return list(best) if best else None
+
+
+class ChainGeocoder(Geocoder):
+    """Pyta kolejne backendy, aż któryś znajdzie lokalizację (np. gazetteer, a potem Nominatim)."""
+
+    def __init__(self, backends):
+        self.backends = backends
+
+    def geocode(self, query):
+        for backend in self.backends:
+            coords = backend.geocode(query)
+            if coords:
+                return coords
+        return None
+
+
+# --- GEOKODOWANIE W TLE ---
+
+
+class GeocodeWorker:
+    """Pula wątków geokodujących; wyniki trafiają do kolejki odbieranej w wątku Tk przez poll()."""
+
+    def __init__(self, geocoder, cache, workers=2):
+        self.geocoder = geocoder  # Geocoder - geocode(query) zwraca [lat, lon] lub None, może rzucić wyjątek
+        self.cache = cache
+        self.results = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="geocode")
+
+    def submit(self, query, callback):
+        """Zleca geokodowanie; callback(coords, error) zostanie wywołany w wątku wywołującym poll()."""
+        cached = self.cache.get(query)
+        if cached is not GeocodeCache.MISS:
+            self.post(callback, cached, None)
+            return
+        self._executor.submit(self._run, query, callback)
+
+    def post(self, callback, *args):
+        """Kolejkuje wywołanie callback(*args) do wykonania w wątku wywołującym poll() (bezpieczne z wątków)."""
+        self.results.put((callback, args))
+
+    def poll(self):
+        """Przekazuje gotowe wyniki do callbacków; zwraca liczbę obsłużonych wyników."""
+        handled = 0
+        while True:
+            try:
+                callback, args = self.results.get_nowait()
+            except queue.Empty:
+                return handled
+            callback(*args)
+            handled += 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, query, callback):
+        # Zapytanie mogło trafić do cache, gdy czekało w kolejce (np. duplikat)
+        cached = self.cache.get(query, count=False)
+        if cached is not GeocodeCache.MISS:
+            self.post(callback, cached, None)
+            return
+        try:
+            with METRICS.timer("geocode.backend"):
+                coords = self.geocoder.geocode(query)
+        except Exception as e:
+            self.post(callback, None, e)
+            return
+        self.cache.put(query, coords)
+        self.post(callback, coords, None)
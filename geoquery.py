@@ -0,0 +1,60 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Odległości (km) od punktu (lat, lon) do tablic lats/lons - wszystko w stopniach, obliczenia wektorowe."""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+# --- ZAPYTANIA O DWORCE ---
+class StationQuery:
+    """Najbliższe dworce i dworce w promieniu, liczone wektorowo na kolumnach CoordinateStore.
+
+    Lista obiektów odpowiadająca kolumnom jest odtwarzana tylko wtedy, gdy zmieniły się współrzędne dworców.
+    """
+
+    def __init__(self, repo, coords):
+        self.repo = repo
+        self.coords = coords
+        self._ids = None
+        self._stations = []
+
+    def _arrays(self):
+        ids, lats, lons = self.coords.columns("station")
+        if ids is not self._ids:
+            get = self.repo.stations.get
+            self._stations = [get(int(i)) for i in ids]
+            self._ids = ids
+        return self._stations, lats, lons
+
+    def nearest(self, lat, lon, n=5):
+        """Lista [(dworzec, km)] n najbliższych dworców, od najbliższego."""
+        stations, lats, lons = self._arrays()
+        if not stations:
+            return []
+        dist = haversine_km(lat, lon, lats, lons)
+        n = min(n, len(stations))
+        idx = np.argpartition(dist, n - 1)[:n]
+        idx = idx[np.argsort(dist[idx])]
+        return [(stations[i], float(dist[i])) for i in idx]
+
+    def within(self, lat, lon, radius_km):
+        """Lista [(dworzec, km)] dworców w promieniu radius_km, od najbliższego."""
+        stations, lats, lons = self._arrays()
+        if not stations:
+            return []
+        # Wstępne odsianie prostokątem (1° szerokości ~ 111 km), dopiero potem dokładna odległość
+        dlat = radius_km / 111.0
+        dlon = radius_km / (111.0 * max(np.cos(np.radians(lat)), 0.01))
+        idx = np.nonzero((np.abs(lats - lat) <= dlat) & (np.abs(lons - lon) <= dlon))[0]
+        dist = haversine_km(lat, lon, lats[idx], lons[idx])
+        keep = dist <= radius_km
+        idx, dist = idx[keep], dist[keep]
+        order = np.argsort(dist)
+        return [(stations[idx[i]], float(dist[i])) for i in order]
+
@@ -0,0 +1,131 @@
+import csv
+import json
+import os
+
+from geocoding import GeocodeCache, build_query
+
+NAME_COLUMNS = ("name", "nazwa")
+ADDRESS_COLUMNS = ("address", "adres")
+
+
+# --- WCZYTYWANIE PLIKÓW ---
+def _pick(row, columns):
+    for column in columns:
+        value = row.get(column)
+        if value:
+            return value.strip()
+    return ""
+
+
+def read_records(path):
+    """Strumieniowo czyta dworce z pliku CSV lub JSONL; zwraca słowniki {name, address}."""
+    with open(path, encoding="utf-8-sig", newline="") as f:  # -sig: BOM z eksportu CSV w Excelu
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            sample = f.read(4096)
+            f.seek(0)
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            rows = ({k.strip().lower(): v for k, v in row.items() if k} for row in csv.DictReader(f, dialect=dialect))
+
+        for row in rows:
+            name, address = _pick(row, NAME_COLUMNS), _pick(row, ADDRESS_COLUMNS)
+            if name and address:
+                yield {"name": name, "address": address}
+
+
+def station_query(record):
+    """Zapytanie geokodujące dla dworca - to samo, którego używa formularz w App.add_station."""
+    return build_query(f"{record['name']}, {record['address']}")
+
+
+# --- POTOK IMPORTU ---
+def checkpoint_for(path):
+    """Plik kontrolny importu danego pliku - w katalogu tymczasowym, nie obok pliku użytkownika."""
+    import hashlib
+    import tempfile
+
+    key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    directory = os.path.join(tempfile.gettempdir(), "pop_dworce_import")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{os.path.basename(path)}.{key}.checkpoint")
+
+
+class ImportPipeline:
+    """Geokoduje rekordy paczkami: deduplikacja adresów, limit żądań, postęp i wznawianie z pliku kontrolnego."""
+
+    def __init__(self, geocoder, cache, checkpoint_path=None, batch_size=50, progress=None):
+        self.geocoder = geocoder  # Geocoder; limit żądań egzekwuje sam backend (np. NominatimGeocoder)
+        self.cache = cache
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.progress = progress  # progress(done, total) wywoływane po każdej paczce
+        self.resolved = {}  # znormalizowane zapytanie -> coords lub None
+        self.errors = 0
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            self._load_checkpoint()
+
+    def run(self, records, cancel=None):
+        """Generator par (rekord, coords); coords=None oznacza nieudane geokodowanie."""
+        groups = {}  # zapytanie -> rekordy o tym samym adresie
+        for record in records:
+            groups.setdefault(GeocodeCache.normalize(station_query(record)), []).append(record)
+
+        queries = list(groups)
+        total = len(queries)
+        for start in range(0, total, self.batch_size):
+            if cancel is not None and cancel.is_set():
+                return
+            batch = queries[start:start + self.batch_size]
+            resolved = self._resolve_batch(batch, groups)
+            for key in batch:
+                if key in resolved:
+                    for record in groups[key]:
+                        yield record, resolved[key]
+            if self.progress:
+                self.progress(min(start + len(batch), total), total)
+
+    def _resolve_batch(self, batch, groups):
+        results = {}
+        fresh = []
+        for key in batch:
+            if key in self.resolved:
+                results[key] = self.resolved[key]
+                continue
+            query = station_query(groups[key][0])
+            coords = self.cache.get(query)
+            if coords is GeocodeCache.MISS:
+                try:
+                    coords = self.geocoder.geocode(query)
+                except Exception:
+                    # Błąd sieci nie trafia do pliku kontrolnego - wznowienie spróbuje ponownie; liczbę błędów
+                    # raportuje wywołujący (errors), bez wypisywania na konsolę z wątku roboczego
+                    self.errors += 1
+                    continue
+                self.cache.put(query, coords)
+            results[key] = self.resolved[key] = coords
+            fresh.append(key)
+        self._save_checkpoint(fresh)
+        return results
+
+    def discard_checkpoint(self):
+        """Usuwa plik kontrolny po zakończonym przebiegu - nie ma już czego wznawiać."""
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def _load_checkpoint(self):
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Niedokończona linia po przerwaniu zapisu
+                self.resolved[entry["query"]] = entry["coords"]
+
+    def _save_checkpoint(self, keys):
+        if not self.checkpoint_path or not keys:
+            return
+        with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+            for key in keys:
+                f.write(json.dumps({"query": key, "coords": self.resolved[key]}, ensure_ascii=False) + "\n")
+
@@ -0,0 +1,57 @@
+import heapq
+import math
+
+import numpy as np
+
+RING_RADIUS = 0.0005  # Promień pierwszego pierścienia wokół dworca, w stopniach
+RING_SLOTS = 8  # Liczba pozycji na każdym pierścieniu (co 45°)
+
+
+def ring_offset(slot):
+    """Przesunięcie (dlat, dlon) dla pozycji `slot` na pierścieniach wokół dworca."""
+    radius = RING_RADIUS * (1 + slot // RING_SLOTS)
+    angle = math.radians((slot % RING_SLOTS) * 360 / RING_SLOTS)
+    return radius * math.cos(angle), radius * math.sin(angle)
+
+
+def ring_positions(center, slots):
+    """Współrzędne (n x 2) wielu pozycji naraz wokół punktu `center` - jeden przebieg wektorowy."""
+    slots = np.asarray(slots, dtype=np.int64)
+    radius = RING_RADIUS * (1 + slots // RING_SLOTS)
+    angle = np.radians((slots % RING_SLOTS) * (360 / RING_SLOTS))
+    return np.column_stack((center[0] + radius * np.cos(angle), center[1] + radius * np.sin(angle)))
+
+
+# --- PRZYDZIAŁ POZYCJI ---
+class SlotAllocator:
+    """Pozycje na pierścieniach wokół jednego dworca, przydzielane i zwalniane w O(log n).
+
+    Zwolnione pozycje trafiają na kopiec (min-heap) i są przydzielane ponownie przed nowymi, od najbliższej
+    dworcowi - ukrywanie i pokazywanie znaczników zapełnia najpierw wewnętrzne pierścienie i nie nakłada
+    dwóch znaczników na to samo miejsce.
+    """
+
+    __slots__ = ("_next", "_free", "used")
+
+    def __init__(self):
+        self._next = 0  # pierwsza jeszcze nigdy nieprzydzielona pozycja
+        self._free = []
+        self.used = 0
+
+    def acquire(self):
+        self.used += 1
+        if self._free:
+            return heapq.heappop(self._free)
+        self._next += 1
+        return self._next - 1
+
+    def release(self, slot):
+        self.used -= 1
+        if self.used == 0:
+            # Wszystko ukryte - kolejne znaczniki znowu zaczną od pierwszego pierścienia
+            self._next = 0
+            self._free.clear()
+        elif slot == self._next - 1:
+            self._next -= 1
+        else:
+            heapq.heappush(self._free, slot)
@@ -1,98 +1,68 @@
+import time
+_STARTUP_T0 = time.perf_counter()  # Początek startu - do raportu czasów uruchamiania
+
 import tkinter
 from tkinter import *
-from tkinter import ttk, messagebox
-from geopy.geocoders import Nominatim
-import tkintermapview
-import time
+from tkinter import ttk, messagebox, filedialog, simpledialog
 
 from ttkthemes import ThemedTk
 
-import math
-
-
-# --- GŁÓWNA KLASA DANYCH ---
-class Entity:
-    """Klasa bazowa dla wszystkich obiektów w systemie."""
-
-    def __init__(self, name, app_instance):
-        self.name = name
-        self.app = app_instance  # Referencja do głównej aplikacji
-        self.marker = None
-        self.coordinates = None
-
-    def place_marker(self, map_widget, text, coords):
-        self.remove_marker()  # Usuń stary marker, jeśli istnieje
-        self.coordinates = coords
-        if self.coordinates:
-            self.marker = map_widget.set_marker(
-                self.coordinates[0],
-                self.coordinates[1],
-                text=text,
-                font=("Helvetica", 8),
-                text_color="white",
-                marker_color_circle="black",
-                marker_color_outside="gray60",
-                command=self.show_details
-            )
-
-    def remove_marker(self):
-        if self.marker:
-            self.marker.delete()
-            self.marker = None
-            self.coordinates = None
-
-    def show_details(self, marker=None):
-        """Metoda wywoływana po kliknięciu znacznika lub przycisku."""
-        self.app.show_entity_details(self)
-
-    def __str__(self):
-        return self.name
-
-
-class Station(Entity):
-    """Przechowuje dane o dworcu kolejowym."""
+import os
+import sys
+import threading
+from contextlib import contextmanager, nullcontext
 
-    def __init__(self, name, address, app_instance):
-        super().__init__(name, app_instance)
-        self.address = address
-        self.employees = []
-        self.carriers = []
+import exporter
+from geocoding import (GAZETTEER_PATH, GEOCODE_CACHE_PATH, ChainGeocoder, GazetteerGeocoder, GeocodeCache,
+                       GeocodeWorker, LazyGeocoder, NominatimGeocoder, build_query)
+from maplayer import MarkerLayer
+from metrics import METRICS
+from models import Carrier, Employee, Entity, Station
+from search import PrefixIndex, PrefixView, TrigramIndex, fold
+from services import NetworkService
+from storage import NETWORK_DB_PATH, NetworkStore
+from tiles import TILES_PATH, MBTilesStore, prefetch
+from views import VirtualList
 
-    def place_marker(self, map_widget, coords):
-        super().place_marker(map_widget, self.name, coords)
-
-
-class Employee(Entity):
-    """Przechowuje dane o pracowniku przypisanym do dworca."""
-
-    def __init__(self, name, position, station, app_instance):
-        super().__init__(name, app_instance)
-        self.position = position
-        self.station = station
-
-
-class Carrier(Entity):
-    """Przechowuje dane o kliencie (przewoźniku) przypisanym do dworca."""
-
-    def __init__(self, name, fleet_type, station, app_instance):
-        super().__init__(name, app_instance)
-        self.fleet_type = fleet_type
-        self.station = station
+_IMPORTS_DONE = time.perf_counter()
 
 
 # --- GŁÓWNA KLASA APLIKACJI ---
 class App(ThemedTk):
-    def __init__(self):
+    def __init__(self, print_startup_report=False, prefetch_server=None):
+        self._startup = [("importy", _IMPORTS_DONE - _STARTUP_T0)]  # (etap, sekundy od początku startu)
+        self._startup_done = False
+        self.print_startup_report = print_startup_report
+        self.prefetch_server = prefetch_server  # serwer kafelków dopuszczający pobieranie hurtowe (None - brak)
         super().__init__()
         self.set_theme("arc")
+        self._mark_startup("okno i motyw")
 
         self.title("System Zarządzania Siecią Dworców")
         self.geometry("1500x900")
 
-        self.all_stations = []
-        self.all_employees = []
-        self.all_carriers = []
-        self.geolocator = Nominatim(user_agent=f"station_mapper_{int(time.time())}")
+        # Geokoder powstaje przy pierwszym zapytaniu (zwykle długo po starcie)
+        self.geolocator = LazyGeocoder(self._create_geolocator)
+        self.geocache = GeocodeCache(GEOCODE_CACHE_PATH)
+        self.geocoder = GeocodeWorker(self.geolocator, self.geocache)
+        self.tile_store = MBTilesStore(TILES_PATH)  # kafelki mapy pobrane wcześniej - działają bez sieci
+        # Cała logika sieci (tworzenie, zmiany, usuwanie, zapis) jest w warstwie usług, App tylko ją wyświetla
+        self.service = NetworkService(store=NetworkStore(NETWORK_DB_PATH), geocoder=self.geolocator,
+                                      cache=self.geocache)
+        Entity.app = self  # Kliknięcie znacznika encji otwiera szczegóły w tym oknie
+        self.repo, self.store, self.station_query = self.service.repo, self.service.store, self.service.query
+        self.repo.listeners.append(self._on_model_change)
+        # Filtry list: indeks prefiksów nazw dla każdego rodzaju encji i bieżący filtr (None = pełna lista)
+        self.prefix_indexes = {kind: PrefixIndex(self.repo, kind) for kind in self.repo.tables}
+        self._filters = dict.fromkeys(self.repo.tables)
+        self._filter_vars = {}
+        self.trigram_index = TrigramIndex(self.repo)
+        self._station_names_dirty = True  # Czy trzeba przepisać listy dworców w comboboxach
+        self._station_combos = []  # comboboxy wyboru dworca z już zbudowanych zakładek
+        self._refresh_job = None  # zaplanowane (after_idle) odświeżenie list
+        self._import_cancel = threading.Event()  # przerywa import w tle przy zamykaniu okna
+        self._batch_depth = 0
+        self._mark_startup("model i baza")
 
         main_frame = ttk.Frame(self, padding=10)
         main_frame.pack(fill=BOTH, expand=True)
@@ -102,6 +72,19 @@ class App(ThemedTk):
         right_frame = ttk.Frame(main_frame)
         right_frame.pack(side=LEFT, fill=BOTH, expand=True)
 
+        ttk.Button(left_frame, text="Szukaj wszędzie... (Ctrl+F)", command=self.open_search).pack(fill=X, pady=(0, 5))
+        self.bind("<Control-f>", lambda e: self.open_search())
+        history_frame = ttk.Frame(left_frame)
+        history_frame.pack(fill=X, pady=(0, 5))
+        ttk.Button(history_frame, text="Cofnij (Ctrl+Z)", command=self.undo).pack(side=LEFT, fill=X, expand=True)
+        ttk.Button(history_frame, text="Ponów (Ctrl+Y)", command=self.redo).pack(side=LEFT, fill=X, expand=True)
+        self.bind("<Control-z>", lambda e: self.undo())
+        self.bind("<Control-y>", lambda e: self.redo())
+        self.export_btn = ttk.Button(left_frame, text="Eksportuj sieć...", command=self.export_network)
+        self.export_btn.pack(fill=X, pady=(0, 5))
+        ttk.Button(left_frame, text="Diagnostyka", command=self.show_diagnostics).pack(fill=X, pady=(0, 5))
+        self.prefetch_btn = ttk.Button(left_frame, text="Pobierz mapę offline", command=self.prefetch_map_tiles)
+        self.prefetch_btn.pack(fill=X, pady=(0, 5))
         self.notebook = ttk.Notebook(left_frame)
         self.notebook.pack(fill=Y, expand=True)
 
@@ -110,43 +93,260 @@ class App(ThemedTk):
         status_bar.pack(side=BOTTOM, fill=X)
         self.set_status("Gotowy do pracy.")
 
-        self.create_stations_tab()
-        self.create_employees_tab()
-        self.create_clients_tab()
+        # Widoczna jest tylko pierwsza zakładka - pozostałe budują się przy pierwszym wyborze
+        self._views = dict.fromkeys(self.repo.tables)
+        self._tabs = {}  # rodzaj -> (ramka zakładki, funkcja budująca albo None po zbudowaniu)
+        for kind, text, build in (("station", "Dworce", self.create_stations_tab),
+                                  ("employee", "Pracownicy", self.create_employees_tab),
+                                  ("carrier", "Klienci", self.create_clients_tab)):
+            tab = ttk.Frame(self.notebook, padding=10)
+            self.notebook.add(tab, text=text)
+            self._tabs[kind] = (tab, build)
+        self._ensure_tab("station")
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+
+        # Mapa (import tkintermapview i pierwsze kafelki) powstaje, gdy okno jest już widoczne
+        self.map_frame = ttk.LabelFrame(right_frame, text="Mapa Interaktywna")
+        self.map_frame.pack(fill=BOTH, expand=True)
+        self._map_placeholder = ttk.Label(self.map_frame, text="Ładowanie mapy...", anchor=CENTER)
+        self._map_placeholder.pack(fill=BOTH, expand=True)
+        METRICS.gauge("geocode_cache", self.geocache.stats)
+        METRICS.gauge("entities", lambda: {kind: len(table) for kind, table in self.repo.tables.items()})
+        METRICS.gauge("startup_s", lambda: dict(self._startup))
 
-        map_frame = ttk.LabelFrame(right_frame, text="Mapa Interaktywna")
-        map_frame.pack(fill=BOTH, expand=True)
-        self.map_widget = tkintermapview.TkinterMapView(map_frame, width=900, height=800)
+        self.refresh_all()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self._poll_geocoder()
+        self._mark_startup("interfejs")
+        self.after_idle(self._on_first_idle)
+
+    @staticmethod
+    def _create_geolocator():
+        # Najpierw lokalny gazetteer (offline, natychmiastowy), Nominatim tylko jako rezerwa
+        return ChainGeocoder([
+            GazetteerGeocoder(GAZETTEER_PATH),
+            NominatimGeocoder(user_agent=f"station_mapper_{int(time.time())}"),
+        ])
+
+    # --- START ---
+    def _mark_startup(self, stage):
+        self._startup.append((stage, time.perf_counter() - _STARTUP_T0))
+
+    def _on_first_idle(self):
+        self._mark_startup("okno widoczne")
+        self.after(1, self._build_map)
+
+    def _build_map(self):
+        from mapview import TileMapView  # Ciężki import (tkintermapview, PIL, requests) - dopiero po pokazaniu okna
+
+        self._map_placeholder.destroy()
+        self.map_widget = TileMapView(self.map_frame, width=900, height=800, tile_store=self.tile_store)
         self.map_widget.pack(fill=BOTH, expand=True)
         self.map_widget.set_position(52.23, 21.01)
         self.map_widget.set_zoom(6)
+        # Znaczniki encji trafiają na mapę przez warstwę grupującą je zależnie od przybliżenia
+        self.marker_layer = MarkerLayer(self.map_widget)
+        METRICS.gauge("markers.logical", lambda: len(self.marker_layer.handles))
+        METRICS.gauge("markers.on_map", lambda: self.marker_layer.shown_count)
+        METRICS.gauge("tiles.decoded", lambda: len(self.map_widget.tile_image_cache))
+        self.map_widget.add_right_click_menu_command("Najbliższe dworce", self.show_nearest_stations,
+                                                     pass_coords=True)
+        self.map_widget.add_right_click_menu_command("Dworce w promieniu...", self.show_stations_within,
+                                                     pass_coords=True)
+        self._mark_startup("mapa")
+        self._watch_map()
+        self.after_idle(self._load_network)
+
+    def _startup_report(self):
+        """Czasy kolejnych etapów startu; przy uruchomieniu z --startup-report wypisywane na stderr."""
+        lines, previous = [], 0.0
+        for stage, elapsed in self._startup:
+            lines.append(f"{stage:<16} {elapsed * 1000:8.1f} ms  (+{(elapsed - previous) * 1000:.1f})")
+            previous = elapsed
+        return "\n".join(lines)
+
+    def export_network(self):
+        """Zapisuje sieć do pliku; format wynika z rozszerzenia (JSONL, GeoJSON dworców, CSV obsady)."""
+        path = filedialog.asksaveasfilename(title="Eksportuj sieć", defaultextension=".jsonl",
+                                            filetypes=[("JSONL - cała sieć", "*.jsonl"),
+                                                       ("GeoJSON - dworce", "*.geojson"),
+                                                       ("CSV - pracownicy i klienci", "*.csv")])
+        if not path:
+            return
+        snapshot = exporter.Snapshot(self.repo)  # W wątku Tk - wątek roboczy nie iteruje po tabelach repozytorium
+        name = os.path.basename(path)
+
+        def _finish(count, error):
+            self.export_btn.state(["!disabled"])
+            if error is not None:
+                self.set_status("Nie wyeksportowano sieci.")
+                messagebox.showerror("Błąd eksportu", str(error))
+            else:
+                self.set_status(f"Wyeksportowano {count} obiektów do {name}.")
+
+        def _worker():
+            count, error = 0, None
+            try:
+                with METRICS.timer("export"):
+                    count = exporter.export_file(snapshot, path)
+            except Exception as e:  # Każdy błąd wątku musi wrócić do GUI - inaczej przycisk eksportu zostaje wyłączony
+                error = e
+            finally:
+                self.geocoder.post(_finish, count, error)
+
+        self.export_btn.state(["disabled"])
+        self.set_status(f"Eksport: {name}...")
+        threading.Thread(target=_worker, name="network-export", daemon=True).start()
+
+    # --- HISTORIA ZMIAN ---
+    def undo(self):
+        if not self._require_loaded(): return
+        self._after_history(self.service.undo(), "Cofnięto", "Nie ma zmian do cofnięcia.")
+
+    def redo(self):
+        if not self._require_loaded(): return
+        self._after_history(self.service.redo(), "Ponowiono", "Nie ma zmian do ponowienia.")
+
+    def _after_history(self, touched, verb, empty):
+        """Dopasowuje znaczniki do stanu sieci po cofnięciu lub ponowieniu operacji."""
+        if touched is None:
+            self.set_status(empty)
+            return
+        with self.batch():
+            for entity in touched:
+                if entity not in self.repo.tables[entity.kind]:
+                    entity.remove_marker()
+                elif entity.kind == "station":
+                    if entity.coordinates:
+                        entity.place_marker(self.marker_layer, entity.coordinates)  # Nowa pozycja lub nazwa
+                        self._replace_children(entity)
+                elif entity.marker:
+                    entity.remove_marker()
+                    self._place_entity_offset(entity)
+        self._station_names_dirty = True
+        self.set_status(f"{verb} operację ({len(touched)} obiektów).")
+
+    # --- ZAKŁADKI ---
+    def _ensure_tab(self, kind):
+        """Buduje zawartość zakładki przy pierwszym użyciu; zwraca jej widok listy."""
+        tab, build = self._tabs[kind]
+        if build is not None:
+            self._tabs[kind] = (tab, None)
+            build(tab)
+            self._views[kind] = {"station": self.stations_listbox, "employee": self.employees_listbox,
+                                 "carrier": self.carriers_listbox}[kind]
+            self._views[kind].reset()
+            self._station_names_dirty = True
+            self.refresh_all()
+        return self._views[kind]
+
+    def _on_tab_changed(self, event=None):
+        selected = self.notebook.select()
+        for kind, (tab, _) in self._tabs.items():
+            if str(tab) == selected:
+                self._ensure_tab(kind)
+
+    def on_close(self):
+        self._import_cancel.set()
+        self.geocoder.shutdown()
+        self.service.close()
+        if hasattr(self, "map_widget"):
+            self.map_widget.running = False  # Zatrzymuje wątki ładujące kafelki przed zamknięciem pliku
+        self.tile_store.close()
+        self.destroy()
+
+    def _watch_map(self):
+        """TkinterMapView nie zgłasza zmian przybliżenia, więc warstwa znaczników sprawdza je cyklicznie."""
+        self.marker_layer.update_view()
+        self.after(150, self._watch_map)
+
+    def _require_loaded(self):
+        """False (z komunikatem), dopóki sieć wczytuje się porcjami - zmiana mogłaby dotyczyć niewczytanych encji."""
+        if not self._startup_done:
+            self.set_status("Poczekaj na wczytanie zapisanej sieci...")
+            return False
+        return True
+
+    def _load_network(self):
+        """Wczytuje zapisaną sieć porcjami w kolejnych obrotach pętli Tk - okno działa od pierwszej chwili."""
+        loader = self.store.load(self.repo)
+
+        def _relocate(station):
+            # Dworzec zapisany przed zakończeniem geokodowania (np. po awarii) - spróbuj ponownie
+            def _on_coords(coords):
+                if station not in self.repo.stations:
+                    return
+                if coords:
+                    station.place_marker(self.marker_layer, coords)
+                self.repo.update(station, pending=False)
+
+            self.repo.update(station, pending=True)
+            self.get_coords_from_address(f"{station.name}, {station.address}", _on_coords)
+
+        def _step():
+            try:
+                added = next(loader)
+            except StopIteration:
+                if not self._startup_done:
+                    self._startup_done = True
+                    self._mark_startup("sieć wczytana")
+                    if self.print_startup_report:
+                        print(self._startup_report(), file=sys.stderr)
+                self.set_status(f"Wczytano sieć: {len(self.repo.stations)} dworców, "
+                                f"{len(self.repo.employees)} pracowników, {len(self.repo.carriers)} klientów.")
+                self._build_search_index()
+                return
+            for entity in added:
+                if entity.kind != "station":
+                    continue
+                if entity.coordinates:
+                    entity.place_marker(self.marker_layer, entity.coordinates)
+                else:
+                    _relocate(entity)
+            self.after(1, _step)
 
-        self.refresh_all()
+        self.set_status("Wczytywanie zapisanej sieci...")
+        _step()
 
-    def set_status(self, text):
-        self.status_var.set(text)
+    def _build_search_index(self):
+        """Buduje indeks wyszukiwania rozmytego porcjami po wczytaniu sieci - pierwsze wyszukiwanie nie czeka."""
+        steps = self.trigram_index.build_steps()
 
-    def get_coords_from_address(self, address):
-        try:
-            query = address
-            if "polska" not in address.lower() and "poland" not in address.lower():
-                query = f"{address}, Polska"
+        def _step():
+            if next(steps, StopIteration) is not StopIteration:
+                self.after(1, _step)
+
+        _step()
 
-            self.set_status(f"Lokalizowanie: {query}...")
-            self.update_idletasks()
+    def _poll_geocoder(self):
+        """Odbiera w wątku Tk wyniki geokodowania z wątków roboczych."""
+        self.geocoder.poll()
+        self.after(100, self._poll_geocoder)
 
-            location = self.geolocator.geocode(query, timeout=10)
+    def set_status(self, text):
+        self.status_var.set(text)
 
-            if location:
+    def get_coords_from_address(self, address, callback):
+        """Geokoduje adres w tle; callback(coords) zostanie wywołany w wątku Tk (coords=None przy porażce)."""
+        query = build_query(address)
+        self.set_status(f"Lokalizowanie: {query}...")
+        start = time.perf_counter()
+
+        def _on_result(coords, error):
+            # Czas od zlecenia do odpowiedzi w wątku Tk - razem z kolejką, limitem zapytań i cache
+            METRICS.observe("geocode", (time.perf_counter() - start) * 1000)
+            if error is not None:
+                METRICS.incr("geocode.errors")
+                self.set_status(f"Błąd sieci: {error}")
+            elif coords:
+                METRICS.incr("geocode.found")
                 self.set_status("Lokalizacja znaleziona!")
-                return [location.latitude, location.longitude]
+            else:
+                METRICS.incr("geocode.not_found")
+                self.set_status("Nie znaleziono lokalizacji.")
+            callback(coords)
 
-            self.set_status("Nie znaleziono lokalizacji.")
-            return None
-        except Exception as e:
-            self.set_status(f"Błąd sieci: {e}")
-            print(f"Błąd geolokalizacji: {e}")
-            return None
+        self.geocoder.submit(query, _on_result)
 
     def show_entity_details(self, entity):
         if not entity: return
@@ -185,33 +385,194 @@ class App(ThemedTk):
             messagebox.showwarning("Brak lokalizacji", f"Dworzec '{station.name}' nie ma współrzędnych na mapie.")
             return
 
-        visible_children_count = sum(1 for emp in station.employees if emp.marker) + \
-                                 sum(1 for car in station.carriers if car.marker)
-
-        radius = 0.0005 * (1 + (visible_children_count // 8))
-        angle = (visible_children_count * 45) % 360
-        angle_rad = math.radians(angle)
-
-        lat_offset = radius * math.cos(angle_rad)
-        lon_offset = radius * math.sin(angle_rad)
+        entity.remove_marker()  # Zwalnia poprzednią pozycję, zanim przydzielimy nową
+        self._place_children(station, [entity])
+        self.set_status(f"Pokazano na mapie: {entity.name}")
 
-        new_coords = [station.coordinates[0] + lat_offset, station.coordinates[1] + lon_offset]
+    def _replace_children(self, station):
+        """Przenosi widoczne znaczniki obsady na pierścienie wokół bieżącej pozycji dworca."""
+        shown = [c for c in (*station.employees, *station.carriers) if c.marker]
+        with self.marker_layer.batch():
+            for child in shown:
+                child.remove_marker()
+        self._place_children(station, shown)
+
+    def _place_children(self, station, children):
+        """Umieszcza znaczniki ukrytych dzieci dworca na pozycjach z warstwy usług, jednym przerysowaniem."""
+        positions = self.service.child_positions(station, children)
+        if positions is None:
+            return
+        with self.marker_layer.batch():
+            for child, (slot, coords) in zip(children, positions):
+                child.place_marker(self.marker_layer, self._marker_text(child), coords)
+                child.slot = (station.slots, slot)
 
+    @staticmethod
+    def _marker_text(entity):
         if isinstance(entity, Employee):
-            text = f"Pracownik:\n{entity.name}"
-        elif isinstance(entity, Carrier):
-            text = f"Przewoźnik:\n{entity.name}"
-        else:
-            text = entity.name
+            return f"Pracownik:\n{entity.name}"
+        if isinstance(entity, Carrier):
+            return f"Przewoźnik:\n{entity.name}"
+        return entity.name
+
+    def show_station_children(self, station=None):
+        """Pokazuje naraz wszystkich ukrytych pracowników i klientów dworca - jedno przerysowanie mapy."""
+        station = station or self.stations_listbox.selected_item()
+        if not station: return
+        if not station.coordinates:
+            messagebox.showwarning("Brak lokalizacji", f"Dworzec '{station.name}' nie ma współrzędnych na mapie.")
+            return
 
-        entity.place_marker(self.map_widget, text, new_coords)
-        self.set_status(f"Pokazano na mapie: {entity.name}")
+        hidden = sorted((c for c in (*station.employees, *station.carriers) if not c.marker), key=lambda c: c.id)
+        self._place_children(station, hidden)
+        self.set_status(f"Pokazano na mapie {len(hidden)} obiektów dworca {station.name}")
+
+    def hide_station_children(self, station=None):
+        """Ukrywa naraz wszystkie znaczniki pracowników i klientów dworca."""
+        station = station or self.stations_listbox.selected_item()
+        if not station: return
+
+        shown = [c for c in (*station.employees, *station.carriers) if c.marker]
+        with self.marker_layer.batch():
+            for child in shown:
+                child.remove_marker()
+        self.set_status(f"Ukryto na mapie {len(shown)} obiektów dworca {station.name}")
+
+    # --- ZAPYTANIA PRZESTRZENNE ---
+    def show_nearest_stations(self, coords, count=10):
+        results = self.station_query.nearest(coords[0], coords[1], count)
+        self._show_station_results(f"Najbliższe dworce ({coords[0]:.4f}, {coords[1]:.4f})", results)
+
+    def show_stations_within(self, coords):
+        radius = simpledialog.askfloat("Dworce w promieniu", "Promień [km]:", initialvalue=20.0, minvalue=0.1,
+                                       parent=self)
+        if radius is None:
+            return
+        results = self.station_query.within(coords[0], coords[1], radius)
+        self._show_station_results(f"Dworce w promieniu {radius:g} km", results)
 
-    # --- ZAKŁADKA DWORCE ---
-    def create_stations_tab(self):
-        tab = ttk.Frame(self.notebook, padding=10)
-        self.notebook.add(tab, text="Dworce")
+    def _show_station_results(self, title, results):
+        """Okno z listą [(dworzec, km)]; dwuklik centruje mapę na dworcu."""
+        self.set_status(f"{title}: {len(results)} wyników.")
+        win = Toplevel(self)
+        win.transient(self)
+        win.title(title)
+        listbox = Listbox(win, font=("Helvetica", 9), width=60, height=min(max(len(results), 5), 25))
+        listbox.pack(fill=BOTH, expand=True, padx=10, pady=10)
+        for station, km in results:
+            listbox.insert(END, f"{km:7.2f} km  {station.name} ({station.address})")
+
+        def _focus(event=None):
+            selected = listbox.curselection()
+            if not selected: return
+            self.select_entity(results[selected[0]][0])
+
+        listbox.bind("<Double-Button-1>", _focus)
+        ttk.Button(win, text="Zamknij", command=win.destroy).pack(pady=(0, 10))
+
+    # --- DIAGNOSTYKA ---
+    def show_diagnostics(self):
+        """Okno z licznikami i histogramami czasów (METRICS), odświeżane co sekundę."""
+        win = Toplevel(self)
+        win.transient(self)
+        win.title("Diagnostyka")
+        columns = ("count", "mean", "p50", "p95", "max")
+        tree = ttk.Treeview(win, columns=columns, height=18)
+        tree.heading("#0", text="Metryka")
+        for column, label in zip(columns, ("Liczba", "Średnio [ms]", "p50 [ms]", "p95 [ms]", "Maks. [ms]")):
+            tree.heading(column, text=label)
+            tree.column(column, width=90, anchor=E)
+        tree.column("#0", width=220)
+        tree.pack(fill=BOTH, expand=True, padx=10, pady=10)
+
+        def _refresh():
+            if not win.winfo_exists(): return
+            snapshot = METRICS.snapshot()
+            tree.delete(*tree.get_children())
+            for name, h in sorted(snapshot["histograms"].items()):
+                tree.insert("", END, text=name, values=(h["count"], f"{h['mean_ms']:.2f}", f"{h['p50_ms']:.2f}",
+                                                          f"{h['p95_ms']:.2f}", f"{h['max_ms']:.2f}"))
+            for name, value in sorted(snapshot["counters"].items()):
+                tree.insert("", END, text=name, values=(value, "", "", "", ""))
+            for name, value in sorted(snapshot["gauges"].items()):
+                if isinstance(value, dict):
+                    value = ", ".join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in value.items())
+                tree.insert("", END, text=name, values=(value, "", "", "", ""))
+            win.after(1000, _refresh)
+
+        def _dump():
+            path = filedialog.asksaveasfilename(parent=win, title="Zapisz metryki", defaultextension=".json",
+                                                filetypes=[("JSON", "*.json")])
+            if path:
+                METRICS.dump(path)
+                self.set_status(f"Zapisano metryki: {os.path.basename(path)}")
+
+        btn_frame = ttk.Frame(win)
+        btn_frame.pack(pady=(0, 10))
+        ttk.Button(btn_frame, text="Zapisz JSON...", command=_dump).pack(side=LEFT, padx=5)
+        ttk.Button(btn_frame, text="Wyzeruj", command=METRICS.reset).pack(side=LEFT, padx=5)
+        ttk.Button(btn_frame, text="Zamknij", command=win.destroy).pack(side=LEFT, padx=5)
+        _refresh()
+
+    # --- WYSZUKIWANIE GLOBALNE ---
+    def open_search(self):
+        """Okno wyszukiwania rozmytego po wszystkich polach dworców, pracowników i klientów."""
+        win = Toplevel(self)
+        win.transient(self)
+        win.title("Szukaj wszędzie")
+        query_var = StringVar()
+        entry = ttk.Entry(win, textvariable=query_var, width=60)
+        entry.pack(fill=X, padx=10, pady=(10, 0))
+        entry.focus_set()
+        listbox = Listbox(win, font=("Helvetica", 9), width=70, height=20)
+        listbox.pack(fill=BOTH, expand=True, padx=10, pady=10)
+        labels = {"station": "Dworzec", "employee": "Pracownik", "carrier": "Przewoźnik"}
+        results = []
+        pending = [None]
+
+        def _run():
+            pending[0] = None
+            if not win.winfo_exists(): return
+            if not self.trigram_index.built:
+                self.set_status("Wyszukiwanie: trwa budowanie indeksu...")
+                pending[0] = self.after(300, _run)  # Wynik pojawi się po zbudowaniu indeksu
+                return
+            start = time.perf_counter()
+            results[:] = self.trigram_index.search(query_var.get()) if query_var.get().strip() else []
+            listbox.delete(0, END)
+            for entity, score in results:
+                extra = entity.address if entity.kind == "station" else entity.station.name
+                listbox.insert(END, f"{score:4.2f}  {labels[entity.kind]}: {entity.name} ({extra})")
+            self.set_status(f"Wyszukiwanie: {len(results)} wyników w {(time.perf_counter() - start) * 1000:.0f} ms.")
+
+        def _on_type(*args):
+            # Szukamy dopiero po krótkiej przerwie w pisaniu
+            if pending[0] is not None:
+                self.after_cancel(pending[0])
+            pending[0] = self.after(150, _run)
+
+        def _open(event=None):
+            selected = listbox.curselection()
+            if selected:
+                self.select_entity(results[selected[0]][0])
+
+        query_var.trace_add("write", _on_type)
+        listbox.bind("<Double-Button-1>", _open)
+        entry.bind("<Return>", lambda e: _run())
+        ttk.Button(win, text="Zamknij", command=win.destroy).pack(pady=(0, 10))
+
+    def select_entity(self, entity):
+        """Przełącza na zakładkę encji i zaznacza ją na liście (dworzec dodatkowo pokazuje na mapie)."""
+        if entity not in self.repo.tables[entity.kind]: return
+        self.notebook.select(self._tabs[entity.kind][0])
+        view = self._ensure_tab(entity.kind)
+        self.clear_filter(entity.kind)
+        view.selection_set(entity)
+        if entity.kind == "station":
+            self.focus_on_selected_station()
 
+    # --- ZAKŁADKA DWORCE ---
+    def create_stations_tab(self, tab):
         form = ttk.LabelFrame(tab, text="Formularz Dworca", padding=10)
         form.pack(fill=X)
         ttk.Label(form, text="Nazwa Dworca:").grid(row=0, column=0, sticky=W, padx=5, pady=3)
@@ -222,49 +583,103 @@ class App(ThemedTk):
         self.station_address_entry.grid(row=1, column=1, sticky=EW, padx=5, pady=3)
         self.station_add_btn = ttk.Button(form, text="Dodaj Dworzec", command=self.add_station)
         self.station_add_btn.grid(row=2, column=0, columnspan=2, pady=10)
+        self.station_import_btn = ttk.Button(form, text="Importuj z pliku...", command=self.import_stations)
+        self.station_import_btn.grid(row=3, column=0, columnspan=2)
         form.columnconfigure(1, weight=1)
 
         list_frame = ttk.LabelFrame(tab, text="Lista Dworców", padding=10)
         list_frame.pack(fill=BOTH, expand=True, pady=10)
-        self.stations_listbox = Listbox(list_frame, font=("Helvetica", 9), relief=SUNKEN, bd=1)
+        self._create_filter_entry(list_frame, "station")
+        self.stations_listbox = VirtualList(list_frame, lambda: self._list_items("station"), self._station_row)
         self.stations_listbox.pack(side=LEFT, fill=BOTH, expand=True)
         btn_frame = ttk.Frame(list_frame)
         btn_frame.pack(side=LEFT, fill=Y, padx=5)
         ttk.Button(btn_frame, text="Pokaż na Mapie", command=self.focus_on_selected_station).pack(pady=2, fill=X)
+        ttk.Button(btn_frame, text="Cała Sieć", command=self.fit_map_to_network).pack(pady=2, fill=X)
+        ttk.Button(btn_frame, text="Pokaż Obsadę", command=self.show_station_children).pack(pady=2, fill=X)
+        ttk.Button(btn_frame, text="Ukryj Obsadę", command=self.hide_station_children).pack(pady=2, fill=X)
         # --- NOWY PRZYCISK ---
         ttk.Button(btn_frame, text="Edytuj Zaznaczony", command=self.edit_station).pack(pady=2, fill=X)
         ttk.Button(btn_frame, text="Usuń Zaznaczony", command=self.remove_station).pack(pady=2, fill=X)
 
     def add_station(self):
+        if not self._require_loaded(): return
         name = self.station_name_entry.get()
         address = self.station_address_entry.get()
-        if not name or not address:
-            messagebox.showerror("Błąd", "Nazwa i adres są wymagane.")
+        try:
+            station = self.service.add_station(name, address, pending=True)
+        except ValueError as e:
+            messagebox.showerror("Błąd", str(e))
             return
-
+        operation = self.service.last_operation()  # Wynik geokodowania dołącza do operacji dodania
         full_query = f"{name}, {address}"
-        coords = self.get_coords_from_address(full_query)
-        if not coords:
-            messagebox.showerror("Błąd", f"Nie udało się zlokalizować: {full_query}")
-            return
 
-        station = Station(name, address, self)
-        station.place_marker(self.map_widget, coords)
-        self.all_stations.append(station)
-        self.map_widget.set_position(coords[0], coords[1], marker=False)
-        self.map_widget.set_zoom(16)
+        def _on_coords(coords):
+            if station not in self.repo.stations:
+                return  # Dworzec usunięto, zanim przyszła odpowiedź
+            if not coords:
+                with self.service.amend(operation):
+                    self.service.remove(station)
+                messagebox.showerror("Błąd", f"Nie udało się zlokalizować: {full_query}")
+                return
+            with self.service.amend(operation):
+                station.place_marker(self.marker_layer, coords)
+                self.repo.update(station, pending=False)
+            self.map_widget.set_position(coords[0], coords[1], marker=False)
+            self.map_widget.set_zoom(16)
 
-        self.refresh_all()
         self.station_name_entry.delete(0, END)
         self.station_address_entry.delete(0, END)
+        self.get_coords_from_address(full_query, _on_coords)
+
+    def import_stations(self):
+        """Importuje dworce z pliku CSV/JSONL; geokodowanie odbywa się w osobnym wątku."""
+        if not self._require_loaded(): return
+        path = filedialog.askopenfilename(title="Importuj dworce",
+                                          filetypes=[("CSV / JSONL", "*.csv *.jsonl *.ndjson"), ("Wszystkie", "*.*")])
+        if not path:
+            return
+
+        existing = self.service.station_keys()  # Migawka w wątku Tk - wątek roboczy nie czyta repozytorium
+        cancel = self._import_cancel
+
+        def _progress(done, total):
+            self.geocoder.post(self.set_status, f"Import: zlokalizowano {done}/{total} adresów...")
+
+        def _finish(located, failed, error=None):
+            if cancel.is_set():
+                return  # Okno zamknięte w trakcie importu
+            # Jedno przejście: obiekty Station, znaczniki, jedna transakcja zapisu i pojedyncze odświeżenie list
+            with self.batch():
+                added = self.service.add_located(located)
+                for station in added:
+                    station.place_marker(self.marker_layer, station.coordinates)
+            self.station_import_btn.state(["!disabled"])
+            self.set_status(f"Zaimportowano {len(added)} dworców "
+                            f"(nie zlokalizowano: {failed}, błędy sieci: {self.service.import_errors}).")
+            if error is not None:
+                messagebox.showerror("Błąd importu", str(error))
+
+        def _worker():
+            # Geokodowanie z NetworkService.import_file; dodanie dworców (repozytorium, baza) wraca do wątku Tk
+            located, failed, error = [], 0, None
+            try:
+                located, failed = self.service.locate_file(path, existing, progress=_progress, cancel=cancel)
+            except Exception as e:  # Każdy błąd wątku musi wrócić do GUI - inaczej przycisk importu zostaje wyłączony
+                error = e
+            finally:
+                self.geocoder.post(_finish, located, failed, error)
+
+        self.station_import_btn.state(["disabled"])
+        self.set_status(f"Import: wczytywanie {os.path.basename(path)}...")
+        threading.Thread(target=_worker, name="station-import", daemon=True).start()
 
     def edit_station(self):
-        selected_indices = self.stations_listbox.curselection()
-        if not selected_indices:
+        station_to_edit = self.stations_listbox.selected_item()
+        if not station_to_edit:
             messagebox.showwarning("Brak zaznaczenia", "Proszę wybrać dworzec do edycji.")
             return
 
-        station_to_edit = self.all_stations[selected_indices[0]]
         original_address = station_to_edit.address
 
         # --- Tworzenie okna edycji ---
@@ -290,32 +705,39 @@ class App(ThemedTk):
         def _save_edits():
             new_name = name_entry.get()
             new_address = address_entry.get()
-            if not new_name or not new_address:
+            if not new_name.strip() or not new_address.strip():
                 messagebox.showerror("Błąd", "Nazwa i adres nie mogą być puste.", parent=win)
                 return
 
-            station_to_edit.name = new_name
+            operation = None
+            if self.service.update(station_to_edit, name=new_name):
+                self._station_names_dirty = True
+                operation = self.service.last_operation()  # Nowy adres dołącza do operacji zmiany nazwy
             address_changed = (new_address != original_address)
 
             if address_changed:
                 full_query = f"{new_name}, {new_address}"
-                new_coords = self.get_coords_from_address(full_query)
-                if not new_coords:
-                    messagebox.showerror("Błąd geolokalizacji",
-                                         f"Nie udało się znaleźć nowej lokalizacji dla: {full_query}", parent=win)
-                    return
-
-                station_to_edit.address = new_address
-                station_to_edit.place_marker(self.map_widget, new_coords)  # Ustawia nowy marker dworca
 
-                # Odśwież pozycje znaczników dzieci, jeśli są widoczne
-                for child in station_to_edit.employees + station_to_edit.carriers:
-                    if child.marker:
-                        child.remove_marker()
-                        self._place_entity_offset(child)
+                def _on_coords(new_coords):
+                    if station_to_edit not in self.repo.stations:
+                        return
+                    if not new_coords:
+                        self.repo.update(station_to_edit, pending=False)
+                        messagebox.showerror("Błąd geolokalizacji",
+                                             f"Nie udało się znaleźć nowej lokalizacji dla: {full_query}")
+                        return
+
+                    with self.service.amend(operation):
+                        station_to_edit.place_marker(self.marker_layer, new_coords)  # Ustawia nowy marker dworca
+                        self.repo.update(station_to_edit, address=new_address, pending=False)
+                    self._replace_children(station_to_edit)
+                    self.set_status(f"Zaktualizowano dworzec: {station_to_edit.name}")
+
+                self.repo.update(station_to_edit, pending=True)
+                self.get_coords_from_address(full_query, _on_coords)
+            else:
+                self.set_status(f"Zaktualizowano dworzec: {new_name}")
 
-            self.refresh_all()
-            self.set_status(f"Zaktualizowano dworzec: {new_name}")
             win.destroy()
 
         btn_frame = ttk.Frame(form)
@@ -325,28 +747,22 @@ class App(ThemedTk):
         win.grab_set()
 
     def remove_station(self):
-        selected = self.stations_listbox.curselection()
-        if not selected: return
+        if not self._require_loaded(): return
+        station = self.stations_listbox.selected_item()
+        if not station: return
 
         if messagebox.askyesno("Potwierdzenie",
                                "Czy na pewno chcesz usunąć ten dworzec i wszystkie powiązane obiekty?"):
-            station = self.all_stations[selected[0]]
-
-            for emp in station.employees: emp.remove_marker()
-            for car in station.carriers: car.remove_marker()
-            station.remove_marker()
-
-            self.all_stations.pop(selected[0])
-            self.all_employees = [e for e in self.all_employees if e.station != station]
-            self.all_carriers = [c for c in self.all_carriers if c.station != station]
-
-            self.refresh_all()
+            with self.batch():
+                for emp in station.employees: emp.remove_marker()
+                for car in station.carriers: car.remove_marker()
+                station.remove_marker()
+                self.service.remove(station)  # Usuwa też pracowników i klientów dworca
             self.set_status(f"Usunięto: {station.name}")
 
     def focus_on_selected_station(self):
-        selected = self.stations_listbox.curselection()
-        if not selected: return
-        station = self.all_stations[selected[0]]
+        station = self.stations_listbox.selected_item()
+        if not station: return
         if station.coordinates:
             self.map_widget.set_position(station.coordinates[0], station.coordinates[1])
             self.map_widget.set_zoom(17)
@@ -354,11 +770,60 @@ class App(ThemedTk):
         else:
             self.set_status(f"Brak współrzędnych dla {station.name}")
 
-    # --- ZAKŁADKA PRACOWNICY ---
-    def create_employees_tab(self):
-        tab = ttk.Frame(self.notebook, padding=10)
-        self.notebook.add(tab, text="Pracownicy")
+    def fit_map_to_network(self):
+        """Dopasowuje widok mapy do wszystkich zlokalizowanych dworców (granice liczone na kolumnach współrzędnych)."""
+        bounds = self.service.bounds()
+        if bounds is None:
+            self.set_status("Brak zlokalizowanych dworców.")
+            return
+        (lat_min, lon_min), (lat_max, lon_max) = bounds
+        if lat_max - lat_min < 1e-4 and lon_max - lon_min < 1e-4:
+            self.map_widget.set_position(lat_min, lon_min)
+            self.map_widget.set_zoom(15)
+        else:
+            self.map_widget.fit_bounding_box((lat_max, lon_min), (lat_min, lon_max))
+        self.set_status(f"Widok całej sieci: {len(self.service.coords.columns('station')[0])} dworców.")
+
+    def prefetch_map_tiles(self):
+        """Pobiera w tle kafelki obszaru wszystkich dworców do pliku MBTiles, żeby mapa działała offline."""
+        if not self.prefetch_server:
+            messagebox.showinfo("Mapa offline",
+                                "Pobieranie obszaru wymaga własnego serwera kafelków (zasady OSM nie pozwalają "
+                                "na pobieranie hurtowe z publicznych serwerów).\n\n"
+                                "Uruchom aplikację z opcją --prefetch-server URL, np. "
+                                "--prefetch-server http://127.0.0.1:8089/{z}/{x}/{y}.png")
+            return
+        bounds = self.service.bounds()
+        if bounds is None:
+            self.set_status("Brak zlokalizowanych dworców.")
+            return
+        server = self.prefetch_server
+
+        def _progress(done, total):
+            self.geocoder.post(self.set_status, f"Mapa offline: {done}/{total} kafelków...")
+
+        def _finish(message, error=None):
+            self.prefetch_btn.state(["!disabled"])
+            self.set_status(message)
+            if error is not None:
+                messagebox.showerror("Mapa offline", str(error))
+
+        def _worker():
+            message, error = "Nie pobrano mapy offline.", None
+            try:
+                fetched, absent, errors = prefetch(self.tile_store, bounds, server, progress=_progress)
+                message = f"Mapa offline: pobrano {fetched} kafelków (błędy sieci: {errors})."
+            except Exception as e:  # Każdy błąd wątku musi wrócić do GUI - inaczej przycisk zostaje wyłączony
+                error = e
+            finally:
+                self.geocoder.post(_finish, message, error)
+
+        self.prefetch_btn.state(["disabled"])
+        self.set_status("Mapa offline: sprawdzanie kafelków...")
+        threading.Thread(target=_worker, name="tile-prefetch", daemon=True).start()
 
+    # --- ZAKŁADKA PRACOWNICY ---
+    def create_employees_tab(self, tab):
         form = ttk.LabelFrame(tab, text="Formularz Pracownika", padding=10)
         form.pack(fill=X)
         ttk.Label(form, text="Imię i Nazwisko:").grid(row=0, column=0, sticky=W, padx=5, pady=3)
@@ -370,12 +835,14 @@ class App(ThemedTk):
         ttk.Label(form, text="Przypisz do dworca:").grid(row=2, column=0, sticky=W, padx=5, pady=3)
         self.emp_station_combo = ttk.Combobox(form, state="readonly")
         self.emp_station_combo.grid(row=2, column=1, sticky=EW, padx=5, pady=3)
+        self._station_combos.append(self.emp_station_combo)
         ttk.Button(form, text="Dodaj Pracownika", command=self.add_employee).grid(row=3, columnspan=2, pady=10)
         form.columnconfigure(1, weight=1)
 
         list_frame = ttk.LabelFrame(tab, text="Lista Pracowników", padding=10)
         list_frame.pack(fill=BOTH, expand=True, pady=10)
-        self.employees_listbox = Listbox(list_frame, font=("Helvetica", 9), relief=SUNKEN, bd=1)
+        self._create_filter_entry(list_frame, "employee")
+        self.employees_listbox = VirtualList(list_frame, lambda: self._list_items("employee"), self._child_row)
         self.employees_listbox.pack(side=LEFT, fill=BOTH, expand=True)
         btn_frame = ttk.Frame(list_frame)
         btn_frame.pack(side=LEFT, fill=Y, padx=5)
@@ -387,28 +854,23 @@ class App(ThemedTk):
         ttk.Button(btn_frame, text="Usuń Zaznaczonego", command=self.remove_employee).pack(pady=2, fill=X)
 
     def add_employee(self):
+        if not self._require_loaded(): return
         name, pos, idx = self.emp_name_entry.get(), self.emp_pos_entry.get(), self.emp_station_combo.current()
-        if not all((name, pos, idx != -1)):
-            messagebox.showerror("Błąd", "Wszystkie pola są wymagane.")
+        try:
+            self.service.add_employee(name, pos, self.repo.stations[idx] if idx != -1 else None)
+        except ValueError as e:
+            messagebox.showerror("Błąd", str(e))
             return
-        station = self.all_stations[idx]
-
-        employee = Employee(name, pos, station, self)
-        self.all_employees.append(employee)
-        station.employees.append(employee)
-        self.refresh_all()
         self.set_status(f"Dodano pracownika: {name}")
         self.emp_name_entry.delete(0, END)
         self.emp_pos_entry.delete(0, END)
 
     def edit_employee(self):
-        selected_indices = self.employees_listbox.curselection()
-        if not selected_indices:
+        emp_to_edit = self.employees_listbox.selected_item()
+        if not emp_to_edit:
             messagebox.showwarning("Brak zaznaczenia", "Proszę wybrać pracownika do edycji.")
             return
 
-        emp_to_edit = self.all_employees[selected_indices[0]]
-
         win = Toplevel(self)
         win.transient(self)
         win.title("Edytuj Pracownika")
@@ -427,7 +889,7 @@ class App(ThemedTk):
         pos_entry.insert(0, emp_to_edit.position)
 
         ttk.Label(form, text="Dworzec macierzysty:").grid(row=2, column=0, sticky=W, padx=5, pady=5)
-        station_combo = ttk.Combobox(form, state="readonly", values=[s.name for s in self.all_stations])
+        station_combo = ttk.Combobox(form, state="readonly", values=[s.name for s in self.repo.stations])
         station_combo.grid(row=2, column=1, sticky=EW, padx=5, pady=5)
         station_combo.set(emp_to_edit.station.name)
 
@@ -442,24 +904,22 @@ class App(ThemedTk):
                 messagebox.showerror("Błąd", "Wszystkie pola muszą być wypełnione.", parent=win)
                 return
 
-            new_station = self.all_stations[new_station_idx]
+            new_station = self.repo.stations[new_station_idx]
 
-            emp_to_edit.name = new_name
-            emp_to_edit.position = new_pos
+            try:
+                with self.batch():
+                    self.service.update(emp_to_edit, name=new_name, position=new_pos)
 
-            # Jeśli zmieniono dworzec
-            if emp_to_edit.station != new_station:
-                # Usuń ze starego dworca
-                emp_to_edit.station.employees.remove(emp_to_edit)
-                # Przypisz i dodaj do nowego
-                emp_to_edit.station = new_station
-                new_station.employees.append(emp_to_edit)
-                # Jeśli pracownik miał znacznik, przenieś go
-                if emp_to_edit.marker:
-                    emp_to_edit.remove_marker()
-                    self._place_entity_offset(emp_to_edit)
+                    # Jeśli zmieniono dworzec
+                    if self.service.reassign(emp_to_edit, new_station):
+                        # Jeśli pracownik miał znacznik, przenieś go
+                        if emp_to_edit.marker:
+                            emp_to_edit.remove_marker()
+                            self._place_entity_offset(emp_to_edit)
+            except ValueError as e:  # Np. pola z samych spacji - odrzuca je dopiero serwis
+                messagebox.showerror("Błąd", str(e), parent=win)
+                return
 
-            self.refresh_all()
             self.set_status(f"Zaktualizowano pracownika: {new_name}")
             win.destroy()
 
@@ -470,9 +930,8 @@ class App(ThemedTk):
         win.grab_set()
 
     def toggle_employee_on_map(self):
-        selected = self.employees_listbox.curselection()
-        if not selected: return
-        employee = self.all_employees[selected[0]]
+        employee = self.employees_listbox.selected_item()
+        if not employee: return
 
         if employee.marker:
             employee.remove_marker()
@@ -481,25 +940,17 @@ class App(ThemedTk):
             self._place_entity_offset(employee)
 
     def show_selected_employee_details(self):
-        selected = self.employees_listbox.curselection()
-        if not selected: return
-        emp_obj = self.all_employees[selected[0]]
-        self.show_entity_details(emp_obj)
+        self.show_entity_details(self.employees_listbox.selected_item())
 
     def remove_employee(self):
-        selected = self.employees_listbox.curselection()
-        if not selected: return
-        emp = self.all_employees.pop(selected[0])
+        emp = self.employees_listbox.selected_item()
+        if not emp: return
         emp.remove_marker()
-        emp.station.employees.remove(emp)
-        self.refresh_all()
+        self.service.remove(emp)
         self.set_status(f"Usunięto: {emp.name}")
 
     # --- ZAKŁADKA KLIENCI ---
-    def create_clients_tab(self):
-        tab = ttk.Frame(self.notebook, padding=10)
-        self.notebook.add(tab, text="Klienci")
-
+    def create_clients_tab(self, tab):
         form = ttk.LabelFrame(tab, text="Formularz Klienta", padding=10)
         form.pack(fill=X)
         ttk.Label(form, text="Nazwa Przewoźnika:").grid(row=0, column=0, sticky=W, padx=5, pady=3)
@@ -511,12 +962,14 @@ class App(ThemedTk):
         ttk.Label(form, text="Przypisz do dworca:").grid(row=2, column=0, sticky=W, padx=5, pady=3)
         self.carrier_station_combo = ttk.Combobox(form, state="readonly")
         self.carrier_station_combo.grid(row=2, column=1, sticky=EW, padx=5, pady=3)
+        self._station_combos.append(self.carrier_station_combo)
         ttk.Button(form, text="Dodaj Klienta", command=self.add_carrier).grid(row=3, columnspan=2, pady=10)
         form.columnconfigure(1, weight=1)
 
         list_frame = ttk.LabelFrame(tab, text="Lista Klientów", padding=10)
         list_frame.pack(fill=BOTH, expand=True, pady=10)
-        self.carriers_listbox = Listbox(list_frame, font=("Helvetica", 9), relief=SUNKEN, bd=1)
+        self._create_filter_entry(list_frame, "carrier")
+        self.carriers_listbox = VirtualList(list_frame, lambda: self._list_items("carrier"), self._child_row)
         self.carriers_listbox.pack(side=LEFT, fill=BOTH, expand=True)
         btn_frame = ttk.Frame(list_frame)
         btn_frame.pack(side=LEFT, fill=Y, padx=5)
@@ -528,28 +981,23 @@ class App(ThemedTk):
         ttk.Button(btn_frame, text="Usuń Zaznaczonego", command=self.remove_carrier).pack(pady=2, fill=X)
 
     def add_carrier(self):
+        if not self._require_loaded(): return
         name, fleet, idx = self.carrier_name_entry.get(), self.carrier_fleet_entry.get(), self.carrier_station_combo.current()
-        if not all((name, fleet, idx != -1)):
-            messagebox.showerror("Błąd", "Wszystkie pola są wymagane.")
+        try:
+            self.service.add_carrier(name, fleet, self.repo.stations[idx] if idx != -1 else None)
+        except ValueError as e:
+            messagebox.showerror("Błąd", str(e))
             return
-        station = self.all_stations[idx]
-
-        carrier = Carrier(name, fleet, station, self)
-        self.all_carriers.append(carrier)
-        station.carriers.append(carrier)
-        self.refresh_all()
         self.set_status(f"Dodano przewoźnika: {name}")
         self.carrier_name_entry.delete(0, END)
         self.carrier_fleet_entry.delete(0, END)
 
     def edit_carrier(self):
-        selected_indices = self.carriers_listbox.curselection()
-        if not selected_indices:
+        carrier_to_edit = self.carriers_listbox.selected_item()
+        if not carrier_to_edit:
             messagebox.showwarning("Brak zaznaczenia", "Proszę wybrać klienta do edycji.")
             return
 
-        carrier_to_edit = self.all_carriers[selected_indices[0]]
-
         win = Toplevel(self)
         win.transient(self)
         win.title("Edytuj Klienta")
@@ -568,7 +1016,7 @@ class App(ThemedTk):
         fleet_entry.insert(0, carrier_to_edit.fleet_type)
 
         ttk.Label(form, text="Dworzec macierzysty:").grid(row=2, column=0, sticky=W, padx=5, pady=5)
-        station_combo = ttk.Combobox(form, state="readonly", values=[s.name for s in self.all_stations])
+        station_combo = ttk.Combobox(form, state="readonly", values=[s.name for s in self.repo.stations])
         station_combo.grid(row=2, column=1, sticky=EW, padx=5, pady=5)
         station_combo.set(carrier_to_edit.station.name)
 
@@ -583,20 +1031,20 @@ class App(ThemedTk):
                 messagebox.showerror("Błąd", "Wszystkie pola muszą być wypełnione.", parent=win)
                 return
 
-            new_station = self.all_stations[new_station_idx]
+            new_station = self.repo.stations[new_station_idx]
 
-            carrier_to_edit.name = new_name
-            carrier_to_edit.fleet_type = new_fleet
+            try:
+                with self.batch():
+                    self.service.update(carrier_to_edit, name=new_name, fleet_type=new_fleet)
 
-            if carrier_to_edit.station != new_station:
-                carrier_to_edit.station.carriers.remove(carrier_to_edit)
-                carrier_to_edit.station = new_station
-                new_station.carriers.append(carrier_to_edit)
-                if carrier_to_edit.marker:
-                    carrier_to_edit.remove_marker()
-                    self._place_entity_offset(carrier_to_edit)
+                    if self.service.reassign(carrier_to_edit, new_station):
+                        if carrier_to_edit.marker:
+                            carrier_to_edit.remove_marker()
+                            self._place_entity_offset(carrier_to_edit)
+            except ValueError as e:  # Np. pola z samych spacji - odrzuca je dopiero serwis
+                messagebox.showerror("Błąd", str(e), parent=win)
+                return
 
-            self.refresh_all()
             self.set_status(f"Zaktualizowano klienta: {new_name}")
             win.destroy()
 
@@ -607,9 +1055,8 @@ class App(ThemedTk):
         win.grab_set()
 
     def toggle_carrier_on_map(self):
-        selected = self.carriers_listbox.curselection()
-        if not selected: return
-        carrier = self.all_carriers[selected[0]]
+        carrier = self.carriers_listbox.selected_item()
+        if not carrier: return
 
         if carrier.marker:
             carrier.remove_marker()
@@ -618,42 +1065,124 @@ class App(ThemedTk):
             self._place_entity_offset(carrier)
 
     def show_selected_carrier_details(self):
-        selected = self.carriers_listbox.curselection()
-        if not selected: return
-        carrier_obj = self.all_carriers[selected[0]]
-        self.show_entity_details(carrier_obj)
+        self.show_entity_details(self.carriers_listbox.selected_item())
 
     def remove_carrier(self):
-        selected = self.carriers_listbox.curselection()
-        if not selected: return
-        carrier = self.all_carriers.pop(selected[0])
+        carrier = self.carriers_listbox.selected_item()
+        if not carrier: return
         carrier.remove_marker()
-        carrier.station.carriers.remove(carrier)
-        self.refresh_all()
+        self.service.remove(carrier)
         self.set_status(f"Usunięto: {carrier.name}")
 
     # --- ODŚWIEŻANIE INTERFEJSU ---
-    def refresh_all(self):
-        """Jedna metoda do odświeżania wszystkich list i kontrolek."""
-        self.stations_listbox.delete(0, END)
-        for s in self.all_stations:
-            self.stations_listbox.insert(END, f"{s.name} ({s.address})")
-
-        self.employees_listbox.delete(0, END)
-        for e in self.all_employees:
-            self.employees_listbox.insert(END, f"{e.name} [{e.station.name}]")
+    def _on_model_change(self, event, entity, rank):
+        """Przekazuje zmiany z repozytorium do widoku listy danego rodzaju encji i planuje jedno odświeżenie."""
+        self.schedule_refresh()
+        if event == "remove" and entity.marker:
+            entity.remove_marker()  # Np. obsada dworca usuniętego przy cofaniu zmian
+        if entity.kind == "station" and event in ("add", "remove"):
+            self._station_names_dirty = True
+        view = self._views[entity.kind]
+        if view is None:
+            return  # Zakładka jeszcze niezbudowana - narysuje się od razu z aktualnymi danymi
+        if event == "add":
+            view.inserted(rank, entity)
+        elif event == "remove":
+            view.removed(rank, entity)
+        else:
+            view.changed(entity)
+        if self._filters[entity.kind] is not None:
+            view.invalidate()  # Pozycje w tabeli repozytorium nie odpowiadają pozycjom na przefiltrowanej liście
+
+        if entity.kind == "station" and event == "update":
+            # Wiersze pracowników i klientów pokazują nazwę dworca
+            for children, kind in ((entity.employees, "employee"), (entity.carriers, "carrier")):
+                child_view = self._views[kind]
+                if child_view is not None:
+                    for child in children:
+                        child_view.changed(child)
+
+    @staticmethod
+    def _station_row(s):
+        pending = " [lokalizowanie...]" if s.pending else ""
+        return f"{s.name} ({s.address}){pending}"
+
+    @staticmethod
+    def _child_row(c):
+        return f"{c.name} [{c.station.name}]"
+
+    def schedule_refresh(self):
+        """Zleca refresh_all na najbliższy bezczynny obrót pętli Tk - dowolnie wiele zmian daje jedno odświeżenie."""
+        if self._refresh_job is None and not self._batch_depth:
+            self._refresh_job = self.after_idle(self._run_scheduled_refresh)
+
+    def _run_scheduled_refresh(self):
+        self._refresh_job = None
+        self.refresh_all()
 
-        self.carriers_listbox.delete(0, END)
-        for c in self.all_carriers:
-            self.carriers_listbox.insert(END, f"{c.name} [{c.station.name}]")
+    @contextmanager
+    def batch(self):
+        """Blok zmian modelu: jedna transakcja zapisu, jedno przerysowanie znaczników i jedno odświeżenie list."""
+        layer = self.marker_layer.batch() if hasattr(self, "marker_layer") else nullcontext()
+        self._batch_depth += 1
+        try:
+            with self.service.batch(), layer:
+                yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.schedule_refresh()
 
-        station_names = [s.name for s in self.all_stations]
-        if self.emp_station_combo:
-            self.emp_station_combo['values'] = station_names
-        if self.carrier_station_combo:
-            self.carrier_station_combo['values'] = station_names
+    def refresh_all(self):
+        """Nanosi na listy i comboboxy tylko zmiany zgłoszone od poprzedniego odświeżenia."""
+        if self._refresh_job is not None:
+            self.after_cancel(self._refresh_job)  # Zaplanowane odświeżenie byłoby już puste
+            self._refresh_job = None
+        with METRICS.timer("refresh_all"):
+            for view in self._views.values():
+                if view is not None:
+                    view.flush()
+
+            if self._station_names_dirty and self._station_combos:
+                station_names = [s.name for s in self.repo.stations]
+                for combo in self._station_combos:
+                    combo['values'] = station_names
+                self._station_names_dirty = False
+
+    # --- FILTRY LIST ---
+    def _create_filter_entry(self, list_frame, kind):
+        row = ttk.Frame(list_frame)
+        row.pack(side=TOP, fill=X, pady=(0, 5))
+        ttk.Label(row, text="Filtr:").pack(side=LEFT, padx=(0, 5))
+        var = self._filter_vars[kind] = StringVar()
+        ttk.Entry(row, textvariable=var).pack(side=LEFT, fill=X, expand=True)
+        var.trace_add("write", lambda *args: self._apply_filter(kind))
+
+    def _list_items(self, kind):
+        """Zawartość listy danego rodzaju: wynik filtra albo cała tabela repozytorium."""
+        view = self._filters[kind]
+        return self.repo.tables[kind] if view is None else view
+
+    def _apply_filter(self, kind):
+        """Zawęża listę do encji, których nazwa zaczyna się od wpisanego tekstu (bez rozróżniania wielkości liter)."""
+        prefix = fold(self._filter_vars[kind].get())
+        self._filters[kind] = PrefixView(self.prefix_indexes[kind], prefix) if prefix else None
+        view = self._views[kind]
+        if view.selected is not None and view.selected not in view.items():
+            view.selected = None
+        view.top = 0
+        view.invalidate()
+        view.flush()
+
+    def clear_filter(self, kind):
+        if self._filters[kind] is not None:
+            self._filter_vars[kind].set("")
 
 
 if __name__ == "__main__":
-    app = App()
+    # --startup-report: po wczytaniu sieci wypisuje na stderr czasy kolejnych etapów startu
+    # --prefetch-server URL: serwer kafelków dla "Pobierz mapę offline" (np. własny, tiles.py serve)
+    argv = sys.argv[1:]
+    server = argv[argv.index("--prefetch-server") + 1] if "--prefetch-server" in argv[:-1] else None
+    app = App(print_startup_report="--startup-report" in argv, prefetch_server=server)
     app.mainloop()
\ No newline at end of file
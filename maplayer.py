@@ -0,0 +1,264 @@
+import math
+from contextlib import contextmanager
+
+from metrics import METRICS
+from spatial import QuadTree
+
+CLUSTER_CELL_PX = 64  # Rozmiar komórki siatki grupującej, w pikselach ekranu
+CLUSTER_MAX_ZOOM = 14  # Powyżej tego przybliżenia znaczniki nie są grupowane
+VIEW_MARGIN = 0.5  # Zapas materializowanych znaczników wokół widoku, jako ułamek jego rozmiaru
+
+
+def world_xy(lat, lon):
+    """Współrzędne Web Mercator znormalizowane do [0, 1) - te same, których używa siatka kafelków OSM."""
+    lat_rad = math.radians(max(-85.0511, min(85.0511, lat)))
+    x = (lon + 180.0) / 360.0
+    y = (1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi) / 2.0
+    return x, y
+
+
+class LayerMarker:
+    """Znacznik logiczny - pozycja i wygląd; prawdziwy marker na mapie tworzy MarkerLayer, gdy trzeba."""
+
+    def __init__(self, layer, lat, lon, text, options):
+        self.layer = layer
+        self.position = (lat, lon)
+        self.text = text
+        self.options = options  # argumenty dla map_widget.set_marker (kolory, command, ...)
+        self.world = world_xy(lat, lon)
+        self.cells = []  # komórka siatki dla każdego poziomu przybliżenia 0..CLUSTER_MAX_ZOOM
+
+    def delete(self):
+        self.layer.remove(self)
+
+
+class _Cell:
+    __slots__ = ("members", "lat_sum", "lon_sum")
+
+    def __init__(self):
+        self.members = set()
+        self.lat_sum = 0.0
+        self.lon_sum = 0.0
+
+
+# --- WARSTWA ZNACZNIKÓW ---
+class MarkerLayer:
+    """Pośrednik między encjami a TkinterMapView, który grupuje bliskie znaczniki zależnie od przybliżenia.
+
+    Udaje map_widget (ma set_marker), więc Entity.place_marker działa bez zmian. Dla każdego poziomu
+    przybliżenia utrzymywana jest siatka komórek (komórki kolejnych poziomów zagnieżdżają się 2x2);
+    dodanie/usunięcie znacznika aktualizuje siatki w O(liczba poziomów) i przerysowuje tylko jego komórkę.
+
+    Na mapie istnieją tylko markery z obszaru widoku powiększonego o margines (self.region). Przy przesunięciu
+    mapy poza ten obszar warstwa wylicza go na nowo: przy grupowaniu przegląda komórki siatki z zakresu
+    widoku, a przy pełnym przybliżeniu pyta drzewo czwórkowe - koszt zależy od tego, co widać, nie od
+    wielkości sieci.
+    """
+
+    def __init__(self, map_widget, cell_px=CLUSTER_CELL_PX, max_cluster_zoom=CLUSTER_MAX_ZOOM):
+        self.map_widget = map_widget
+        self.cell_px = cell_px
+        self.max_cluster_zoom = max_cluster_zoom
+        self.handles = set()
+        self.zoom = None  # poziom przybliżenia, dla którego narysowano znaczniki
+        self.region = None  # (x0, y0, x1, y1) we współrzędnych world_xy - obszar z materializowanymi markerami
+        self._index = QuadTree()
+        self._levels = [{} for _ in range(max_cluster_zoom + 1)]  # poziom -> komórka -> _Cell
+        self._shown = {}  # tożsamość -> marker na mapie; ("m", LayerMarker) albo ("c", poziom, komórka)
+        self._cell_shown = {}  # komórka bieżącego poziomu -> tożsamość jej markera
+        self._deferred = None  # znaczniki zmienione w bloku batch(), przerysowywane razem na jego końcu
+
+    # --- Interfejs zgodny z map_widget ---
+    def set_marker(self, lat, lon, text=None, **options):
+        handle = LayerMarker(self, lat, lon, text, options)
+        self.handles.add(handle)
+        for zoom, level in enumerate(self._levels):
+            scale = (1 << zoom) * 256 / self.cell_px
+            cell = (int(handle.world[0] * scale), int(handle.world[1] * scale))
+            handle.cells.append(cell)
+            entry = level.get(cell)
+            if entry is None:
+                entry = level[cell] = _Cell()
+            entry.members.add(handle)
+            entry.lat_sum += lat
+            entry.lon_sum += lon
+        self._index.insert(handle, *handle.world)
+        self._sync(handle)
+        return handle
+
+    def remove(self, handle):
+        if handle not in self.handles:
+            return
+        self.handles.discard(handle)
+        self._index.remove(handle, *handle.world)
+        lat, lon = handle.position
+        for level, cell in zip(self._levels, handle.cells):
+            entry = level[cell]
+            entry.members.discard(handle)
+            entry.lat_sum -= lat
+            entry.lon_sum -= lon
+            if not entry.members:
+                del level[cell]
+        self._sync(handle)
+
+    @property
+    def shown_count(self):
+        """Liczba markerów faktycznie narysowanych na mapie (pojedynczych i grup)."""
+        return len(self._shown)
+
+    @contextmanager
+    def batch(self):
+        """Grupuje wiele set_marker/remove w jedno przerysowanie dotkniętych komórek."""
+        if self._deferred is not None:
+            yield self
+            return
+        self._deferred = set()
+        try:
+            yield self
+        finally:
+            handles, self._deferred = self._deferred, None
+            self._sync_many(handles)
+
+    # --- Przybliżenie i widok ---
+    def update_view(self):
+        """Wywoływane cyklicznie przez App; przerysowuje warstwę po zmianie przybliżenia lub wyjściu poza region."""
+        zoom = int(round(self.map_widget.zoom))
+        n = 1 << zoom
+        (ux, uy), (lx, ly) = self.map_widget.upper_left_tile_pos, self.map_widget.lower_right_tile_pos
+        view = (ux / n, uy / n, lx / n, ly / n)
+        if zoom == self.zoom and self._covers(view):
+            return
+
+        self.zoom = zoom
+        mx, my = (view[2] - view[0]) * VIEW_MARGIN, (view[3] - view[1]) * VIEW_MARGIN
+        self.region = (view[0] - mx, view[1] - my, view[2] + mx, view[3] + my)
+        self._cell_shown.clear()
+        self._apply(self._desired_all(), set(self._shown))
+
+    def _covers(self, view):
+        r = self.region
+        return r is not None and r[0] <= view[0] and r[1] <= view[1] and view[2] <= r[2] and view[3] <= r[3]
+
+    def _in_region(self, handle):
+        x, y = handle.world
+        r = self.region
+        if not self._clustered():
+            return r[0] <= x <= r[2] and r[1] <= y <= r[3]
+        # Przy grupowaniu liczy się cała komórka - wystarczy, że przecina region
+        scale = (1 << self.zoom) * 256 / self.cell_px
+        cx, cy = handle.cells[self.zoom]
+        return (int(r[0] * scale) <= cx <= int(r[2] * scale)) and (int(r[1] * scale) <= cy <= int(r[3] * scale))
+
+    def _region_cells(self):
+        """Niepuste komórki bieżącego poziomu przecinające region."""
+        level = self._levels[self.zoom]
+        scale = (1 << self.zoom) * 256 / self.cell_px
+        x0, y0, x1, y1 = (int(v * scale) for v in self.region)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(level):
+            # Region większy niż liczba zajętych komórek (np. cała sieć w kadrze) - taniej przejrzeć słownik
+            return [(cell, entry) for cell, entry in level.items()
+                    if x0 <= cell[0] <= x1 and y0 <= cell[1] <= y1]
+        cells = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                entry = level.get((cx, cy))
+                if entry is not None:
+                    cells.append(((cx, cy), entry))
+        return cells
+
+    def _clustered(self):
+        return self.zoom is not None and self.zoom <= self.max_cluster_zoom
+
+    def _desired_all(self):
+        if not self._clustered():
+            return {("m", handle): handle for handle in self._index.query(*self.region)}
+        desired = {}
+        for cell, entry in self._region_cells():
+            ident, spec = self._cell_display(cell, entry)
+            desired[ident] = spec
+            self._cell_shown[cell] = ident
+        return desired
+
+    def _cell_display(self, cell, entry):
+        if len(entry.members) == 1:
+            handle = next(iter(entry.members))
+            return ("m", handle), handle
+        return ("c", self.zoom, cell), entry
+
+    def _sync(self, handle):
+        """Przerysowuje tylko fragment warstwy, którego dotyczy zmiana znacznika."""
+        if self._deferred is not None:
+            self._deferred.add(handle)
+            return
+        self._sync_many((handle,))
+
+    def _sync_many(self, handles):
+        if self.zoom is None:
+            return
+        handles = [handle for handle in handles if self._in_region(handle)]
+        desired, scope = {}, set()
+        if not self._clustered():
+            for handle in handles:
+                ident = ("m", handle)
+                scope.add(ident)
+                if handle in self.handles:
+                    desired[ident] = handle
+            self._apply(desired, scope)
+            return
+
+        level = self._levels[self.zoom]
+        for cell in {handle.cells[self.zoom] for handle in handles}:
+            old = self._cell_shown.pop(cell, None)
+            if old:
+                scope.add(old)
+            entry = level.get(cell)
+            if entry is not None:
+                ident, spec = self._cell_display(cell, entry)
+                desired[ident] = spec
+                self._cell_shown[cell] = ident
+        self._apply(desired, scope)
+
+    def _apply(self, desired, scope):
+        """Usuwa markery z `scope` nieobecne w `desired`, tworzy brakujące i aktualizuje liczniki grup."""
+        deleted = created = 0
+        for ident in scope - desired.keys():
+            marker = self._shown.pop(ident, None)
+            if marker is not None:
+                marker.delete()
+                deleted += 1
+        for ident, spec in desired.items():
+            marker = self._shown.get(ident)
+            if ident[0] == "m":
+                if marker is None:
+                    self._shown[ident] = self._create_single(spec)
+                    created += 1
+            elif marker is None:
+                self._shown[ident] = self._create_cluster(spec)
+                created += 1
+            else:
+                count = len(spec.members)
+                marker.set_position(spec.lat_sum / count, spec.lon_sum / count)
+                marker.set_text(str(count))
+        if created:
+            METRICS.incr("markers.created", created)
+        if deleted:
+            METRICS.incr("markers.deleted", deleted)
+
+    def _create_single(self, handle):
+        return self.map_widget.set_marker(handle.position[0], handle.position[1], text=handle.text, **handle.options)
+
+    def _create_cluster(self, entry):
+        count = len(entry.members)
+        lat, lon = entry.lat_sum / count, entry.lon_sum / count
+        zoom = self.zoom
+
+        def _zoom_in(marker=None):
+            # Środek grupy liczony w chwili kliknięcia - skład grupy mógł się zmienić
+            n = len(entry.members) or 1
+            self.map_widget.set_position(entry.lat_sum / n, entry.lon_sum / n)
+            self.map_widget.set_zoom(min(zoom + 2, self.max_cluster_zoom + 1))
+            self.update_view()
+
+        return self.map_widget.set_marker(lat, lon, text=str(count), font=("Helvetica", 9, "bold"),
+                                          text_color="firebrick", marker_color_circle="white",
+                                          marker_color_outside="firebrick", command=_zoom_in)
@@ -0,0 +1,79 @@
+import io
+
+import PIL
+from PIL import Image, ImageTk
+from tkintermapview import TkinterMapView
+
+from metrics import METRICS
+from tiles import TILE_CACHE_LIMIT, TILE_SERVER, TileImageCache, fetch_tile
+
+
+# --- MAPA Z LOKALNYMI KAFELKAMI ---
+class TileMapView(TkinterMapView):
+    """TkinterMapView czytający kafelki najpierw z pliku MBTiles, z ograniczonym (LRU) cache obrazów.
+
+    Kafelki pobrane z serwera są dopisywane do pliku, więc raz oglądany obszar działa potem offline;
+    offline=True w ogóle nie odpytuje serwera.
+    """
+
+    def __init__(self, *args, tile_store, tile_server=TILE_SERVER, offline=False, cache_limit=TILE_CACHE_LIMIT,
+                 **kwargs):
+        # Ustawiane przed TkinterMapView.__init__, bo jego wątki ładujące startują od razu
+        self.tile_store = tile_store
+        self.offline = offline
+        self.cache_limit = cache_limit
+        super().__init__(*args, **kwargs)
+        if tile_server != self.tile_server:
+            self.set_tile_server(tile_server)
+        else:
+            self._bound_cache()
+
+    def _bound_cache(self):
+        cache = TileImageCache(self.cache_limit)
+        cache.update(self.tile_image_cache)
+        self.tile_image_cache = cache
+
+    def set_tile_server(self, tile_server, tile_size=256, max_zoom=19):
+        super().set_tile_server(tile_server, tile_size, max_zoom)
+        self._bound_cache()
+
+    def get_tile_image_from_cache(self, zoom, x, y):
+        # Oryginał sprawdza klucz i czyta go w dwóch krokach - między nimi wątek ładujący może go usunąć (LRU)
+        return self.tile_image_cache.get(f"{zoom}{x}{y}", False)
+
+    def request_image(self, zoom, x, y, db_cursor=None):
+        try:
+            return self._load_tile(zoom, x, y)
+        except Exception:
+            # Jak w TkinterMapView: wątki ładujące same nie łapią wyjątków, więc dowolny błąd kafelka
+            # (np. http.client.IncompleteRead, błąd SQLite) zatrzymałby wątek do końca sesji
+            METRICS.incr("tiles.errors")
+            return self.empty_tile_image
+
+    def _load_tile(self, zoom, x, y):
+        data = self.tile_store.get(zoom, x, y)
+        if data is not None:
+            METRICS.incr("tiles.local")
+        elif self.offline:
+            return self.empty_tile_image
+        else:
+            try:
+                data = fetch_tile(self.tile_server, zoom, x, y)
+            except OSError:
+                METRICS.incr("tiles.errors")
+                return self.empty_tile_image  # Bez zapamiętywania - kafelek spróbuje się wczytać ponownie
+            if data is None:
+                self.tile_image_cache[f"{zoom}{x}{y}"] = self.empty_tile_image
+                return self.empty_tile_image
+            METRICS.incr("tiles.remote")
+            self.tile_store.put(zoom, x, y, data)
+
+        try:
+            image = Image.open(io.BytesIO(data))
+        except PIL.UnidentifiedImageError:
+            return self.empty_tile_image
+        if not self.running:
+            return self.empty_tile_image
+        image_tk = ImageTk.PhotoImage(image)
+        self.tile_image_cache[f"{zoom}{x}{y}"] = image_tk
+        return image_tk
@@ -0,0 +1,114 @@
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Górne granice przedziałów histogramu w ms (ostatni przedział jest otwarty)
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Histogram czasów w stałych przedziałach - stała pamięć niezależnie od liczby pomiarów."""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+
+    def percentile(self, q):
+        """Przybliżony percentyl (0-100) - interpolacja liniowa wewnątrz przedziału, w którym wypada."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = BUCKETS_MS[i - 1] if i else 0.0
+                upper = BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+                value = lower + (upper - lower) * (rank - seen) / n
+                return max(self.min, min(value, self.max))
+            seen += n
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "min_ms": self.min if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "max_ms": self.max,
+            "buckets": dict(zip([str(b) for b in BUCKETS_MS] + ["inf"], self.counts)),
+        }
+
+
+# --- REJESTR METRYK ---
+class Metrics:
+    """Liczniki, histogramy czasów i wskaźniki odczytywane na żądanie; bezpieczne dla wątków roboczych."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}  # nazwa -> funkcja zwracająca bieżącą wartość (liczbę lub słownik)
+        self.started = time.time()
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, ms):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(ms)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    def gauge(self, name, read):
+        self.gauges[name] = read
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {name: h.snapshot() for name, h in self.histograms.items()}
+        gauges = {}
+        for name, read in self.gauges.items():
+            try:
+                gauges[name] = read()
+            except Exception as e:  # Wskaźnik nie może zepsuć podglądu pozostałych
+                gauges[name] = f"błąd: {e}"
+        return {"uptime_s": round(time.time() - self.started, 1), "counters": counters,
+                "histograms": histograms, "gauges": gauges}
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2, ensure_ascii=False)
+
+
+METRICS = Metrics()  # Wspólny rejestr całej aplikacji
@@ -0,0 +1,121 @@
+from layout import SlotAllocator
+
+
+# --- GŁÓWNA KLASA DANYCH ---
+class Entity:
+    """Klasa bazowa dla wszystkich obiektów w systemie.
+
+    Encje mają __slots__ (bez słownika atrybutów na każdy obiekt), a referencja do aplikacji jest wspólna
+    dla klasy - przy milionach obiektów to większość ich pamięci.
+    """
+
+    __slots__ = ("id", "name", "marker", "_coordinates")
+
+    kind = "entity"  # Nazwa tabeli w repozytorium
+    app = None  # Główna aplikacja (ustawiana raz przez App); None w trybie bez GUI
+
+    def __init__(self, name):
+        self.id = None  # Stały identyfikator nadawany przez Repository
+        self.name = name
+        self.marker = None
+        self._coordinates = None
+
+    @property
+    def coordinates(self):
+        """Krotka (lat, lon) albo None."""
+        return self._coordinates
+
+    @coordinates.setter
+    def coordinates(self, coords):
+        self._coordinates = tuple(coords) if coords else None
+
+    def place_marker(self, map_widget, text, coords):
+        self.remove_marker()  # Usuń stary marker, jeśli istnieje
+        self.coordinates = coords
+        if self.coordinates:
+            self.marker = map_widget.set_marker(
+                self.coordinates[0],
+                self.coordinates[1],
+                text=text,
+                font=("Helvetica", 8),
+                text_color="white",
+                marker_color_circle="black",
+                marker_color_outside="gray60",
+                command=self.show_details
+            )
+
+    def remove_marker(self):
+        if self.marker:
+            self.marker.delete()
+            self.marker = None
+            self.coordinates = None
+
+    def show_details(self, marker=None):
+        """Metoda wywoływana po kliknięciu znacznika lub przycisku."""
+        if self.app is not None:
+            self.app.show_entity_details(self)
+
+    def __str__(self):
+        return self.name
+
+
+class Station(Entity):
+    """Przechowuje dane o dworcu kolejowym."""
+
+    __slots__ = ("address", "employees", "carriers", "pending", "slots")
+
+    kind = "station"
+
+    def __init__(self, name, address):
+        super().__init__(name)
+        self.address = address
+        self.employees = set()
+        self.carriers = set()
+        self.pending = False  # True, dopóki trwa geokodowanie adresu w tle
+        self.slots = SlotAllocator()  # Pozycje znaczników pracowników/klientów wokół dworca
+
+    def place_marker(self, map_widget, coords):
+        super().place_marker(map_widget, self.name, coords)
+
+
+class StationChild(Entity):
+    """Wspólna baza pracownika i klienta - obiektu przypisanego do dworca."""
+
+    __slots__ = ("station", "slot")
+
+    def __init__(self, name, station):
+        super().__init__(name)
+        self.station = station
+        self.slot = None  # (SlotAllocator, pozycja) zajęta przez znacznik na pierścieniu wokół dworca
+
+    def remove_marker(self):
+        super().remove_marker()
+        if self.slot is not None:
+            # Zwalniamy w alokatorze, z którego pozycja pochodzi - dworzec mógł się w międzyczasie zmienić
+            allocator, slot = self.slot
+            allocator.release(slot)
+            self.slot = None
+
+
+class Employee(StationChild):
+    """Przechowuje dane o pracowniku przypisanym do dworca."""
+
+    __slots__ = ("position",)
+
+    kind = "employee"
+
+    def __init__(self, name, position, station):
+        super().__init__(name, station)
+        self.position = position
+
+
+class Carrier(StationChild):
+    """Przechowuje dane o kliencie (przewoźniku) przypisanym do dworca."""
+
+    __slots__ = ("fleet_type",)
+
+    kind = "carrier"
+
+    def __init__(self, name, fleet_type, station):
+        super().__init__(name, station)
+        self.fleet_type = fleet_type
@@ -0,0 +1,214 @@
+class _Fenwick:
+    """Drzewo Fenwicka nad flagami 0/1 - liczenie pozycji (rank) i wybór k-tego elementu w O(log n)."""
+
+    def __init__(self, flags=()):
+        self.tree = [0]
+        for flag in flags:
+            self.append(flag)
+
+    def append(self, value):
+        i = len(self.tree)
+        low = i & -i
+        # Węzeł i pokrywa przedział (i - low, i]
+        self.tree.append(value + self.prefix(i - 1) - self.prefix(i - low))
+
+    def add(self, i, delta):
+        i += 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i):
+        """Suma flag na pozycjach [0, i)."""
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def select(self, k):
+        """Pozycja k-tej (od zera) ustawionej flagi."""
+        pos = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(self.tree) and self.tree[nxt] <= k:
+                pos = nxt
+                k -= self.tree[nxt]
+            step >>= 1
+        return pos
+
+
+# --- TABELA ENCJI ---
+class EntityTable:
+    """Encje jednego rodzaju: słownik id -> obiekt oraz stabilna kolejność wstawiania.
+
+    Dodanie i usunięcie są O(1) (usunięte wiersze zostają jako "dziury", sprzątane hurtowo); dostęp po pozycji
+    i pozycja obiektu (potrzebne widokom list) kosztują O(log n).
+    """
+
+    def __init__(self):
+        self.by_id = {}
+        self._rows = []  # obiekty w kolejności wstawienia, None w miejscu usuniętych
+        self._row_of = {}  # id -> indeks w _rows
+        self._live = _Fenwick()
+        self._holes = 0
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        return iter(self.by_id.values())  # dict zachowuje kolejność wstawienia
+
+    def __contains__(self, entity):
+        return entity.id is not None and self.by_id.get(entity.id) is entity
+
+    def __getitem__(self, key):
+        """Dostęp po pozycji w kolejności wyświetlania: tabela[i] lub tabela[a:b]."""
+        if isinstance(key, slice):
+            start, stop, _ = key.indices(len(self))
+            if start >= stop:
+                return []
+            row = self._live.select(start)
+            result = []
+            while len(result) < stop - start:
+                entity = self._rows[row]
+                if entity is not None:
+                    result.append(entity)
+                row += 1
+            return result
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(key)
+        return self._rows[self._live.select(key)]
+
+    def get(self, entity_id):
+        return self.by_id.get(entity_id)
+
+    def index(self, entity):
+        """Pozycja obiektu w kolejności wyświetlania."""
+        if entity not in self:
+            raise ValueError(f"{entity!r} nie należy do tabeli")
+        return self._live.prefix(self._row_of[entity.id])
+
+    def add(self, entity):
+        """Dodaje obiekt na koniec; zwraca jego pozycję."""
+        self.by_id[entity.id] = entity
+        self._row_of[entity.id] = len(self._rows)
+        self._rows.append(entity)
+        self._live.append(1)
+        return len(self) - 1
+
+    def remove(self, entity):
+        """Usuwa obiekt; zwraca pozycję, którą zajmował."""
+        rank = self.index(entity)
+        row = self._row_of.pop(entity.id)
+        del self.by_id[entity.id]
+        self._rows[row] = None
+        self._live.add(row, -1)
+        self._holes += 1
+        if self._holes > 1024 and self._holes > len(self.by_id):
+            self._compact()
+        return rank
+
+    def _compact(self):
+        self._rows = list(self.by_id.values())
+        self._row_of = {entity.id: row for row, entity in enumerate(self._rows)}
+        self._live = _Fenwick([1] * len(self._rows))
+        self._holes = 0
+
+
+# --- REPOZYTORIUM ---
+class Repository:
+    """Wszystkie encje sieci ze stałymi identyfikatorami i indeksami pomocniczymi.
+
+    Każda zmiana jest zgłaszana słuchaczom jako listener(event, entity, rank), gdzie event to
+    "add", "update", "move" lub "remove", a rank to pozycja obiektu w tabeli (None dla update/move).
+    Przy update i move poprzednie wartości zmienianych pól są w previous (np. dla dziennika zmian).
+    """
+
+    def __init__(self):
+        self.stations = EntityTable()
+        self.employees = EntityTable()
+        self.carriers = EntityTable()
+        self.tables = {"station": self.stations, "employee": self.employees, "carrier": self.carriers}
+        self.by_name = {kind: {} for kind in self.tables}  # rodzaj -> nazwa -> set(encji)
+        self.listeners = []
+        self.previous = {}  # pole -> wartość sprzed ostatniego update/move
+        self._next_id = 1
+
+    def _emit(self, event, entity, rank=None):
+        for listener in self.listeners:
+            listener(event, entity, rank)
+
+    def _index_name(self, entity):
+        self.by_name[entity.kind].setdefault(entity.name, set()).add(entity)
+
+    def _unindex_name(self, entity):
+        named = self.by_name[entity.kind].get(entity.name)
+        if named:
+            named.discard(entity)
+            if not named:
+                del self.by_name[entity.kind][entity.name]
+
+    def reserve_ids(self, last_id):
+        """Kolejne nadawane id będą większe od last_id (np. najwyższego zapisanego w bazie)."""
+        self._next_id = max(self._next_id, last_id + 1)
+
+    def get(self, kind, entity_id):
+        return self.tables[kind].get(entity_id)
+
+    def find(self, kind, name):
+        """Encje danego rodzaju o dokładnie tej nazwie."""
+        return self.by_name[kind].get(name, set())
+
+    def add(self, entity):
+        """Dodaje encję (pracownika/klienta także do zbioru dzieci jego dworca); nadaje id, jeśli go nie ma."""
+        if entity.id is None:
+            entity.id = self._next_id
+        self._next_id = max(self._next_id, entity.id + 1)
+        if entity.kind == "employee":
+            entity.station.employees.add(entity)
+        elif entity.kind == "carrier":
+            entity.station.carriers.add(entity)
+        rank = self.tables[entity.kind].add(entity)
+        self._index_name(entity)
+        self._emit("add", entity, rank)
+        return entity
+
+    def update(self, entity, **fields):
+        """Zmienia pola encji (np. name, address, position) i zgłasza zmianę."""
+        self.previous = {field: getattr(entity, field) for field in fields}
+        renamed = "name" in fields and fields["name"] != entity.name
+        if renamed:
+            self._unindex_name(entity)
+        for field, value in fields.items():
+            setattr(entity, field, value)
+        if renamed:
+            self._index_name(entity)
+        self._emit("update", entity)
+
+    def move(self, child, station):
+        """Przenosi pracownika/klienta do innego dworca w O(1)."""
+        if child.station is station:
+            return
+        self.previous = {"station": child.station}
+        children = "employees" if child.kind == "employee" else "carriers"
+        getattr(child.station, children).discard(child)
+        child.station = station
+        getattr(station, children).add(child)
+        self._emit("move", child)
+
+    def remove(self, entity):
+        """Usuwa encję; usunięcie dworca usuwa też jego pracowników i klientów."""
+        if entity.kind == "station":
+            for child in list(entity.employees) + list(entity.carriers):
+                self.remove(child)
+        elif entity.kind == "employee":
+            entity.station.employees.discard(entity)
+        else:
+            entity.station.carriers.discard(entity)
+        rank = self.tables[entity.kind].remove(entity)
+        self._unindex_name(entity)
+        self._emit("remove", entity, rank)
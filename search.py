@@ -0,0 +1,281 @@
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+
+import numpy as np
+
+from coordstore import KIND_CODES
+
+SETTLE_BULK = 64  # Od tylu zaległych zmian indeks jest przebudowywany hurtowo zamiast wstawiania pojedynczo
+MIN_SIMILARITY = 0.15  # Poniżej tego podobieństwa trygramowego wynik nie jest zwracany
+ARRAY_CACHE_LIMIT = 4096  # tyle list trafień trygramów trzyma cache zapytań (jako tablice id)
+
+# Pola tekstowe przeszukiwane dla każdego rodzaju encji
+SEARCH_FIELDS = {
+    "station": ("name", "address"),
+    "employee": ("name", "position"),
+    "carrier": ("name", "fleet_type"),
+}
+
+
+def fold(text):
+    """Klucz wyszukiwania: małe litery, bez polskich znaków diakrytycznych i zbędnych spacji."""
+    text = text.casefold().replace("ł", "l")
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.split())
+
+
+# --- INDEKS PREFIKSÓW ---
+class PrefixIndex:
+    """Posortowana tablica par (klucz nazwy, id) dla jednego rodzaju encji; prefiks to dwa wyszukiwania binarne.
+
+    Zmiany z Repository trafiają najpierw do kolejki i są nanoszone dopiero przed zapytaniem - pojedyncze
+    przez insort, a duże paczki (np. wczytywanie sieci) jednym sortowaniem, które scala dwie posortowane serie.
+    """
+
+    def __init__(self, repo, kind):
+        self.table = repo.tables[kind]
+        self.kind = kind
+        self.version = 0  # zwiększana przy każdej zmianie tablicy - widoki wiedzą, kiedy przeliczyć granice
+        self._key_of = {entity.id: fold(entity.name) for entity in self.table}
+        self._keys = sorted((key, entity_id) for entity_id, key in self._key_of.items())
+        self._added = []
+        self._dropped = []
+        repo.listeners.append(self._on_change)
+
+    def _on_change(self, event, entity, rank):
+        if entity.kind != self.kind:
+            return
+        if event == "add":
+            self._add(entity)
+        elif event == "remove":
+            self._dropped.append((self._key_of.pop(entity.id), entity.id))
+        elif event == "update":
+            key = fold(entity.name)
+            if key != self._key_of[entity.id]:
+                self._dropped.append((self._key_of[entity.id], entity.id))
+                self._add(entity, key)
+
+    def _add(self, entity, key=None):
+        key = fold(entity.name) if key is None else key
+        self._key_of[entity.id] = key
+        self._added.append((key, entity.id))
+
+    def key(self, entity):
+        return self._key_of.get(entity.id)
+
+    def keys(self):
+        """Aktualna posortowana tablica par (klucz, id)."""
+        if self._added or self._dropped:
+            self._settle()
+        return self._keys
+
+    def _settle(self):
+        keys = self._keys
+        if len(self._added) >= SETTLE_BULK:
+            keys = self._keys = sorted(keys + self._added)
+        else:
+            for pair in self._added:
+                insort(keys, pair)
+        if len(self._dropped) >= SETTLE_BULK:
+            dropped = Counter(self._dropped)
+            kept = []
+            for pair in keys:
+                if dropped[pair]:
+                    dropped[pair] -= 1
+                else:
+                    kept.append(pair)
+            self._keys = kept
+        else:
+            for pair in self._dropped:
+                del keys[bisect_left(keys, pair)]
+        self._added.clear()
+        self._dropped.clear()
+        self.version += 1
+
+    def range(self, prefix):
+        """Zakres [lo, hi) tablicy keys() z kluczami zaczynającymi się od prefiksu (już złożonego przez fold)."""
+        keys = self.keys()
+        return bisect_left(keys, (prefix,)), bisect_left(keys, (prefix + "\U0010ffff",))
+
+
+class PrefixView:
+    """Encje, których nazwa zaczyna się od prefiksu, w kolejności alfabetycznej.
+
+    Zachowuje się jak EntityTable wobec VirtualList (len, [i], [a:b], index, in), więc lista może pokazywać
+    wynik filtra bez kopiowania; granice zakresu są przeliczane tylko po zmianie indeksu.
+    """
+
+    def __init__(self, index, prefix):
+        self.source = index
+        self.prefix = prefix
+        self._version = None
+        self._lo = self._hi = 0
+
+    def _bounds(self):
+        keys = self.source.keys()
+        if self._version != self.source.version:
+            self._lo, self._hi = self.source.range(self.prefix)
+            self._version = self.source.version
+        return keys, self._lo, self._hi
+
+    def __len__(self):
+        _, lo, hi = self._bounds()
+        return hi - lo
+
+    def __contains__(self, entity):
+        key = self.source.key(entity)
+        return key is not None and key.startswith(self.prefix)
+
+    def __getitem__(self, key):
+        keys, lo, hi = self._bounds()
+        get = self.source.table.get
+        if isinstance(key, slice):
+            start, stop, _ = key.indices(hi - lo)
+            return [get(entity_id) for _, entity_id in keys[lo + start:lo + max(start, stop)]]
+        if key < 0:
+            key += hi - lo
+        if not 0 <= key < hi - lo:
+            raise IndexError(key)
+        return get(keys[lo + key][1])
+
+    def index(self, entity):
+        if entity not in self:
+            raise ValueError(f"{entity!r} nie pasuje do filtra")
+        keys, lo, _ = self._bounds()
+        return bisect_left(keys, (self.source.key(entity), entity.id)) - lo
+
+
+# --- WYSZUKIWANIE ROZMYTE ---
+def trigrams(text):
+    """Zbiór trygramów tekstu złożonego przez fold; każde słowo jest dopełnione spacjami jak w pg_trgm."""
+    grams = set()
+    for word in re.sub(r"[\W_]+", " ", text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """Odwrócony indeks trygramów ze wszystkich pól tekstowych dworców, pracowników i klientów.
+
+    Budowany porcjami (build_steps - App wywołuje je w wolnych chwilach pętli Tk po wczytaniu sieci), od
+    początku budowy aktualizowany przez słuchacza Repository. Listy trafień trzymają id encji; zapytanie
+    zlicza wspólne trygramy wektorowo (np.bincount) i szereguje wyniki podobieństwem Jaccarda.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.built = False
+        self.live = False  # True od początku budowy - od tej chwili indeks śledzi zmiany w repozytorium
+        self._postings = {}  # trygram -> set(id encji)
+        self._arrays = {}  # trygram -> tablica id z listy trafień (cache dla zapytań, czyszczony przy zmianie)
+        self._entities = {}  # id -> encja
+        self._text = {}  # id -> złożony tekst, z którego zbudowano trygramy encji
+        self._size = np.zeros(1024, dtype=np.int32)  # id -> liczba trygramów encji
+        self._kind = np.zeros(1024, dtype=np.int8)  # id -> KIND_CODES rodzaju
+        repo.listeners.append(self._on_change)
+
+    def __len__(self):
+        return len(self._text)
+
+    def build_steps(self, chunk=1000):
+        """Generator budujący indeks po chunk encji na krok; encje zmienione w trakcie są już aktualne."""
+        self.live = True
+        pending = [entity for table in self.repo.tables.values() for entity in table]
+        for start in range(0, len(pending), chunk):
+            for entity in pending[start:start + chunk]:
+                if entity.id not in self._text and entity in self.repo.tables[entity.kind]:
+                    self._add(entity)
+            yield
+        self.built = True
+
+    def build(self):
+        for _ in self.build_steps():
+            pass
+
+    @staticmethod
+    def _entity_text(entity):
+        return fold(" ".join(getattr(entity, field) or "" for field in SEARCH_FIELDS[entity.kind]))
+
+    def _on_change(self, event, entity, rank):
+        if not self.live:
+            return
+        if event == "add":
+            self._add(entity)
+        elif event == "remove":
+            self._remove(entity)
+        elif event == "update" and self._entity_text(entity) != self._text.get(entity.id):
+            self._remove(entity)
+            self._add(entity)
+
+    def _add(self, entity):
+        i = entity.id
+        if i >= len(self._size):
+            capacity = max(i + 1, 2 * len(self._size))
+            self._size = np.concatenate([self._size, np.zeros(capacity - len(self._size), dtype=np.int32)])
+            self._kind = np.concatenate([self._kind, np.zeros(capacity - len(self._kind), dtype=np.int8)])
+        text = self._entity_text(entity)
+        grams = trigrams(text)
+        self._entities[i] = entity
+        self._text[i] = text
+        self._size[i] = len(grams)
+        self._kind[i] = KIND_CODES[entity.kind]
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = set()
+            posting.add(i)
+            self._arrays.pop(gram, None)
+
+    def _remove(self, entity):
+        i = entity.id
+        text = self._text.pop(i, None)
+        if text is None:
+            return
+        del self._entities[i]
+        self._size[i] = self._kind[i] = 0
+        for gram in trigrams(text):
+            posting = self._postings[gram]
+            posting.discard(i)
+            if not posting:
+                del self._postings[gram]
+            self._arrays.pop(gram, None)
+
+    def _array(self, gram):
+        array = self._arrays.get(gram)
+        if array is None:
+            posting = self._postings.get(gram, ())
+            array = np.fromiter(posting, dtype=np.int64, count=len(posting))
+            if len(self._arrays) >= ARRAY_CACHE_LIMIT:
+                self._arrays.clear()
+            self._arrays[gram] = array
+        return array
+
+    def search(self, query, k=20, kinds=None):
+        """Lista [(encja, podobieństwo)] k najlepszych dopasowań, od najlepszego (remisy w kolejności id).
+
+        Przed rozpoczęciem budowy indeks jest budowany w całości; w trakcie budowy porcjami wynik obejmuje
+        tylko zaindeksowane już encje.
+        """
+        if not self.live:
+            self.build()
+        grams = trigrams(fold(query))
+        arrays = [array for array in map(self._array, grams) if len(array)]
+        if not arrays:
+            return []
+        counts = np.bincount(np.concatenate(arrays))
+        ids = np.flatnonzero(counts)
+        shared = counts[ids]
+        scores = shared / (len(grams) + self._size[ids] - shared)
+        keep = scores >= MIN_SIMILARITY
+        if kinds is not None:
+            keep &= np.isin(self._kind[ids], [KIND_CODES[kind] for kind in kinds])
+        ids, scores = ids[keep], scores[keep]
+        if len(ids) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            ids, scores = ids[top], scores[top]
+        order = np.lexsort((ids, -scores))
+        return [(self._entities[int(ids[i])], float(scores[i])) for i in order]
@@ -0,0 +1,263 @@
+import argparse
+import sys
+import time
+from contextlib import nullcontext
+
+import exporter
+from geocoding import (GAZETTEER_PATH, GEOCODE_CACHE_PATH, ChainGeocoder, GazetteerGeocoder, GeocodeCache,
+                       NominatimGeocoder, build_query)
+from coordstore import CoordinateStore
+from geoquery import StationQuery
+from importer import ImportPipeline, checkpoint_for, read_records
+from layout import ring_positions
+from models import Carrier, Employee, Station
+from repository import Repository
+from storage import NETWORK_DB_PATH, NetworkStore
+
+
+def _require(*values, message="Wszystkie pola są wymagane."):
+    if not all(value and str(value).strip() for value in values):
+        raise ValueError(message)
+
+
+# --- WARSTWA USŁUG ---
+class NetworkService:
+    """Operacje na sieci dworców niezależne od Tk - używane przez App, tryb wsadowy i benchmarki.
+
+    Niepoprawne dane zgłasza wyjątkiem ValueError z komunikatem dla użytkownika; o oknach dialogowych
+    i znacznikach na mapie decyduje wywołujący.
+    """
+
+    def __init__(self, repo=None, store=None, geocoder=None, cache=None):
+        self.repo = repo if repo is not None else Repository()
+        self.store = store
+        self.geocoder = geocoder
+        self.cache = cache
+        self.coords = CoordinateStore(self.repo)  # Aktualizowany przez słuchacza self.repo
+        self.query = StationQuery(self.repo, self.coords)
+        self.import_errors = 0  # błędy sieci w ostatnim import_file
+        if store is not None:
+            store.attach(self.repo)
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+        if self.store is not None:
+            self.store.close()
+
+    def load(self):
+        """Wczytuje całą zapisaną sieć (bez podziału na porcje)."""
+        for _ in self.store.load(self.repo):
+            pass
+        return self
+
+    def batch(self):
+        """Blok zmian zapisywanych jedną transakcją (bez magazynu - pusty kontekst)."""
+        return nullcontext() if self.store is None else self.store.batch()
+
+    # --- Tworzenie, zmiany i usuwanie ---
+    def add_station(self, name, address, coords=None, pending=False):
+        _require(name, address, message="Nazwa i adres są wymagane.")
+        station = Station(name, address)
+        station.coordinates = coords
+        station.pending = pending
+        return self.repo.add(station)
+
+    def add_employee(self, name, position, station):
+        _require(name, position, station)
+        return self.repo.add(Employee(name, position, station))
+
+    def add_carrier(self, name, fleet_type, station):
+        _require(name, fleet_type, station)
+        return self.repo.add(Carrier(name, fleet_type, station))
+
+    def update(self, entity, **fields):
+        """Zmienia pola tekstowe encji (name, address, position, fleet_type); puste wartości są odrzucane."""
+        _require(*fields.values(), message="Pola nie mogą być puste.")
+        changed = {field: value for field, value in fields.items() if getattr(entity, field) != value}
+        if changed:
+            self.repo.update(entity, **changed)
+        return bool(changed)
+
+    def reassign(self, child, station):
+        """Przenosi pracownika/klienta do innego dworca; zwraca True, jeśli dworzec się zmienił."""
+        if child.station is station:
+            return False
+        self.repo.move(child, station)
+        return True
+
+    def remove(self, entity):
+        with self.batch():
+            self.repo.remove(entity)  # Usunięcie dworca usuwa też jego pracowników i klientów
+
+    # --- Historia zmian ---
+    def undo(self):
+        """Cofa ostatnią operację z dziennika; zwraca encje, których dotyczyła, albo None."""
+        return self.store.journal.undo() if self.store is not None else None
+
+    def redo(self):
+        """Ponawia ostatnio cofniętą operację; zwraca encje, których dotyczyła, albo None."""
+        return self.store.journal.redo() if self.store is not None else None
+
+    def last_operation(self):
+        """Znacznik ostatniej operacji w historii - do przekazania później do amend()."""
+        return self.store.journal.last_group if self.store is not None else None
+
+    def amend(self, operation):
+        """Blok zmian dołączanych do operacji z last_operation(), o ile od tamtej pory nic nie zmieniono."""
+        return nullcontext() if self.store is None else self.store.journal.amend(operation)
+
+    # --- Rozmieszczenie wokół dworca ---
+    def child_positions(self, station, children):
+        """Przydziela dzieciom dworca pozycje na pierścieniach; zwraca [(slot, [lat, lon])] lub None bez lokalizacji.
+
+        Pozycja jest zajęta do remove_marker() dziecka - wywołujący ustawia child.slot po umieszczeniu znacznika.
+        """
+        center = self.coords.get(station.id)
+        if center is None:
+            return None
+        slots = [station.slots.acquire() for _ in children]
+        return list(zip(slots, ring_positions(center, slots).tolist()))
+
+    # --- Geokodowanie i zapytania ---
+    def geocode(self, query):
+        """Synchronicznie geokoduje zapytanie (najpierw cache); zwraca [lat, lon] albo None."""
+        if self.cache is not None:
+            cached = self.cache.get(query)
+            if cached is not GeocodeCache.MISS:
+                return cached
+        coords = self.geocoder.geocode(query)
+        if self.cache is not None:
+            self.cache.put(query, coords)
+        return coords
+
+    def import_file(self, path, checkpoint_path=None, progress=None, cancel=None):
+        """Importuje dworce z pliku CSV/JSONL z geokodowaniem; zwraca (dodane dworce, liczba nieudanych)."""
+        located, failed = self.locate_file(path, self.station_keys(), checkpoint_path, progress, cancel)
+        return self.add_located(located), failed
+
+    def station_keys(self):
+        """Zbiór par (nazwa, adres) istniejących dworców - do pomijania duplikatów przy imporcie."""
+        return {(s.name, s.address) for s in self.repo.stations}
+
+    def locate_file(self, path, existing, checkpoint_path=None, progress=None, cancel=None):
+        """Geokoduje dworce z pliku bez zmian w repozytorium (można wołać w wątku roboczym).
+
+        Pomija pary (nazwa, adres) z existing; zwraca ([(rekord, coords)], liczba nieudanych), a błędy sieci
+        zapisuje w import_errors - także wtedy, gdy odczyt pliku przerwie wyjątek. Plik kontrolny (domyślnie
+        checkpoint_for(path)) zostaje tylko po przerwanym przebiegu - do wznowienia.
+        """
+        pipeline = ImportPipeline(self.geocoder, self.cache, checkpoint_path=checkpoint_path or checkpoint_for(path),
+                                  progress=progress)
+        located, failed = [], 0
+        records = (r for r in read_records(path) if (r["name"], r["address"]) not in existing)
+        try:
+            for record, coords in pipeline.run(records, cancel):
+                if coords:
+                    located.append((record, coords))
+                else:
+                    failed += 1
+        finally:
+            self.import_errors = pipeline.errors
+        if cancel is None or not cancel.is_set():
+            pipeline.discard_checkpoint()
+        return located, failed
+
+    def add_located(self, located):
+        """Dodaje zlokalizowane rekordy jako dworce jedną transakcją; pomija duplikaty, zwraca dodane dworce."""
+        existing = self.station_keys()
+        added = []
+        with self.batch():
+            for record, coords in located:
+                key = (record["name"], record["address"])
+                if key not in existing:  # Powtórzony wiersz w pliku albo dworzec dodany w trakcie importu
+                    existing.add(key)
+                    added.append(self.add_station(record["name"], record["address"], coords))
+        return added
+
+    def bounds(self, kinds=("station",)):
+        """Prostokąt obejmujący encje danych rodzajów: ((lat_min, lon_min), (lat_max, lon_max)) albo None."""
+        return self.coords.bounds(kinds)
+
+    def nearest(self, lat, lon, n=5):
+        return self.query.nearest(lat, lon, n)
+
+    def within(self, lat, lon, radius_km):
+        return self.query.within(lat, lon, radius_km)
+
+    # --- Eksport ---
+    def export(self, out, fmt="jsonl", kinds=None):
+        """Zapisuje sieć do strumienia w formacie jsonl (wszystko), geojson (dworce) lub csv (obsada); zwraca liczbę."""
+        return exporter.export(self.repo, out, fmt, kinds)
+
+
+def open_network(db_path=NETWORK_DB_PATH, cache_path=GEOCODE_CACHE_PATH, gazetteer=GAZETTEER_PATH, offline=False):
+    """Usługa nad zapisaną siecią z geokoderem (gazetteer, opcjonalnie Nominatim) i cache."""
+    backends = [GazetteerGeocoder(gazetteer)]
+    if not offline:
+        backends.append(NominatimGeocoder(user_agent=f"station_mapper_{int(time.time())}"))
+    service = NetworkService(store=NetworkStore(db_path), geocoder=ChainGeocoder(backends),
+                             cache=GeocodeCache(cache_path))
+    return service.load()
+
+
+# --- TRYB BEZ GUI ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Operacje na sieci dworców bez interfejsu graficznego.")
+    parser.add_argument("--db", default=NETWORK_DB_PATH, help="baza sieci (domyślnie ta, której używa aplikacja)")
+    parser.add_argument("--cache", default=GEOCODE_CACHE_PATH, help="plik cache geokodowania (domyślnie aplikacji)")
+    parser.add_argument("--gazetteer", default=GAZETTEER_PATH, help="lokalny plik miejscowości i dworców")
+    parser.add_argument("--offline", action="store_true", help="tylko gazetteer, bez zapytań do Nominatim")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("import", help="dodaje dworce z pliku CSV/JSONL do bazy")
+    cmd.add_argument("input")
+    cmd = commands.add_parser("query", help="najbliższe dworce / dworce w promieniu od punktu")
+    cmd.add_argument("lat", type=float)
+    cmd.add_argument("lon", type=float)
+    group = cmd.add_mutually_exclusive_group()
+    group.add_argument("-n", "--nearest", type=int, default=5, help="liczba najbliższych dworców")
+    group.add_argument("-r", "--radius", type=float, help="promień w km")
+    cmd = commands.add_parser("export", help="zapisuje sieć jako JSONL, GeoJSON (dworce) lub CSV (obsada)")
+    cmd.add_argument("output", nargs="?", default="-", help="plik wynikowy (domyślnie standardowe wyjście)")
+    cmd.add_argument("-f", "--format", choices=exporter.EXPORT_FORMATS,
+                     help="format (domyślnie z rozszerzenia pliku, dla wyjścia standardowego jsonl)")
+    cmd = commands.add_parser("geocode", help="geokoduje adres dworca")
+    cmd.add_argument("address")
+    args = parser.parse_args(argv)
+
+    service = open_network(args.db, args.cache, args.gazetteer, args.offline)
+    try:
+        if args.command == "import":
+            def progress(done, total):
+                print(f"\rGeokodowanie: {done}/{total}", end="", file=sys.stderr, flush=True)
+
+            added, failed = service.import_file(args.input, progress=progress)
+            print(f"\nDodano: {len(added)}, nie zlokalizowano: {failed}, błędy sieci: {service.import_errors}",
+                  file=sys.stderr)
+        elif args.command == "query":
+            results = service.within(args.lat, args.lon, args.radius) if args.radius else \
+                service.nearest(args.lat, args.lon, args.nearest)
+            for station, km in results:
+                print(f"{km:8.2f} km  {station.name} ({station.address})")
+        elif args.command == "export":
+            if args.output == "-":
+                if hasattr(sys.stdout, "reconfigure"):
+                    sys.stdout.reconfigure(newline="")  # Moduł csv sam kończy wiersze (\r\n) - bez tłumaczenia
+                count = service.export(sys.stdout, args.format or "jsonl")
+            else:
+                count = exporter.export_file(service.repo, args.output, args.format)
+            print(f"Wyeksportowano: {count}", file=sys.stderr)
+        elif args.command == "geocode":
+            coords = service.geocode(build_query(args.address))
+            if not coords:
+                print("Nie znaleziono lokalizacji.", file=sys.stderr)
+                return 1
+            print(f"{coords[0]:.6f} {coords[1]:.6f}")
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+class QuadTree:
+    """Drzewo czwórkowe punktów w kwadracie [0, 1) x [0, 1) (np. współrzędne world_xy z maplayer).
+
+    Wstawianie i usuwanie kosztują O(głębokość), zapytanie o prostokąt odwiedza tylko węzły, które go przecinają.
+    """
+
+    CAPACITY = 16  # Liczba punktów w liściu, po przekroczeniu której liść jest dzielony
+    MAX_DEPTH = 24  # Ok. 2 m na równiku - głębiej nie dzielimy (wiele punktów w jednym miejscu)
+
+    __slots__ = ("x0", "y0", "x1", "y1", "depth", "points", "children", "size")
+
+    def __init__(self, x0=0.0, y0=0.0, x1=1.0, y1=1.0, depth=0):
+        self.x0, self.y0, self.x1, self.y1 = x0, y0, x1, y1
+        self.depth = depth
+        self.points = {}  # obiekt -> (x, y), tylko w liściach
+        self.children = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, item, x, y):
+        node = self
+        while True:
+            node.size += 1
+            if node.children is None:
+                node.points[item] = (x, y)
+                if len(node.points) > self.CAPACITY and node.depth < self.MAX_DEPTH:
+                    node._split()
+                return
+            node = node._child(x, y)
+
+    def remove(self, item, x, y):
+        """Usuwa punkt wstawiony z tymi samymi współrzędnymi; zwraca False, jeśli go nie było."""
+        path = []
+        node = self
+        while node.children is not None:
+            path.append(node)
+            node = node._child(x, y)
+        if node.points.pop(item, None) is None:
+            return False
+        node.size -= 1
+        for parent in path:
+            parent.size -= 1
+            if parent.size <= self.CAPACITY // 2 and parent.children is not None:
+                parent._merge()
+                break
+        return True
+
+    def query(self, x0, y0, x1, y1):
+        """Generator obiektów leżących w prostokącie [x0, x1] x [y0, y1]."""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.size == 0 or node.x0 > x1 or node.x1 < x0 or node.y0 > y1 or node.y1 < y0:
+                continue
+            if node.children is not None:
+                stack.extend(node.children)
+                continue
+            inside = node.x0 >= x0 and node.x1 <= x1 and node.y0 >= y0 and node.y1 <= y1
+            for item, (x, y) in node.points.items():
+                if inside or (x0 <= x <= x1 and y0 <= y <= y1):
+                    yield item
+
+    def _child(self, x, y):
+        mx, my = (self.x0 + self.x1) / 2, (self.y0 + self.y1) / 2
+        return self.children[(x >= mx) + 2 * (y >= my)]
+
+    def _split(self):
+        mx, my = (self.x0 + self.x1) / 2, (self.y0 + self.y1) / 2
+        d = self.depth + 1
+        self.children = (QuadTree(self.x0, self.y0, mx, my, d), QuadTree(mx, self.y0, self.x1, my, d),
+                         QuadTree(self.x0, my, mx, self.y1, d), QuadTree(mx, my, self.x1, self.y1, d))
+        points, self.points = self.points, {}
+        for item, (x, y) in points.items():
+            child = self._child(x, y)
+            child.points[item] = (x, y)
+            child.size += 1
+        for child in self.children:
+            if len(child.points) > self.CAPACITY and d < self.MAX_DEPTH:
+                child._split()
+
+    def _merge(self):
+        """Scala poddrzewo z powrotem w liść, gdy zostało w nim mało punktów."""
+        stack = list(self.children)
+        self.children = None
+        while stack:
+            node = stack.pop()
+            if node.children is not None:
+                stack.extend(node.children)
+            else:
+                self.points.update(node.points)
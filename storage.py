@@ -0,0 +1,342 @@
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+
+from models import Carrier, Employee, Station
+
+NETWORK_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "network.sqlite3")  # baza aplikacji
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stations (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    address TEXT NOT NULL,
+    lat REAL,
+    lon REAL
+);
+CREATE TABLE IF NOT EXISTS employees (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    position TEXT NOT NULL,
+    station_id INTEGER NOT NULL REFERENCES stations(id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS carriers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    fleet_type TEXT NOT NULL,
+    station_id INTEGER NOT NULL REFERENCES stations(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS employees_station ON employees(station_id);
+CREATE INDEX IF NOT EXISTS carriers_station ON carriers(station_id);
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY,
+    grp INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    entity_id INTEGER NOT NULL,
+    before TEXT,
+    after TEXT,
+    undone INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS journal_grp ON journal(grp);
+"""
+
+JOURNAL_HISTORY = 200  # tyle ostatnich operacji można cofnąć; starsze wpisy dziennika są usuwane
+
+# Stałe teksty zapytań - sqlite3 trzyma je w cache przygotowanych instrukcji
+# Prawdziwy upsert: INSERT OR REPLACE usuwa stary wiersz, a ON DELETE CASCADE zabrałby obsadę dworca
+UPSERT = {
+    "station": "INSERT INTO stations (id, name, address, lat, lon) VALUES (?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE "
+               "SET name = excluded.name, address = excluded.address, lat = excluded.lat, lon = excluded.lon",
+    "employee": "INSERT INTO employees (id, name, position, station_id) VALUES (?, ?, ?, ?) ON CONFLICT(id) DO UPDATE "
+                "SET name = excluded.name, position = excluded.position, station_id = excluded.station_id",
+    "carrier": "INSERT INTO carriers (id, name, fleet_type, station_id) VALUES (?, ?, ?, ?) ON CONFLICT(id) DO UPDATE "
+               "SET name = excluded.name, fleet_type = excluded.fleet_type, station_id = excluded.station_id",
+}
+DELETE = {
+    "station": "DELETE FROM stations WHERE id = ?",
+    "employee": "DELETE FROM employees WHERE id = ?",
+    "carrier": "DELETE FROM carriers WHERE id = ?",
+}
+
+
+# Zapisywane pola encji - w tej samej kolejności co kolumny tabel (bez id)
+FIELDS = {
+    "station": ("name", "address", "lat", "lon"),
+    "employee": ("name", "position", "station_id"),
+    "carrier": ("name", "fleet_type", "station_id"),
+}
+
+
+def _build(repo, kind, entity_id, values):
+    """Encja odtworzona z zapisanych pól (wiersz tabeli albo stan z dziennika)."""
+    if kind == "station":
+        entity = Station(values[0], values[1])
+        if values[2] is not None:
+            entity.coordinates = (values[2], values[3])
+    elif kind == "employee":
+        entity = Employee(values[0], values[1], repo.get("station", values[2]))
+    else:
+        entity = Carrier(values[0], values[1], repo.get("station", values[2]))
+    entity.id = entity_id
+    return entity
+
+
+def _row(entity):
+    if entity.kind == "station":
+        lat, lon = entity.coordinates if entity.coordinates else (None, None)
+        return entity.id, entity.name, entity.address, lat, lon
+    if entity.kind == "employee":
+        return entity.id, entity.name, entity.position, entity.station.id
+    return entity.id, entity.name, entity.fleet_type, entity.station.id
+
+
+# --- MAGAZYN SQLITE ---
+class NetworkStore:
+    """Trwały zapis sieci w SQLite (WAL), aktualizowany przyrostowo przy każdej zmianie w Repository.
+
+    Poza blokiem batch() każda zmiana jest od razu zatwierdzana (awaria nie gubi danych); w bloku batch()
+    zmiany są zbierane i zapisywane jedną transakcją przez executemany.
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, cached_statements=32)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+        self.suspended = False  # True podczas wczytywania - encje z bazy nie są zapisywane ponownie
+        self.journal = Journal(self)
+        self.batches = 0  # licznik zewnętrznych bloków batch() - jeden blok to jedna operacja w dzienniku
+        self._pending = []  # (sql, parametry) zebrane w bloku batch()
+        self._batch_depth = 0
+
+    def attach(self, repo):
+        self.journal.repo = repo
+        repo.listeners.append(self.on_change)
+
+    def on_change(self, event, entity, rank):
+        self.journal.record(event, entity)
+        if self.suspended:
+            return
+        if event == "remove":
+            self._pending.append((DELETE[entity.kind], (entity.id,)))
+        else:
+            self._pending.append((UPSERT[entity.kind], _row(entity)))
+        if self._batch_depth == 0:
+            self.flush()  # Wiersz i wpis dziennika w jednej transakcji
+
+    @contextmanager
+    def batch(self):
+        """Grupuje wszystkie zmiany w bloku w jedną transakcję."""
+        if self._batch_depth == 0:
+            self.batches += 1
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        with self.db:
+            # Kolejne wiersze z tym samym zapytaniem idą jednym executemany
+            start = 0
+            for i in range(1, len(self._pending) + 1):
+                if i == len(self._pending) or self._pending[i][0] != self._pending[start][0]:
+                    self.db.executemany(self._pending[start][0], [params for _, params in self._pending[start:i]])
+                    start = i
+        self._pending.clear()
+
+    def load(self, repo, chunk=5000, kinds=("station", "employee", "carrier")):
+        """Wczytuje sieć do repozytorium porcjami; generator zwraca listę encji dodanych w każdej porcji."""
+        # Id wspólne dla wszystkich tabel: encje dodane w trakcie wczytywania porcjami nie mogą zająć
+        # id jeszcze niewczytanego wiersza (upsert nadpisałby go w bazie)
+        repo.reserve_ids(max(self.db.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0
+                             for table in ("stations", "employees", "carriers")))
+        queries = (
+            ("station", "SELECT id, name, address, lat, lon FROM stations ORDER BY id"),
+            ("employee", "SELECT id, name, position, station_id FROM employees ORDER BY id"),
+            ("carrier", "SELECT id, name, fleet_type, station_id FROM carriers ORDER BY id"),
+        )
+        for kind, sql in queries:
+            if kind not in kinds:
+                continue
+            cursor = self.db.execute(sql)
+            while True:
+                rows = cursor.fetchmany(chunk)
+                if not rows:
+                    break
+                added = []
+                self.suspended = True
+                try:
+                    for row in rows:
+                        added.append(repo.add(_build(repo, kind, row[0], row[1:])))
+                finally:
+                    self.suspended = False
+                yield added
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+
+# --- DZIENNIK ZMIAN ---
+class Journal:
+    """Dopisywany dziennik zmian modelu w tej samej bazie co tabele sieci - historia cofania i ponawiania.
+
+    Wpis (zdarzenie, stan przed, stan po) trafia do bazy w tej samej transakcji co zmieniony wiersz, więc
+    koszt zapisu zależy od zmiany, a nie od wielkości sieci. Tabele sieci są aktualną migawką - po awarii
+    nic nie trzeba odtwarzać; z dziennika zostaje tylko JOURNAL_HISTORY ostatnich operacji. Operacja to
+    wszystkie zmiany jednego bloku NetworkStore.batch() (np. usunięcie dworca z obsadą) albo pojedyncza zmiana.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.repo = None  # ustawiane przez NetworkStore.attach
+        self.recording = True  # False podczas cofania/ponawiania - te zmiany nie tworzą nowych wpisów
+        self.undo_groups = []  # operacje do cofnięcia, od najstarszej
+        self.redo_groups = []  # cofnięte operacje, ostatnio cofnięta na końcu
+        self._stations = {}  # id dworca -> ostatni zapisany stan (współrzędne zmieniają się poza Repository)
+        self._batch = None
+        self._group = None
+        db = store.db
+        self._seq = (db.execute("SELECT MAX(seq) FROM journal").fetchone()[0] or 0) + 1
+        for grp, undone in db.execute("SELECT grp, MAX(undone) FROM journal GROUP BY grp ORDER BY grp"):
+            (self.redo_groups if undone else self.undo_groups).append(grp)
+        self.redo_groups.reverse()
+
+    @staticmethod
+    def _state(entity):
+        return dict(zip(FIELDS[entity.kind], _row(entity)[1:]))
+
+    def record(self, event, entity):
+        state = None if event == "remove" else self._state(entity)
+        before = self._stations.get(entity.id) if entity.kind == "station" else None
+        if entity.kind == "station":
+            if event == "remove":
+                self._stations.pop(entity.id, None)
+            else:
+                self._stations[entity.id] = state
+        if self.store.suspended or not self.recording:
+            return
+
+        if event == "add":
+            self._append(event, entity, None, state)
+        elif event == "remove":
+            self._append(event, entity, before or self._state(entity), None)
+        elif event == "move":
+            self._append(event, entity, {"station_id": self.repo.previous["station"].id},
+                         {"station_id": entity.station.id})
+        else:
+            if entity.kind != "station":
+                before = {**state, **{f: v for f, v in self.repo.previous.items() if f in state}}
+            if before is not None and before != state:
+                self._append(event, entity, before, state)
+
+    def _append(self, event, entity, before, after):
+        store = self.store
+        if not (store._batch_depth and self._batch == store.batches):
+            # Nowa operacja: pierwsza zmiana poza blokiem batch() albo pierwsza w nowym bloku
+            self._batch = store.batches if store._batch_depth else None
+            self._group = self._seq
+            self.undo_groups.append(self._group)
+            if self.redo_groups:
+                store._pending.append(("DELETE FROM journal WHERE undone = 1", ()))
+                self.redo_groups.clear()
+            if len(self.undo_groups) > 2 * JOURNAL_HISTORY:
+                del self.undo_groups[:-JOURNAL_HISTORY]
+                store._pending.append(("DELETE FROM journal WHERE grp < ?", (self.undo_groups[0],)))
+        store._pending.append((
+            "INSERT INTO journal (seq, grp, event, kind, entity_id, before, after) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self._seq, self._group, event, entity.kind, entity.id,
+             json.dumps(before, ensure_ascii=False) if before is not None else None,
+             json.dumps(after, ensure_ascii=False) if after is not None else None)))
+        self._seq += 1
+
+    @property
+    def last_group(self):
+        """Operacja, którą cofnąłby teraz undo(); None, gdy nie ma czego cofać."""
+        return self.undo_groups[-1] if self.undo_groups else None
+
+    @contextmanager
+    def amend(self, grp):
+        """Blok zmian dopisywanych do operacji grp, jeśli nadal jest ostatnia - inaczej blok to nowa operacja.
+
+        Dla zmian kończących operację z opóźnieniem, np. wyniku geokodowania nowego dworca: jedno cofnięcie
+        usuwa wtedy dworzec razem z lokalizacją.
+        """
+        store = self.store
+        with store.batch():
+            if store._batch_depth == 1 and grp is not None and grp == self.last_group and not self.redo_groups:
+                self._batch, self._group = store.batches, grp
+            yield
+
+    # --- Cofanie i ponawianie ---
+    def undo(self):
+        """Cofa ostatnią operację; zwraca encje, których dotyczyła, albo None, gdy nie ma czego cofać."""
+        if not self.undo_groups:
+            return None
+        grp = self.undo_groups.pop()
+        touched = self._replay(grp, undo=True)
+        self.redo_groups.append(grp)
+        return touched
+
+    def redo(self):
+        """Ponawia ostatnio cofniętą operację; zwraca encje, których dotyczyła, albo None."""
+        if not self.redo_groups:
+            return None
+        grp = self.redo_groups.pop()
+        touched = self._replay(grp, undo=False)
+        self.undo_groups.append(grp)
+        return touched
+
+    def _replay(self, grp, undo):
+        self.store.flush()
+        rows = self.store.db.execute("SELECT event, kind, entity_id, before, after FROM journal WHERE grp = ? "
+                                     f"ORDER BY seq {'DESC' if undo else 'ASC'}", (grp,)).fetchall()
+        touched = []
+        self.recording = False
+        try:
+            with self.store.batch():
+                for event, kind, entity_id, before, after in rows:
+                    state = json.loads(before if undo else after) if (before if undo else after) else None
+                    if event == "add":
+                        op = "remove" if undo else "add"
+                    elif event == "remove":
+                        op = "add" if undo else "remove"
+                    else:
+                        op = "set"
+                    entity = self._apply(op, kind, entity_id, state)
+                    if entity is not None:
+                        touched.append(entity)
+                self.store._pending.append(("UPDATE journal SET undone = ? WHERE grp = ?", (int(undo), grp)))
+        finally:
+            self.recording = True
+        return touched
+
+    def _apply(self, op, kind, entity_id, state):
+        repo = self.repo
+        entity = repo.get(kind, entity_id)
+        if op == "remove":
+            if entity is not None:
+                repo.remove(entity)
+            return entity
+        if op == "add":
+            if entity is None:
+                entity = repo.add(_build(repo, kind, entity_id, [state[field] for field in FIELDS[kind]]))
+            return entity
+        if entity is None:
+            return None
+        if "lat" in state:
+            entity.coordinates = (state["lat"], state["lon"]) if state["lat"] is not None else None
+        if "station_id" in state:
+            repo.move(entity, repo.get("station", state["station_id"]))
+        fields = {field: state[field] for field in ("name", "address", "position", "fleet_type") if field in state}
+        if fields or kind == "station":
+            repo.update(entity, **fields)
+        return entity
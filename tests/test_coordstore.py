@@ -0,0 +1,55 @@
+from services import NetworkService
+
+CITIES = {
+    "Warszawa": (52.2289, 21.0031),
+    "Kraków": (50.0677, 19.9476),
+    "Gdańsk": (54.3556, 18.6440),
+    "Poznań": (52.4015, 16.9115),
+}
+
+
+def _service():
+    service = NetworkService()
+    for name, coords in CITIES.items():
+        service.add_station(name, "ul. Dworcowa 1", coords)
+    service.add_station("Bez lokalizacji", "ul. Nowa 2", pending=True)
+    return service
+
+
+def test_bounds():
+    service = _service()
+    assert service.bounds() == ((50.0677, 16.9115), (54.3556, 21.0031))
+    assert NetworkService().bounds() is None
+
+
+def test_nearest_and_within():
+    service = _service()
+    names = [station.name for station, _ in service.query.nearest(52.0, 20.5, 2)]
+    assert names == ["Warszawa", "Kraków"]
+    (station, km), = service.query.within(50.06, 19.94, 5)
+    assert station.name == "Kraków" and km < 1.5
+    assert len(service.query.nearest(52.0, 20.5, 10)) == len(CITIES)
+
+
+def test_store_follows_repository_events():
+    service = _service()
+    station = next(iter(service.repo.find("station", "Bez lokalizacji")))
+    station.coordinates = (49.0, 22.0)  # Zmiana na obiekcie - magazyn widzi ją dopiero po repo.update
+    assert service.coords.get(station.id) is None
+    service.repo.update(station, pending=False)
+    assert service.coords.get(station.id) == (49.0, 22.0)
+    assert service.bounds()[0] == (49.0, 16.9115)
+
+    service.remove(station)
+    assert service.coords.get(station.id) is None
+    assert service.bounds()[0][0] == 50.0677
+
+
+def test_stores_are_independent():
+    first, second = _service(), NetworkService()
+    moved = second.add_station("Wrocław", "ul. Piłsudskiego 105", (51.0979, 17.0367))
+    assert first.bounds() == ((50.0677, 16.9115), (54.3556, 21.0031))
+    assert second.bounds() == ((51.0979, 17.0367), (51.0979, 17.0367))
+    moved.coordinates = None
+    first.repo.update(next(iter(first.repo.find("station", "Gdańsk"))), name="Gdańsk Główny")
+    assert second.coords.get(moved.id) == (51.0979, 17.0367)
@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+
+import exporter
+import services
+from models import Carrier, Employee
+from storage import NetworkStore
+
+
+def _service(store=None):
+    service = services.NetworkService(store=store)
+    station = service.add_station('Dworzec "Główny"', "ul. Zażółć 1\ngęślą", (52.2289, 21.0031))
+    service.add_station("Bez lokalizacji", "ul. Nowa 2", pending=True)
+    service.repo.add(Employee("Jan, \"Kowalski\"", "kasjer\\dyżurny", station))
+    service.repo.add(Carrier("PKS", "autobus", station))
+    return service, station
+
+
+def test_geojson_is_valid():
+    service, station = _service()
+    out = io.StringIO()
+    assert exporter.export(service.repo, out, "geojson") == 1
+    document = json.loads(out.getvalue())
+    feature, = document["features"]
+    assert document["type"] == "FeatureCollection"
+    assert feature["geometry"]["coordinates"] == [21.0031, 52.2289]
+    assert feature["properties"] == {"name": station.name, "address": station.address,
+                                     "employees": 1, "carriers": 1}
+    empty = io.StringIO()
+    assert exporter.export(services.NetworkService().repo, empty, "geojson") == 0
+    assert json.loads(empty.getvalue())["features"] == []
+
+
+def test_jsonl_lines_match_json_encoding():
+    service, station = _service()
+    out = io.StringIO()
+    assert exporter.export(service.repo, out, "jsonl") == 4
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [row["kind"] for row in rows] == ["station", "station", "employee", "carrier"]
+    assert rows[1]["lat"] is None
+    assert rows[2] == {"kind": "employee", "id": rows[2]["id"], "name": 'Jan, "Kowalski"',
+                       "position": "kasjer\\dyżurny", "station_id": station.id}
+    # Szablon wierszy obsady daje ten sam tekst co koder JSON
+    assert out.getvalue().splitlines()[2] == exporter._encode(rows[2])
+
+
+def test_csv_round_trip():
+    service, station = _service()
+    out = io.StringIO(newline="")
+    assert exporter.export(service.repo, out, "csv") == 2
+    rows = list(csv.reader(io.StringIO(out.getvalue(), newline="")))
+    assert tuple(rows[0]) == exporter.CSV_HEADER
+    assert rows[1][:4] == ["employee", rows[1][1], 'Jan, "Kowalski"', "kasjer\\dyżurny"]
+    assert rows[2][5] == station.name
+
+
+def test_snapshot_exports_like_repository():
+    service, _ = _service()
+    snapshot = exporter.Snapshot(service.repo)
+    expected = {}
+    for fmt in exporter.EXPORT_FORMATS:
+        expected[fmt] = io.StringIO()
+        exporter.export(service.repo, expected[fmt], fmt)
+    late = service.add_station("Dodany po migawce", "ul. Późna 3", (50.0, 20.0))
+    service.repo.add(Employee("Anna", "dyżurna", late))
+    for fmt in exporter.EXPORT_FORMATS:
+        out = io.StringIO()
+        exporter.export(snapshot, out, fmt)
+        assert out.getvalue() == expected[fmt].getvalue()
+
+
+def test_cli_csv_to_stdout_has_single_line_endings(tmp_path, capfd):
+    service, _ = _service(NetworkStore(str(tmp_path / "net.sqlite3")))
+    service.close()
+
+    services.main(["--db", str(tmp_path / "net.sqlite3"), "--cache", str(tmp_path / "cache.sqlite3"),
+                   "--offline", "export", "-f", "csv"])
+    data = capfd.readouterr().out
+    assert "\r\r\n" not in data
+    assert data.startswith(",".join(exporter.CSV_HEADER) + "\r\n")
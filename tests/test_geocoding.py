@@ -0,0 +1,50 @@
+import sqlite3
+
+import pytest
+
+from geocoding import GAZETTEER_PATH, GazetteerGeocoder, GeocodeCache, Geocoder
+
+
+def test_cache_round_trip_and_failures(tmp_path):
+    cache = GeocodeCache(str(tmp_path / "cache.sqlite3"))
+    cache.put("Kraków,  Główny!", [50.0677, 19.9476])
+    cache.put("Nigdzie", None)
+    assert cache.get("kraków główny") == [50.0677, 19.9476]
+    assert cache.get("nigdzie") is None
+    assert cache.get("Gdańsk") is GeocodeCache.MISS
+    assert (cache.hits, cache.misses) == (2, 1)
+    cache.close()
+
+    cache = GeocodeCache(str(tmp_path / "cache.sqlite3"))
+    assert cache.get("Kraków Główny") == [50.0677, 19.9476]
+    cache.close()
+
+
+def test_hits_do_not_hold_write_lock(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = GeocodeCache(path)
+    for i in range(300):
+        cache.put(f"miasto {i}", [50.0, 20.0 + i / 1000])
+    for i in range(300):
+        cache.get(f"miasto {i}")  # Po 256 trafieniach znaczniki LRU trafiają do bazy
+    assert not cache._db.in_transaction
+
+    other = sqlite3.connect(path, timeout=0)
+    other.execute("UPDATE geocode SET last_used = 0 WHERE query = 'miasto 1'")  # Inny proces może pisać
+    other.commit()
+    other.close()
+    cache.close()
+
+
+def test_gazetteer_prefix_expansion():
+    gazetteer = GazetteerGeocoder(GAZETTEER_PATH)
+    tokens = gazetteer.sorted_tokens
+    for token in ("warsz", "centr", "glow", "krak", "zzzz", tokens[-1], tokens[0]):
+        assert gazetteer._expand(token) == [t for t in tokens if t.startswith(token)]
+    assert gazetteer._expand("war") == []  # Krótszy niż MIN_PREFIX i nie ma takiego tokenu
+    assert gazetteer.geocode("Warszawa Centr") == gazetteer.geocode("Warszawa Centralna")
+
+
+def test_geocoder_is_abstract():
+    with pytest.raises(TypeError):
+        Geocoder()
@@ -0,0 +1,81 @@
+import os
+import threading
+
+from geocoding import GeocodeCache
+from importer import checkpoint_for, read_records
+from services import NetworkService
+
+
+class _Geocoder:
+    """Geokoder testowy: znane adresy, "awaria" kończy się błędem sieci."""
+
+    PLACES = {"Kraków": (50.0677, 19.9476), "Gdańsk": (54.3556, 18.6440)}
+
+    def geocode(self, query):
+        if "awaria" in query:
+            raise OSError("brak sieci")
+        return next((coords for city, coords in self.PLACES.items() if city in query), None)
+
+
+def _service(tmp_path):
+    return NetworkService(geocoder=_Geocoder(), cache=GeocodeCache(str(tmp_path / "cache.sqlite3")))
+
+
+def _write(tmp_path, lines):
+    path = tmp_path / "stations.csv"
+    path.write_text("name,address\n" + "".join(f"{line}\n" for line in lines), encoding="utf-8")
+    return str(path)
+
+
+def test_import_file(tmp_path):
+    service = _service(tmp_path)
+    service.add_station("Gdańsk Główny", "Gdańsk")
+    path = _write(tmp_path, ["Kraków Główny,Kraków", "Kraków Główny,Kraków", "Gdańsk Główny,Gdańsk",
+                             "Nigdzie,Brak", "Zepsuty,awaria"])
+    added, failed = service.import_file(path)
+    assert [s.name for s in added] == ["Kraków Główny"]
+    assert added[0].coordinates == (50.0677, 19.9476)
+    assert failed == 1
+    assert service.import_errors == 1
+    service.close()
+
+
+def test_locate_file_does_not_touch_repository(tmp_path):
+    service = _service(tmp_path)
+    path = _write(tmp_path, ["Kraków Główny,Kraków"])
+    located, failed = service.locate_file(path, service.station_keys())
+    assert len(service.repo.stations) == 0 and failed == 0
+    service.add_station("Kraków Główny", "Kraków")  # Dodany w trakcie importu - duplikat jest pomijany
+    assert service.add_located(located) == []
+
+    cancel = threading.Event()
+    cancel.set()
+    assert service.locate_file(path, set(), cancel=cancel) == ([], 0)
+    service.close()
+
+
+def test_read_records_skips_excel_bom(tmp_path):
+    path = tmp_path / "excel.csv"
+    path.write_bytes("\ufeffnazwa;adres\nKraków Główny;Kraków\n".encode("utf-8"))
+    assert list(read_records(str(path))) == [{"name": "Kraków Główny", "address": "Kraków"}]
+
+    service = _service(tmp_path)
+    added, failed = service.import_file(str(path))
+    assert [s.name for s in added] == ["Kraków Główny"] and failed == 0
+    service.close()
+
+
+def test_checkpoint_kept_only_for_interrupted_runs(tmp_path):
+    service = _service(tmp_path)
+    path = _write(tmp_path, ["Kraków Główny,Kraków"])
+    checkpoint = checkpoint_for(path)
+    assert os.path.dirname(checkpoint) != str(tmp_path)
+
+    cancel = threading.Event()
+    service.locate_file(path, set(), progress=lambda done, total: cancel.set(), cancel=cancel)
+    assert os.path.exists(checkpoint)  # Przerwany import można wznowić
+
+    service.import_file(path)
+    assert not os.path.exists(checkpoint)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".checkpoint")]
+    service.close()
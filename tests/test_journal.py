@@ -0,0 +1,83 @@
+from services import NetworkService
+from storage import NetworkStore
+
+
+def _service(path):
+    return NetworkService(store=NetworkStore(str(path))).load()
+
+
+def test_undo_redo_update(tmp_path):
+    service = _service(tmp_path / "net.sqlite3")
+    station = service.add_station("Kraków", "ul. Pawia 5", (50.0677, 19.9476))
+    service.update(station, name="Kraków Główny")
+
+    assert service.undo() == [station]
+    assert station.name == "Kraków"
+    assert service.redo() == [station]
+    assert station.name == "Kraków Główny"
+    assert service.redo() is None
+
+
+def test_undo_station_removal_restores_children(tmp_path):
+    service = _service(tmp_path / "net.sqlite3")
+    station = service.add_station("Kraków", "ul. Pawia 5", (50.0677, 19.9476))
+    service.add_employee("Jan", "kasjer", station)
+    service.add_carrier("PKS", "autobus", station)
+    service.remove(station)
+    assert len(service.repo.stations) == 0
+
+    service.undo()  # Jedna operacja: dworzec razem z obsadą
+    restored = service.repo.get("station", station.id)
+    assert restored.coordinates == (50.0677, 19.9476)
+    assert [e.name for e in restored.employees] == ["Jan"]
+    assert [c.name for c in restored.carriers] == ["PKS"]
+
+
+def test_amend_joins_geocoding_result(tmp_path):
+    service = _service(tmp_path / "net.sqlite3")
+    station = service.add_station("Kraków", "ul. Pawia 5", pending=True)
+    operation = service.last_operation()
+    with service.amend(operation):
+        station.coordinates = (50.0677, 19.9476)
+        service.repo.update(station, pending=False)
+    assert service.coords.get(station.id) == (50.0677, 19.9476)
+
+    service.undo()  # Dodanie i lokalizacja to jedna operacja
+    assert len(service.repo.stations) == 0
+    assert service.undo() is None
+
+
+def test_amend_after_other_change_is_separate(tmp_path):
+    service = _service(tmp_path / "net.sqlite3")
+    station = service.add_station("Kraków", "ul. Pawia 5", pending=True)
+    operation = service.last_operation()
+    other = service.add_station("Gdańsk", "ul. Podwale 1", (54.3556, 18.6440))
+    with service.amend(operation):
+        station.coordinates = (50.0677, 19.9476)
+        service.repo.update(station, pending=False)
+
+    assert service.undo() == [station]
+    assert station.coordinates is None and other in service.repo.stations
+    service.undo()
+    assert other not in service.repo.stations and station in service.repo.stations
+
+
+def test_history_survives_reopen(tmp_path):
+    service = _service(tmp_path / "net.sqlite3")
+    station = service.add_station("Kraków", "ul. Pawia 5", (50.0677, 19.9476))
+    with service.batch():
+        for name in ("Jan", "Anna", "Piotr"):
+            service.add_employee(name, "kasjer", station)
+    service.close()
+
+    service = _service(tmp_path / "net.sqlite3")
+    assert len(service.undo()) == 3  # Blok batch() to jedna operacja
+    assert len(service.repo.employees) == 0
+    service.undo()
+    assert len(service.repo.stations) == 0
+    service.close()
+
+    service = _service(tmp_path / "net.sqlite3")
+    service.redo()
+    assert [s.name for s in service.repo.stations] == ["Kraków"]
+    service.close()
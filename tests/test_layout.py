@@ -0,0 +1,46 @@
+import random
+
+import numpy as np
+
+from layout import RING_SLOTS, SlotAllocator, ring_offset, ring_positions
+
+
+def test_freed_slots_fill_inner_rings_first():
+    allocator = SlotAllocator()
+    slots = [allocator.acquire() for _ in range(16)]
+    assert slots == list(range(16))
+    for slot in slots[:15]:
+        allocator.release(slot)  # Zostaje tylko pozycja 15 na drugim pierścieniu
+    assert [allocator.acquire() for _ in range(3)] == [0, 1, 2]
+
+
+def test_no_collisions_under_random_churn():
+    allocator, held = SlotAllocator(), set()
+    rng = random.Random(0)
+    for _ in range(5000):
+        if held and rng.random() < 0.45:
+            slot = rng.choice(sorted(held))
+            held.remove(slot)
+            allocator.release(slot)
+        else:
+            slot = allocator.acquire()
+            assert slot not in held
+            held.add(slot)
+        assert allocator.used == len(held)
+    # Kolejna pozycja to najmniejsza wolna
+    free = min(set(range(max(held) + 2)) - held)
+    assert allocator.acquire() == free
+
+
+def test_release_all_restarts_from_first_ring():
+    allocator = SlotAllocator()
+    for slot in [allocator.acquire() for _ in range(10)]:
+        allocator.release(slot)
+    assert allocator.used == 0 and allocator.acquire() == 0
+
+
+def test_ring_positions_match_offsets():
+    slots = list(range(2 * RING_SLOTS + 3))
+    positions = ring_positions((52.0, 21.0), slots)
+    expected = [(52.0 + dlat, 21.0 + dlon) for dlat, dlon in map(ring_offset, slots)]
+    assert np.allclose(positions, expected)
@@ -0,0 +1,91 @@
+import random
+
+from maplayer import MarkerLayer
+
+
+class _Marker:
+    def __init__(self, widget, lat, lon, text):
+        self.widget, self.position, self.text = widget, (lat, lon), text
+
+    def delete(self):
+        self.widget.markers.remove(self)
+
+    def set_position(self, lat, lon):
+        self.position = (lat, lon)
+
+    def set_text(self, text):
+        self.text = text
+
+
+class _MapWidget:
+    """Atrapa TkinterMapView - cały świat w kadrze albo wycinek ustawiony przez view()."""
+
+    def __init__(self, zoom):
+        self.markers = []
+        self.view(zoom)
+
+    def view(self, zoom, upper_left=(0.0, 0.0), lower_right=(1.0, 1.0)):
+        n = 1 << zoom
+        self.zoom = zoom
+        self.upper_left_tile_pos = (upper_left[0] * n, upper_left[1] * n)
+        self.lower_right_tile_pos = (lower_right[0] * n, lower_right[1] * n)
+
+    def set_marker(self, lat, lon, text=None, **options):
+        marker = _Marker(self, lat, lon, text)
+        self.markers.append(marker)
+        return marker
+
+
+def _layer(count, seed=0):
+    rng = random.Random(seed)
+    widget = _MapWidget(zoom=5)
+    layer = MarkerLayer(widget, max_cluster_zoom=12)
+    with layer.batch():
+        handles = [layer.set_marker(rng.uniform(49.0, 54.8), rng.uniform(14.1, 24.1), text=f"d{i}")
+                   for i in range(count)]
+    layer.update_view()
+    return widget, layer, handles
+
+
+def _represented(widget):
+    """Liczba znaczników reprezentowanych przez markery na mapie (grupa liczy się jako jej licznik)."""
+    return sum(int(m.text) if m.text.isdigit() else 1 for m in widget.markers)
+
+
+def test_cluster_counts_cover_all_markers_at_every_zoom():
+    widget, layer, handles = _layer(500)
+    for zoom in (0, 3, 7, 12, 5):
+        widget.view(zoom)
+        layer.update_view()
+        assert len(widget.markers) == layer.shown_count
+        assert _represented(widget) == len(handles)
+    widget.view(0)
+    layer.update_view()
+    assert [m.text for m in widget.markers] == ["500"]
+
+
+def test_cluster_counts_follow_deletes():
+    widget, layer, handles = _layer(300, seed=1)
+    for i, handle in enumerate(handles[:250]):
+        handle.delete()
+        if i % 50 == 0:
+            assert _represented(widget) == len(handles) - i - 1
+    assert _represented(widget) == 50
+    with layer.batch():
+        for handle in handles[250:299]:
+            handle.delete()
+    assert [m.text for m in widget.markers] == ["d299"]  # Ostatni znacznik już nie jest grupą
+    handles[299].delete()
+    assert widget.markers == [] and layer.shown_count == 0
+
+
+def test_only_markers_near_the_view_exist_when_zoomed_in():
+    widget, layer, handles = _layer(2000, seed=2)
+    x, y = handles[0].world
+    for dx in (0.0, 0.001, 0.05):  # Przesunięcie w obrębie marginesu i daleko poza niego
+        widget.view(14, (x + dx - 0.0005, y - 0.0005), (x + dx + 0.0005, y + 0.0005))
+        layer.update_view()
+        x0, y0, x1, y1 = layer.region
+        expected = {h.text for h in handles if x0 <= h.world[0] <= x1 and y0 <= h.world[1] <= y1}
+        assert sorted(m.text for m in widget.markers) == sorted(expected)
+    assert len(widget.markers) < len(handles)
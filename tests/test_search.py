@@ -0,0 +1,111 @@
+from models import Employee
+from search import SETTLE_BULK, PrefixIndex, PrefixView, TrigramIndex, fold, trigrams
+from services import NetworkService
+
+
+def _network():
+    service = NetworkService()
+    station = service.add_station("Kraków Główny", "ul. Pawia 5", (50.0677, 19.9476))
+    service.add_station("Kraków Płaszów", "ul. Lipowa 1", (50.0341, 19.9990))
+    service.add_station("Gdańsk Główny", "ul. Podwale Grodzkie 1", (54.3556, 18.6440))
+    service.add_employee("Jan Kowalski", "kasjer", station)
+    service.add_employee("Anna Kowalska", "dyżurna ruchu", station)
+    service.add_carrier("Koleje Małopolskie", "pociągi regionalne", station)
+    return service, station
+
+
+def _names(results):
+    return [entity.name for entity, _ in results]
+
+
+# --- TrigramIndex ---
+def test_fold_and_trigrams():
+    assert fold("  Łódź   Kaliska ") == "lodz kaliska"
+    assert trigrams("ab") == {"  a", " ab", "ab "}
+
+
+def test_fuzzy_ranking():
+    service, _ = _network()
+    index = TrigramIndex(service.repo)
+    results = index.search("krakow glowny")
+    assert _names(results)[:2] == ["Kraków Główny", "Kraków Płaszów"]
+    assert results[0][1] > results[1][1] >= 0.15
+    assert _names(index.search("kowalsky"))[:2] in (["Jan Kowalski", "Anna Kowalska"],
+                                                    ["Anna Kowalska", "Jan Kowalski"])
+    assert _names(index.search("kowalski", kinds=("station",))) == []
+    assert index.search("zzzz qqqq") == []
+    assert len(index.search("a", k=2)) <= 2
+
+
+def test_index_follows_repository_after_build():
+    service, station = _network()
+    index = TrigramIndex(service.repo)
+    index.build()
+    employee = service.add_employee("Zbigniew Wiśniewski", "maszynista", station)
+    assert _names(index.search("wisniewski")) == ["Zbigniew Wiśniewski"]
+    service.update(employee, name="Zbigniew Nowak")
+    assert index.search("wisniewski") == []
+    assert _names(index.search("nowak")) == ["Zbigniew Nowak"]
+    service.remove(station)
+    assert _names(index.search("nowak")) == []
+    assert _names(index.search("krakow")) == ["Kraków Płaszów"]
+
+
+def test_chunked_build_sees_changes_made_meanwhile():
+    service, station = _network()
+    index = TrigramIndex(service.repo)
+    steps = index.build_steps(chunk=2)
+    next(steps)  # Zaindeksowane dwa pierwsze dworce
+    assert not index.built and len(index) == 2
+    gdansk = next(iter(service.repo.find("station", "Gdańsk Główny")))
+    service.remove(gdansk)
+    service.repo.add(Employee("Ewa Zielińska", "kasjer", station))
+    for _ in steps:
+        pass
+    assert index.built
+    assert len(index) == len(service.repo.stations) + len(service.repo.employees) + len(service.repo.carriers)
+    assert _names(index.search("gdansk")) == []
+    assert _names(index.search("zielinska")) == ["Ewa Zielińska"]
+
+
+# --- PrefixIndex / PrefixView ---
+def _expected(service, kind, prefix):
+    """Wynik filtra liczony wprost: encje z nazwą od prefiksu, po kluczu i id."""
+    return [e.name for e in sorted(service.repo.tables[kind], key=lambda e: (fold(e.name), e.id))
+            if fold(e.name).startswith(prefix)]
+
+
+def test_prefix_view_after_add_rename_remove():
+    service, station = _network()
+    index = PrefixIndex(service.repo, "station")
+    view = PrefixView(index, "krakow")
+    assert [s.name for s in view[:]] == ["Kraków Główny", "Kraków Płaszów"]
+    assert len(view) == 2 and view.index(station) == 0 and station in view
+
+    added = service.add_station("Kraków Bieżanów", "ul. Mała Góra", None)
+    assert [s.name for s in view[:]] == ["Kraków Bieżanów", "Kraków Główny", "Kraków Płaszów"]
+    assert view[-1].name == "Kraków Płaszów" and view.index(station) == 1
+
+    service.update(added, name="Wieliczka Rynek")
+    assert added not in view and [s.name for s in view[:]] == ["Kraków Główny", "Kraków Płaszów"]
+    assert [s.name for s in PrefixView(index, "wiel")[:]] == ["Wieliczka Rynek"]
+
+    service.remove(station)
+    assert [s.name for s in view[:]] == ["Kraków Płaszów"]
+    assert len(PrefixView(index, "x")) == 0
+    assert [s.name for s in PrefixView(index, "")[:]] == _expected(service, "station", "")
+
+
+def test_prefix_index_bulk_changes_match_brute_force():
+    service, station = _network()
+    index = PrefixIndex(service.repo, "employee")
+    names = ("Kowal", "Kowalczyk", "Nowak", "Łukasz", "Lukas", "Kos")
+    with service.batch():
+        added = [service.add_employee(f"{names[i % len(names)]} {i}", "kasjer", station)
+                 for i in range(3 * SETTLE_BULK)]
+    for employee in added[::3]:
+        service.update(employee, name=f"Nowak {employee.id}")
+    for employee in added[1::3]:
+        service.remove(employee)
+    for prefix in ("kow", "kowalc", "lu", "nowak", "k", ""):
+        assert [e.name for e in PrefixView(index, prefix)[:]] == _expected(service, "employee", prefix)
@@ -0,0 +1,40 @@
+import random
+
+from spatial import QuadTree
+
+
+def _brute(points, x0, y0, x1, y1):
+    return {item for item, (x, y) in points.items() if x0 <= x <= x1 and y0 <= y <= y1}
+
+
+def test_query_matches_brute_force():
+    rng = random.Random(0)
+    tree, points = QuadTree(), {}
+    for item in range(3000):
+        # Część punktów w skupisku - wymusza głębokie podziały
+        x, y = (rng.random(), rng.random()) if item % 3 else (0.5 + rng.random() * 1e-6, 0.25)
+        points[item] = (x, y)
+        tree.insert(item, x, y)
+    assert len(tree) == len(points)
+    for _ in range(200):
+        x0, x1 = sorted((rng.random(), rng.random()))
+        y0, y1 = sorted((rng.random(), rng.random()))
+        assert set(tree.query(x0, y0, x1, y1)) == _brute(points, x0, y0, x1, y1)
+    assert set(tree.query(0.5, 0.25, 0.5 + 1e-6, 0.25)) == _brute(points, 0.5, 0.25, 0.5 + 1e-6, 0.25)
+
+
+def test_query_after_removals():
+    rng = random.Random(1)
+    tree, points = QuadTree(), {}
+    for item in range(2000):
+        points[item] = (rng.random(), rng.random())
+        tree.insert(item, *points[item])
+    for item in rng.sample(sorted(points), 1900):
+        assert tree.remove(item, *points.pop(item))
+    assert not tree.remove(-1, 0.5, 0.5)
+    assert len(tree) == len(points)
+    assert set(tree.query(0, 0, 1, 1)) == set(points)
+    for _ in range(100):
+        x0, x1 = sorted((rng.random(), rng.random()))
+        y0, y1 = sorted((rng.random(), rng.random()))
+        assert set(tree.query(x0, y0, x1, y1)) == _brute(points, x0, y0, x1, y1)
@@ -0,0 +1,120 @@
+import pytest
+
+from models import Carrier, Employee, Station
+from repository import EntityTable, Repository
+from storage import NetworkStore
+
+
+def _open(path):
+    repo = Repository()
+    store = NetworkStore(str(path))
+    store.attach(repo)
+    for _ in store.load(repo):
+        pass
+    return repo, store
+
+
+def _network(path):
+    repo, store = _open(path)
+    station = Station("Warszawa Centralna", "Warszawa")
+    station.coordinates = (52.2289, 21.0031)
+    repo.add(station)
+    repo.add(Employee("Jan", "kasjer", station))
+    repo.add(Carrier("PKS", "autobus", station))
+    return repo, store, station
+
+
+def _counts(store):
+    return tuple(store.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                 for table in ("stations", "employees", "carriers"))
+
+
+# --- NetworkStore ---
+def test_round_trip(tmp_path):
+    repo, store, station = _network(tmp_path / "net.sqlite3")
+    store.close()
+
+    repo, store = _open(tmp_path / "net.sqlite3")
+    loaded = repo.get("station", station.id)
+    assert loaded.name == "Warszawa Centralna"
+    assert loaded.coordinates == (52.2289, 21.0031)
+    assert [e.name for e in loaded.employees] == ["Jan"]
+    assert [c.fleet_type for c in loaded.carriers] == ["autobus"]
+    store.close()
+
+
+def test_station_update_keeps_children(tmp_path):
+    repo, store, station = _network(tmp_path / "net.sqlite3")
+    repo.update(station, name="Warszawa Główna", pending=False)
+    assert _counts(store) == (1, 1, 1)
+    store.close()
+
+    repo, store = _open(tmp_path / "net.sqlite3")
+    loaded = repo.get("station", station.id)
+    assert loaded.name == "Warszawa Główna"
+    assert len(loaded.employees) == 1 and len(loaded.carriers) == 1
+    store.close()
+
+
+def test_batch_is_one_transaction(tmp_path):
+    repo, store, station = _network(tmp_path / "net.sqlite3")
+    with store.batch():
+        for i in range(10):
+            repo.add(Employee(f"E{i}", "kasjer", station))
+        assert _counts(store) == (1, 1, 1)  # Jeszcze nic nie zapisano
+    assert _counts(store) == (1, 11, 1)
+    store.close()
+
+
+def test_remove_station_removes_children(tmp_path):
+    repo, store, station = _network(tmp_path / "net.sqlite3")
+    repo.remove(station)
+    assert _counts(store) == (0, 0, 0)
+    store.close()
+
+
+# --- EntityTable ---
+class _Item:
+    def __init__(self, entity_id):
+        self.id = entity_id
+
+
+def test_entity_table_slicing_and_index():
+    table = EntityTable()
+    items = [_Item(i) for i in range(3000)]
+    for item in items:
+        table.add(item)
+    for item in items[::3]:
+        table.remove(item)  # Ponad 1024 dziur - wymusza też przebudowę
+    live = [item for i, item in enumerate(items) if i % 3]
+
+    assert len(table) == len(live)
+    assert table[0] is live[0] and table[-1] is live[-1]
+    assert table[100:110] == live[100:110]
+    assert table[len(live) - 2:len(live) + 5] == live[-2:]
+    assert table[5:5] == []
+    assert all(table.index(item) == i for i, item in enumerate(live))
+    assert items[0] not in table
+    with pytest.raises(ValueError):
+        table.index(items[0])
+    with pytest.raises(IndexError):
+        table[len(live)]
+
+
+def test_ids_during_chunked_load_do_not_collide(tmp_path):
+    repo, store, station = _network(tmp_path / "net.sqlite3")
+    repo.add(Station("Kraków", "Kraków"))
+    store.close()
+
+    repo = Repository()
+    store = NetworkStore(str(tmp_path / "net.sqlite3"))
+    store.attach(repo)
+    loader = store.load(repo, chunk=1)
+    next(loader)  # Wczytany tylko pierwszy dworzec
+    added = repo.add(Station("Nowy", "Gdańsk"))
+    assert added.id == 5  # Po id 1-4 zapisanych w bazie (dworce, pracownik, klient)
+    for _ in loader:
+        pass
+    assert repo.get("station", station.id).name == "Warszawa Centralna"
+    assert len(repo.get("station", station.id).employees) == 1
+    store.close()
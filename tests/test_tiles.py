@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from tiles import MBTilesStore, TileImageCache, prefetch, tile_xy, tiles_for_bounds
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TileImageCache(limit=3)
+    for key in "abc":
+        cache[key] = key.upper()
+    assert cache.get("a") == "A"  # "a" staje się najświeższy
+    cache["d"] = "D"
+    assert "b" not in cache
+    assert cache.keys() == ["c", "a", "d"]
+    assert cache.get("b", False) is False
+
+
+def test_cache_get_survives_concurrent_eviction():
+    cache = TileImageCache(limit=8)
+    stop = threading.Event()
+
+    def _writer():
+        i = 0
+        while not stop.is_set():
+            cache[f"k{i % 64}"] = i
+            i += 1
+
+    writer = threading.Thread(target=_writer)
+    writer.start()
+    try:
+        for i in range(20_000):
+            cache.get(f"k{i % 64}", False)  # Nie może zgłosić KeyError
+    finally:
+        stop.set()
+        writer.join()
+    assert len(cache) <= 8
+
+
+def test_store_round_trip(tmp_path):
+    store = MBTilesStore(str(tmp_path / "tiles.mbtiles"))
+    tiles = list(tiles_for_bounds(((52.0, 21.0), (52.3, 21.2)), zooms=range(8, 10)))
+    assert tile_xy(52.0, 21.0, 8) in [(x, y) for z, x, y in tiles if z == 8]
+    store.put_many([(z, x, y, b"png") for z, x, y in tiles[:2]])
+    assert store.get(*tiles[0]) == b"png"
+    assert store.missing(tiles) == tiles[2:]
+    assert len(store) == 2
+    store.close()
+
+
+def test_prefetch_refuses_public_osm_servers(tmp_path):
+    store = MBTilesStore(str(tmp_path / "tiles.mbtiles"))
+    bounds = ((52.0, 21.0), (52.3, 21.2))
+    for server in (None, "", "https://a.tile.openstreetmap.org/{z}/{x}/{y}.png"):
+        with pytest.raises(ValueError):
+            prefetch(store, bounds, server)
+    assert len(store) == 0
+    store.close()
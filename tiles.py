@@ -0,0 +1,292 @@
+import argparse
+import math
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+TILE_SERVER = "https://a.tile.openstreetmap.org/{z}/{x}/{y}.png"
+TILES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tiles.mbtiles")  # plik kafelków aplikacji
+TILE_USER_AGENT = "station_mapper/1.0 (tile prefetch)"
+TILE_CACHE_LIMIT = 512  # zdekodowanych kafelków w pamięci (~256 KB każdy w Tk) - widok i sąsiedztwo z zapasem
+PREFETCH_ZOOMS = range(5, 13)  # od całego kraju do poziomu ulic wokół dworców
+PREFETCH_MARGIN = 0.05  # zapas wokół prostokąta dworców (w stopniach)
+MAX_PREFETCH_TILES = 20_000  # ochrona przed przypadkowym pobieraniem hurtowym z publicznego serwera
+# Zasady OSM (operations.osmfoundation.org/policies/tiles) zabraniają pobierania hurtowego z tych serwerów
+PUBLIC_TILE_HOSTS = ("tile.openstreetmap.org",)
+
+
+def tile_xy(lat, lon, zoom):
+    """Numer kafelka (x, y) schematu XYZ zawierającego punkt na danym przybliżeniu."""
+    n = 2 ** zoom
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_for_bounds(bounds, zooms=PREFETCH_ZOOMS, margin=PREFETCH_MARGIN):
+    """Kafelki (z, x, y) pokrywające prostokąt ((lat_min, lon_min), (lat_max, lon_max)) z zapasem."""
+    (lat_min, lon_min), (lat_max, lon_max) = bounds
+    for zoom in zooms:
+        x0, y0 = tile_xy(lat_max + margin, lon_min - margin, zoom)
+        x1, y1 = tile_xy(lat_min - margin, lon_max + margin, zoom)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield zoom, x, y
+
+
+def fetch_tile(server, zoom, x, y, timeout=10):
+    """Pobiera kafelek z serwera; None, gdy serwer go nie ma (404). Błędy sieci zgłasza jako OSError."""
+    import urllib.error
+    import urllib.request  # Importowane przy pierwszym pobraniu - nie obciąża startu aplikacji
+
+    url = server.replace("{z}", str(zoom)).replace("{x}", str(x)).replace("{y}", str(y))
+    request = urllib.request.Request(url, headers={"User-Agent": TILE_USER_AGENT})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.read()
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return None
+        raise
+
+
+# --- MAGAZYN KAFELKÓW ---
+class MBTilesStore:
+    """Kafelki mapy w pliku MBTiles (SQLite, wiersze w schemacie TMS); bezpieczny dla wątków ładujących mapę."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS tiles (
+                zoom_level INTEGER,
+                tile_column INTEGER,
+                tile_row INTEGER,
+                tile_data BLOB,
+                PRIMARY KEY (zoom_level, tile_column, tile_row)
+            )""")
+        self._db.executemany("INSERT OR IGNORE INTO metadata (name, value) VALUES (?, ?)",
+                             [("name", "pop_dworce"), ("format", "png"), ("type", "baselayer")])
+        self._db.commit()
+
+    @staticmethod
+    def _row(zoom, y):
+        return 2 ** zoom - 1 - y  # MBTiles numeruje wiersze od dołu (TMS), mapa od góry (XYZ)
+
+    def get(self, zoom, x, y):
+        with self._lock:
+            row = self._db.execute("SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? "
+                                   "AND tile_row = ?", (zoom, x, self._row(zoom, y))).fetchone()
+        return row[0] if row else None
+
+    def missing(self, tiles):
+        """Te z kafelków (z, x, y), których jeszcze nie ma w pliku."""
+        with self._lock:
+            return [(z, x, y) for z, x, y in tiles
+                    if self._db.execute("SELECT 1 FROM tiles WHERE zoom_level = ? AND tile_column = ? "
+                                        "AND tile_row = ?", (z, x, self._row(z, y))).fetchone() is None]
+
+    def put_many(self, tiles):
+        """Zapisuje [(z, x, y, dane)] jedną transakcją."""
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data) "
+                                 "VALUES (?, ?, ?, ?)", [(z, x, self._row(z, y), data) for z, x, y, data in tiles])
+            self._db.commit()
+
+    def put(self, zoom, x, y, data):
+        self.put_many([(zoom, x, y, data)])
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class TileImageCache(OrderedDict):
+    """Słownik zdekodowanych kafelków z limitem LRU - podmienia nieograniczony tile_image_cache mapy.
+
+    Mapa odczytuje i zapisuje go z wątku Tk i dwóch wątków ładujących, stąd blokada. Usunięcie obrazu
+    z cache nie zdejmuje go z ekranu - kafelek na płótnie trzyma własną referencję.
+    """
+
+    def __init__(self, limit=TILE_CACHE_LIMIT):
+        super().__init__()
+        self.limit = limit
+        self._lock = threading.RLock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = super().__getitem__(key)
+            self.move_to_end(key)
+            return value
+
+    def get(self, key, default=None):
+        """Sprawdzenie i odczyt pod jedną blokadą - `key in cache` i potem `cache[key]` może trafić na eviction."""
+        with self._lock:
+            if not super().__contains__(key):
+                return default
+            self.move_to_end(key)
+            return super().__getitem__(key)
+
+    def __contains__(self, key):
+        with self._lock:
+            return super().__contains__(key)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            while len(self) > self.limit:
+                self.popitem(last=False)
+
+    def __delitem__(self, key):
+        with self._lock:
+            super().__delitem__(key)
+
+    def keys(self):
+        with self._lock:
+            return list(super().keys())
+
+
+# --- POBIERANIE OBSZARU ---
+def prefetch(store, bounds, server, zooms=PREFETCH_ZOOMS, workers=2, progress=None, cancel=None):
+    """Pobiera do magazynu brakujące kafelki prostokąta dworców; zwraca (pobrane, brakujące na serwerze, błędy).
+
+    server to wprost podany serwer dopuszczający pobieranie hurtowe (własny, komercyjny) - publiczne serwery
+    OSM są odrzucane wyjątkiem ValueError. progress(done, total) jest wołane z wątku wywołującego po każdej
+    paczce; cancel() przerywa po paczce.
+    """
+    if not server or any(host in server for host in PUBLIC_TILE_HOSTS):
+        raise ValueError("Pobieranie obszaru wymaga własnego serwera kafelków - zasady OSM nie pozwalają "
+                         "na pobieranie hurtowe z tile.openstreetmap.org.")
+    tiles = list(tiles_for_bounds(bounds, zooms))
+    if len(tiles) > MAX_PREFETCH_TILES:
+        raise ValueError(f"Obszar wymaga {len(tiles)} kafelków (limit {MAX_PREFETCH_TILES}) - zmniejsz przybliżenie.")
+    todo = store.missing(tiles)
+    fetched = absent = errors = 0
+
+    def _fetch(tile):
+        try:
+            return tile, fetch_tile(server, *tile)
+        except OSError:
+            return tile, OSError
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tile-prefetch") as pool:
+        for start in range(0, len(todo), 64):
+            if cancel is not None and cancel():
+                break
+            batch = []
+            for (zoom, x, y), data in pool.map(_fetch, todo[start:start + 64]):
+                if data is OSError:
+                    errors += 1
+                elif data is None:
+                    absent += 1
+                else:
+                    batch.append((zoom, x, y, data))
+            store.put_many(batch)
+            fetched += len(batch)
+            if progress is not None:
+                progress(min(start + 64, len(todo)), len(todo))
+    return fetched, absent, errors
+
+
+# --- LOKALNY SERWER KAFELKÓW ---
+def serve(store, host="127.0.0.1", port=8089):
+    """Serwer HTTP podający kafelki z pliku MBTiles pod /{z}/{x}/{y}.png - zastępuje publiczny serwer w testach."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            try:
+                zoom, x, y = (int(part) for part in self.path.split("?")[0].strip("/").removesuffix(".png").split("/"))
+            except ValueError:
+                self.send_error(400)
+                return
+            data = store.get(zoom, x, y)
+            if data is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kafelki mapy offline: pobieranie obszaru dworców i lokalny serwer.")
+    from storage import NETWORK_DB_PATH
+
+    parser.add_argument("--tiles", default=TILES_PATH, help="plik MBTiles (domyślnie ten, którego używa aplikacja)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("prefetch", help="pobiera kafelki wokół wszystkich dworców z bazy")
+    cmd.add_argument("--db", default=NETWORK_DB_PATH, help="baza sieci, z której brany jest obszar (domyślnie aplikacji)")
+    cmd.add_argument("--bbox", type=float, nargs=4, metavar=("LAT_MIN", "LON_MIN", "LAT_MAX", "LON_MAX"),
+                     help="obszar podany wprost zamiast dworców z bazy")
+    cmd.add_argument("--zoom", type=int, nargs=2, default=(PREFETCH_ZOOMS.start, PREFETCH_ZOOMS.stop - 1),
+                     metavar=("MIN", "MAX"))
+    cmd.add_argument("--server", required=True,
+                     help="szablon URL serwera kafelków z {z}, {x}, {y} dopuszczającego pobieranie hurtowe")
+    cmd.add_argument("--workers", type=int, default=2, help="równoległe pobrania (publiczny serwer OSM: nie więcej niż 2)")
+    cmd = commands.add_parser("serve", help="podaje kafelki z pliku MBTiles przez HTTP")
+    cmd.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args(argv)
+
+    store = MBTilesStore(args.tiles)
+    try:
+        if args.command == "serve":
+            server = serve(store, port=args.port)
+            print(f"Kafelki: http://127.0.0.1:{args.port}/{{z}}/{{x}}/{{y}}.png ({len(store)} w pliku)", file=sys.stderr)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            return 0
+
+        if args.bbox:
+            bounds = (args.bbox[0], args.bbox[1]), (args.bbox[2], args.bbox[3])
+        else:
+            from services import NetworkService
+            from storage import NetworkStore
+
+            service = NetworkService(store=NetworkStore(args.db)).load()
+            bounds = service.bounds()
+            service.close()
+            if bounds is None:
+                print("Brak zlokalizowanych dworców w bazie.", file=sys.stderr)
+                return 1
+
+        def progress(done, total):
+            print(f"\rKafelki: {done}/{total}", end="", file=sys.stderr, flush=True)
+
+        try:
+            fetched, absent, errors = prefetch(store, bounds, args.server, range(args.zoom[0], args.zoom[1] + 1),
+                                               args.workers, progress)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"\nPobrano: {fetched}, brak na serwerze: {absent}, błędy sieci: {errors}", file=sys.stderr)
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+from tkinter import ttk
+
+
+# --- WIRTUALIZOWANA LISTA ---
+class VirtualList(ttk.Frame):
+    """Lista obiektów, która materializuje tylko widoczne wiersze (ttk.Treeview + własny przewijak).
+
+    Koszt przewijania i odświeżania zależy od wysokości okna, a nie od długości listy. Zmiany danych są
+    zgłaszane przez inserted()/removed()/changed() i nanoszone w flush(); przerysowanie następuje tylko
+    wtedy, gdy dotyczą widocznego fragmentu. Zaznaczenie jest pamiętane jako obiekt, nie jako pozycja,
+    więc przeżywa wstawianie i usuwanie innych wierszy.
+    """
+
+    def __init__(self, master, items, render, font=("Helvetica", 9), row_height=20):
+        super().__init__(master)
+        self.items = items  # funkcja zwracająca sekwencję obiektów z len(), [a:b] i index() (np. EntityTable)
+        self.render = render  # obiekt -> tekst wiersza
+        self.row_height = row_height
+        self.top = 0  # indeks pierwszego widocznego wiersza
+        self.visible = 1  # liczba wierszy mieszczących się w oknie
+        self.selected = None  # zaznaczony obiekt
+
+        self._iids = []  # identyfikatory wierszy Treeview, ponownie używane przy przewijaniu
+        self._window = []  # obiekty aktualnie narysowane, w kolejności wierszy
+        self._window_ids = set()
+        self._ops = []  # indeksy wstawień/usunięć w kolejności zgłoszeń
+        self._changed = False
+        self._redraw = False
+
+        style = ttk.Style(self)
+        style.configure("Entity.Treeview", font=font, rowheight=row_height)
+        self.tree = ttk.Treeview(self, show="tree", selectmode="browse", style="Entity.Treeview")
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", lambda e: self.yview("scroll", -1 if e.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda e: self.yview("scroll", -1, "units"))
+        self.tree.bind("<Button-5>", lambda e: self.yview("scroll", 1, "units"))
+        self.tree.bind("<Up>", lambda e: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self._move_selection(-self.visible))
+        self.tree.bind("<Next>", lambda e: self._move_selection(self.visible))
+
+    # --- Zgłaszanie zmian danych ---
+    def inserted(self, index, item):
+        self._ops.append(index)
+
+    def removed(self, index, item):
+        self._ops.append(index)
+        if item is self.selected:
+            self.selected = None
+
+    def changed(self, item):
+        if id(item) in self._window_ids:
+            self._changed = True
+
+    def invalidate(self):
+        """Przerysowuje widoczny fragment bez śledzenia pozycji (np. gdy lista pokazuje wynik filtra)."""
+        self._ops.clear()
+        self._redraw = True
+
+    def reset(self):
+        """Wymusza przerysowanie widocznego fragmentu (np. po wczytaniu danych)."""
+        self._ops.clear()
+        self.selected = None
+        self._redraw = True
+
+    def flush(self):
+        """Nanosi zaległe zmiany; zwraca False, jeśli widoczny fragment nie wymagał przerysowania."""
+        bottom = self.top + self.visible
+        # Zmiana przed dolną krawędzią okna przesuwa widoczne wiersze
+        redraw = self._redraw or self._changed or any(index < bottom for index in self._ops)
+        structural = bool(self._ops)
+        self._ops.clear()
+        self._changed = self._redraw = False
+
+        if redraw:
+            self._draw()
+        elif structural:
+            self._update_scrollbar()  # Zmieniła się tylko długość listy poza oknem
+        return redraw
+
+    # --- Zaznaczenie ---
+    def selected_item(self):
+        return self.selected
+
+    def selection_set(self, item):
+        self.selected = item
+        self.see(self.items().index(item))
+        self._draw()
+
+    def see(self, index):
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self.visible:
+            self.top = index - self.visible + 1
+
+    def size(self):
+        return len(self.items())
+
+    # --- Przewijanie ---
+    def yview(self, *args):
+        """Obsługuje polecenia przewijaka: ("moveto", ułamek) lub ("scroll", n, "units"/"pages")."""
+        total = len(self.items())
+        if args[0] == "moveto":
+            top = int(float(args[1]) * total)
+        else:
+            step = int(args[1]) * (self.visible if args[2] == "pages" else 1)
+            top = self.top + step
+        top = max(0, min(top, total - self.visible))
+        if top != self.top:
+            self.top = top
+            self._draw()
+        return "break"
+
+    def _move_selection(self, delta):
+        total = len(self.items())
+        if not total:
+            return "break"
+        index = 0 if self.selected is None else max(0, min(self.items().index(self.selected) + delta, total - 1))
+        self.selection_set(self.items()[index])
+        return "break"
+
+    def _on_configure(self, event):
+        visible = max(1, event.height // self.row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self._draw()
+
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        if selection:
+            self.selected = self._window[self._iids.index(selection[0])]
+
+    # --- Rysowanie ---
+    def _draw(self):
+        items = self.items()
+        total = len(items)
+        self.top = max(0, min(self.top, total - self.visible))
+        window = items[self.top:self.top + self.visible]
+
+        # Dopasuj liczbę wierszy Treeview do okna - reszta jest ponownie używana
+        while len(self._iids) < len(window):
+            self._iids.append(self.tree.insert("", "end", text=""))
+        while len(self._iids) > len(window):
+            self.tree.delete(self._iids.pop())
+
+        for iid, item in zip(self._iids, window):
+            self.tree.item(iid, text=self.render(item))
+        self._window = window
+        self._window_ids = {id(item) for item in window}
+
+        if self.selected is not None and id(self.selected) in self._window_ids:
+            self.tree.selection_set(self._iids[window.index(self.selected)])
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self.items())
+        if not total:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        self.scrollbar.set(self.top / total, min(1.0, (self.top + self.visible) / total))